@@ -0,0 +1,22 @@
+"""add_media_file_id_to_posts
+
+Revision ID: 2c8e6b0a4d71
+Revises: 9d3c5a7e1f48
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2c8e6b0a4d71'
+down_revision = '9d3c5a7e1f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('media_file_id', sa.String(length=255), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('posts', 'media_file_id')
@@ -0,0 +1,34 @@
+"""add_post_schedule_exclusion
+
+Revision ID: 3e9a7d1f6c20
+Revises: 8c4f2a6e1b57
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3e9a7d1f6c20'
+down_revision = '8c4f2a6e1b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # btree_gist provides the GiST operator class for "sender_id WITH ="
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    # Fails if scheduled posts that are already closer than 24h exist,
+    # they have to be rescheduled before upgrading
+    op.execute(
+        """
+        ALTER TABLE posts ADD CONSTRAINT ex_posts_sender_schedule
+        EXCLUDE USING gist (
+            sender_id WITH =,
+            tsrange(publish_date, publish_date + interval '24 hours') WITH &&
+        )
+        WHERE (publish_date IS NOT NULL AND is_published = false)
+        """
+    )
+
+def downgrade() -> None:
+    op.drop_constraint('ex_posts_sender_schedule', 'posts', type_='exclude')
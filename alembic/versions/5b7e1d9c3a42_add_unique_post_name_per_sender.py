@@ -0,0 +1,43 @@
+"""add_unique_post_name_per_sender
+
+Revision ID: 5b7e1d9c3a42
+Revises: c25048bb513e
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5b7e1d9c3a42'
+down_revision = 'c25048bb513e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Names were not unique before: the oldest post keeps its name,
+    # later duplicates get their id appended, e.g. "Sale (42)"
+    op.execute(
+        """
+        UPDATE posts
+        SET name = left(posts.name, 100 - length(duplicates.suffix)) || duplicates.suffix
+        FROM (
+            SELECT id, ' (' || id || ')' AS suffix,
+                   row_number() OVER (PARTITION BY sender_id, lower(name) ORDER BY id) AS position
+            FROM posts
+        ) AS duplicates
+        WHERE posts.id = duplicates.id AND duplicates.position > 1
+        """
+    )
+    # Backs both the duplicate check in add_post (ON CONFLICT arbiter)
+    # and the case-insensitive lookup in get_post(sender_id, name)
+    op.create_index(
+        'ix_unique_post_sender_name',
+        'posts',
+        ['sender_id', sa.text('lower(name)')],
+        unique=True
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_unique_post_sender_name', table_name='posts')
@@ -0,0 +1,30 @@
+"""add_publishing_dead_letters
+
+Revision ID: 6f2b8d4e9a13
+Revises: a17c5e9d2b84
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6f2b8d4e9a13'
+down_revision = 'a17c5e9d2b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('publish_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('posts', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.add_column('posts', sa.Column('last_error', sa.String(length=1000), nullable=True))
+    op.add_column('posts', sa.Column('is_dead', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_index('ix_posts_dead', 'posts', ['id'], postgresql_where=sa.text('is_dead'))
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_dead', table_name='posts')
+    op.drop_column('posts', 'is_dead')
+    op.drop_column('posts', 'last_error')
+    op.drop_column('posts', 'next_attempt_at')
+    op.drop_column('posts', 'publish_attempts')
@@ -0,0 +1,33 @@
+"""add_media_phash
+
+Revision ID: 7a4e2c9b5d16
+Revises: 2c8e6b0a4d71
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a4e2c9b5d16'
+down_revision = '2c8e6b0a4d71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('media_phash', sa.BigInteger(), nullable=True))
+    op.create_table(
+        'post_phash_bands',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('band', sa.SmallInteger(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id', 'band')
+    )
+    op.create_index('ix_post_phash_bands_band_value', 'post_phash_bands', ['band', 'value'])
+
+def downgrade() -> None:
+    op.drop_index('ix_post_phash_bands_band_value', table_name='post_phash_bands')
+    op.drop_table('post_phash_bands')
+    op.drop_column('posts', 'media_phash')
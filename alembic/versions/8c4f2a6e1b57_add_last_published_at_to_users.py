@@ -0,0 +1,37 @@
+"""add_last_published_at_to_users
+
+Revision ID: 8c4f2a6e1b57
+Revises: 5b7e1d9c3a42
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8c4f2a6e1b57'
+down_revision = '5b7e1d9c3a42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('last_published_at', sa.DateTime(), nullable=True))
+    # Publication time was not stored before, the newest published post's created_at
+    # is what the 24h rule used until now
+    op.execute(
+        """
+        UPDATE users
+        SET last_published_at = published.last_created_at
+        FROM (
+            SELECT sender_id, max(created_at) AS last_created_at
+            FROM posts
+            WHERE is_published
+            GROUP BY sender_id
+        ) AS published
+        WHERE users.id = published.sender_id
+        """
+    )
+
+def downgrade() -> None:
+    op.drop_column('users', 'last_published_at')
@@ -0,0 +1,34 @@
+"""add_post_deliveries
+
+Revision ID: 9d3c5a7e1f48
+Revises: 6f2b8d4e9a13
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9d3c5a7e1f48'
+down_revision = '6f2b8d4e9a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'post_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('chat_id', sa.String(length=64), nullable=False),
+        sa.Column('message_id', sa.BigInteger(), nullable=True),
+        sa.Column('is_delivered', sa.Boolean(), nullable=False),
+        sa.Column('error', sa.String(length=1000), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('post_id', 'chat_id', name='uq_post_deliveries_post_chat')
+    )
+
+def downgrade() -> None:
+    op.drop_table('post_deliveries')
@@ -0,0 +1,32 @@
+"""add_two_phase_publishing
+
+Revision ID: a17c5e9d2b84
+Revises: 3e9a7d1f6c20
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a17c5e9d2b84'
+down_revision = '3e9a7d1f6c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('publishing_started_at', sa.DateTime(), nullable=True))
+    op.add_column('posts', sa.Column('channel_message_id', sa.BigInteger(), nullable=True))
+    # Only posts in flight are indexed, the recovery pass reads them
+    op.create_index(
+        'ix_posts_publishing',
+        'posts',
+        ['publishing_started_at'],
+        postgresql_where=sa.text('publishing_started_at IS NOT NULL AND NOT is_published')
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_publishing', table_name='posts')
+    op.drop_column('posts', 'channel_message_id')
+    op.drop_column('posts', 'publishing_started_at')
@@ -0,0 +1,31 @@
+"""add_banned_words
+
+Revision ID: b3f8d1a6c925
+Revises: 7a4e2c9b5d16
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3f8d1a6c925'
+down_revision = '7a4e2c9b5d16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    banned_words = op.create_table(
+        'banned_words',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('word', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('word')
+    )
+    # The list that was hard-coded in createpost/on_event.py
+    op.bulk_insert(banned_words, [{'word': word} for word in ('мат', 'брань', 'оскорбление')])
+
+def downgrade() -> None:
+    op.drop_table('banned_words')
@@ -0,0 +1,92 @@
+"""
+Banned words check of a post text: the Aho-Corasick automaton against the
+substring search per word it replaced.
+
+    python -m benchmarks.banned_words --words 10000 --texts 200
+
+A dictionary of synthetic Russian words and post texts of about 1000 characters
+(the text limit) are generated from a fixed seed, a tenth of the texts contain a
+banned word. Build time of the automaton and per-text latency of both checks
+are printed as JSON, the substring search grows with the dictionary size,
+the automaton does not.
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+import orjson
+
+from src.adapters.moderation.banned_words import Automaton
+from benchmarks.common import git_revision, summarize
+
+SYLLABLES = [consonant + vowel for consonant in "бвгджзклмнпрстфхцчшщ" for vowel in "аеиоуыэюя"]
+
+
+def make_word(rnd: random.Random, syllables: tuple[int, int]) -> str:
+    return "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(*syllables)))
+
+
+def make_text(rnd: random.Random, vocabulary: list[str], dictionary: list[str], length: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rnd.choice(vocabulary))
+    if rnd.random() < 0.1:
+        words[rnd.randrange(len(words))] = rnd.choice(dictionary)
+    return " ".join(words)[:length]
+
+
+def substring_search(dictionary: list[str], text: str) -> list[str]:
+    # The check before the automaton: the text is lowered and scanned once per word
+    return [word for word in dictionary if word in text.lower()]
+
+
+def measure(check, texts: list[str]) -> list[float]:
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        check(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=10_000)
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--length", type=int, default=1000, help="characters per text")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    # Banned words are long enough not to show up in random text by chance
+    dictionary = list({make_word(rnd, (4, 6)): None for _ in range(args.words * 2)})[:args.words]
+    vocabulary = [make_word(rnd, (1, 4)) for _ in range(5000)]
+    texts = [make_text(rnd, vocabulary, dictionary, args.length) for _ in range(args.texts)]
+
+    started = time.perf_counter()
+    automaton = Automaton(dictionary)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Synthetic words contain no homoglyphs or repeated letters,
+    # so both checks have to flag the same texts
+    mismatches = sum(
+        bool(automaton.find(text)) != bool(substring_search(dictionary, text)) for text in texts
+    )
+
+    print(orjson.dumps({
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "words": len(dictionary),
+        "texts": len(texts),
+        "text_length": args.length,
+        "flagged_texts": sum(bool(automaton.find(text)) for text in texts),
+        "mismatches": mismatches,
+        "automaton_build_ms": round(build_ms, 3),
+        "automaton": summarize(measure(automaton.find, texts)),
+        "substring_search": summarize(measure(lambda text: substring_search(dictionary, text), texts)),
+    }, option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import statistics
+import subprocess
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from src.adapters.database.routing import RoutingSession
+
+
+def make_sessionmaker(engine: AsyncEngine) -> async_sessionmaker:
+    # Same session settings as AppProvider, so DAOs and services behave as in the bot
+    return async_sessionmaker(
+        engine,
+        autoflush=False,
+        expire_on_commit=False,
+        sync_session_class=RoutingSession
+    )
+
+
+def summarize(latencies_ms: list[float]) -> dict:
+    if not latencies_ms:
+        return {"calls": 0}
+    quantiles = statistics.quantiles(latencies_ms, n=100) if len(latencies_ms) > 1 else latencies_ms * 99
+    return {
+        "calls": len(latencies_ms),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3),
+        "min_ms": round(min(latencies_ms), 3),
+        "p50_ms": round(quantiles[49], 3),
+        "p95_ms": round(quantiles[94], 3),
+        "p99_ms": round(quantiles[98], 3),
+        "max_ms": round(max(latencies_ms), 3),
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,86 @@
+"""
+Per-call overhead of the FastQuery lookups against the ORM path they replaced.
+
+    python -m benchmarks.fastpath --iterations 5000
+
+Both paths run back to back on one session (one connection), so the difference
+is the client-side cost: compilation, ORM hydration and DTO validation.
+"""
+import argparse
+import asyncio
+import time
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.reader import reader
+from src.adapters.database.dao import PriceDAO, UserDAO
+from src.adapters.database.dto import PriceDTO, UserDTO
+from src.adapters.database.engine import build_engine
+from src.adapters.database.structures import Price, User
+from benchmarks.common import make_sessionmaker, summarize
+
+
+async def orm_user_by_tg_id(session: AsyncSession, tg_id: int) -> UserDTO | None:
+    result = await session.scalar(select(User).where(User.tg_id == tg_id))
+    return UserDTO.model_validate(result, from_attributes=True) if result else None
+
+
+async def orm_price(session: AsyncSession, name: str) -> PriceDTO | None:
+    result = await session.scalar(select(Price).where(Price.name == name))
+    return PriceDTO.model_validate(result, from_attributes=True) if result else None
+
+
+async def measure(call, iterations: int) -> list[float]:
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    config = reader()
+    engine = build_engine(config.db.url, config.db)
+    sessionmaker = make_sessionmaker(engine)
+    results = []
+    try:
+        async with sessionmaker() as session:
+            tg_id = await session.scalar(select(User.tg_id).limit(1))
+            if tg_id is None:
+                raise SystemExit("The database has no users, run python -m benchmarks.seed first")
+            pairs = {
+                "user_by_tg_id": (
+                    lambda: orm_user_by_tg_id(session, tg_id),
+                    lambda: UserDAO(session=session).get_user_by_id(user_tg_id=tg_id),
+                ),
+                "price": (
+                    lambda: orm_price(session, "default"),
+                    lambda: PriceDAO(session=session).get_price("default"),
+                ),
+            }
+            for name, (orm_call, fast_call) in pairs.items():
+                # Warm up statement caches on both paths
+                await measure(orm_call, 50)
+                await measure(fast_call, 50)
+                orm = summarize(await measure(orm_call, args.iterations))
+                fast = summarize(await measure(fast_call, args.iterations))
+                results.append({
+                    "lookup": name,
+                    "orm": orm,
+                    "fast_path": fast,
+                    "saved_per_call_us": round((orm["mean_ms"] - fast["mean_ms"]) * 1000, 1),
+                })
+    finally:
+        await engine.dispose()
+    print(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
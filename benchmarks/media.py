@@ -0,0 +1,136 @@
+"""
+Throughput of the media processing pool (see src.adapters.media.processing).
+
+    python -m benchmarks.media --images 200 --videos 200 --workers 1 2 4
+
+Synthetic camera-sized JPEGs with EXIF and minimal MP4 files are generated in a
+temporary directory and processed concurrently through MediaProcessor for every
+--workers value. Besides files per second, the event loop lag (how late a 10 ms
+ticker wakes up while the pool is busy) is reported, it stays near zero as long
+as no processing runs on the loop. Results are printed as JSON.
+"""
+import argparse
+import asyncio
+import shutil
+import struct
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+from PIL import Image
+
+from src.adapters.media.processing import MediaProcessor
+from benchmarks.common import git_revision, summarize
+
+TICK = 0.01
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def make_video(path: Path, width: int = 1280, height: int = 720, seconds: int = 30) -> None:
+    mvhd = struct.pack(">B3xIIII", 0, 0, 0, 1000, seconds * 1000) + bytes(80)
+    tkhd = struct.pack(">B3xIIIII", 0, 0, 0, 1, 0, seconds * 1000) + bytes(52) + struct.pack(">II", width << 16, height << 16)
+    path.write_bytes(
+        box(b"ftyp", b"isom" + bytes(4) + b"isomavc1")
+        + box(b"moov", box(b"mvhd", mvhd) + box(b"trak", box(b"tkhd", tkhd)))
+        + box(b"mdat", bytes(64 * 1024))
+    )
+
+
+def make_images(directory: Path, count: int, size: tuple[int, int]) -> list[Path]:
+    # One noisy source (incompressible, like a photo) copied, the pool normalizes the copies
+    source = directory / "source.jpg"
+    image = Image.effect_noise(size, 64).convert("RGB")
+    exif = Image.Exif()
+    exif[0x0112] = 6  # orientation: rotated, exif_transpose has to apply it
+    exif[0x010F] = "Benchmark camera"
+    image.save(source, "JPEG", quality=95, exif=exif)
+    paths = []
+    for i in range(count):
+        path = directory / f"image{i}.jpeg"
+        shutil.copyfile(source, path)
+        paths.append(path)
+    return paths
+
+
+async def measure_lag(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - started - TICK) * 1000)
+
+
+async def run(processor: MediaProcessor, jobs: list[tuple[Path, str]]) -> dict:
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(path: Path, media_type: str) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            await processor.process(str(path), media_type)
+        except Exception:
+            errors += 1
+            return
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path, media_type) for path, media_type in jobs))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    return {
+        "files": len(jobs),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(jobs) / elapsed, 2),
+        "latency": summarize(latencies),
+        "loop_lag_max_ms": round(max(lags, default=0.0), 3),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--videos", type=int, default=100)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--max-side", type=int, default=2560)
+    parser.add_argument("--thumbnail-side", type=int, default=320)
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            jobs = [(path, "photo") for path in make_images(directory, args.images, (args.width, args.height))]
+            for i in range(args.videos):
+                make_video(directory / f"video{i}.mp4")
+                jobs.append((directory / f"video{i}.mp4", "video"))
+            processor = MediaProcessor(workers=workers, max_image_side=args.max_side, thumbnail_side=args.thumbnail_side)
+            try:
+                if args.videos:
+                    # Start a worker process before timing
+                    await processor.process(str(directory / "video0.mp4"), "video")
+                results.append({"workers": workers, **await run(processor, jobs)})
+            finally:
+                processor.close()
+
+    print(orjson.dumps({
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "image_size": [args.width, args.height],
+        "results": results,
+    }, option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,229 @@
+"""
+Query-plan snapshots of the DAO statements against the seeded database (see benchmarks.seed).
+
+    python -m benchmarks.plans --update   # store snapshots in benchmarks/plans/
+    python -m benchmarks.plans            # compare with the stored snapshots
+
+Every statement a scenario from benchmarks.scenarios issues is captured and run
+through EXPLAIN (FORMAT JSON) with its real parameters. Snapshots keep the plan
+shape (node types, relations, indexes) and the estimated total cost. The check
+exits with status 1 when a relation that was read through an index is now read
+by a sequential scan, or when the estimated cost grows more than --cost-factor times,
+and when compiled IN-lists of different lengths no longer share one fingerprint.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import orjson
+from sqlalchemy import event, func, select, text
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from src.config.reader import reader
+from src.adapters.database.engine import build_engine
+from src.adapters.database.instrumentation import fingerprint
+from src.adapters.database.structures import Post, User
+from src.adapters.database.dao.user import USER_BY_TG_ID
+from src.adapters.database.dao.price import PRICE_BY_NAME
+from benchmarks.common import make_sessionmaker
+from benchmarks.scenarios import SCENARIOS, Keys, Scenario
+
+PLANS_DIR = Path(__file__).parent / "plans"
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan", "Bitmap Heap Scan"}
+# Plan node keys that describe the plan shape; estimates other than the total cost are dropped
+SHAPE_KEYS = ("Node Type", "Parent Relationship", "Join Type", "Strategy", "Relation Name", "Index Name", "Scan Direction")
+# FastQuery lookups run on the raw driver connection, so cursor events do not see them;
+# their statements are added to the scenarios that use them
+FAST_QUERIES = {
+    "user_dao.get_user_by_id": [(USER_BY_TG_ID, lambda keys: {"tg_id": keys.sender()[1]})],
+    "user_service.get_current_user": [(USER_BY_TG_ID, lambda keys: {"tg_id": keys.sender()[1]})],
+    "price_dao.get_price": [(PRICE_BY_NAME, lambda keys: {"name": "default"})],
+    "price_service.get_price": [(PRICE_BY_NAME, lambda keys: {"name": "default"})],
+}
+
+
+async def plan_keys(sessionmaker: async_sessionmaker) -> tuple[Keys, dict]:
+    # Fixed, typical keys instead of random ones, so the plans are reproducible:
+    # the median post id and a sender with the median number of posts
+    async with sessionmaker() as session:
+        users = await session.scalar(select(func.count(User.id)))
+        posts = await session.scalar(select(func.count(Post.id)))
+        post_id = await session.scalar(select(func.percentile_disc(0.5).within_group(Post.id)))
+        median_count = await session.scalar(text(
+            "SELECT percentile_disc(0.5) WITHIN GROUP (ORDER BY c) "
+            "FROM (SELECT count(*) AS c FROM posts GROUP BY sender_id) AS t"
+        ))
+        sender = (await session.execute(text(
+            "SELECT users.id, users.tg_id FROM users JOIN posts ON posts.sender_id = users.id "
+            "GROUP BY users.id HAVING count(*) = :count ORDER BY users.id LIMIT 1"
+        ), {"count": median_count})).first()
+        surname = await session.scalar(select(User.surname).where(User.surname.is_not(None)).order_by(User.id).limit(1))
+    if post_id is None or sender is None:
+        raise SystemExit("The database has no posts/users, run python -m benchmarks.seed first")
+    return Keys([post_id], [tuple(sender)], [surname or "Иванов"]), {"users": users, "posts": posts}
+
+
+def normalize(node: dict) -> dict:
+    shape = {key: node[key] for key in SHAPE_KEYS if key in node}
+    children = [normalize(child) for child in node.get("Plans", ())]
+    if children:
+        shape["Plans"] = children
+    return shape
+
+
+def scans(node: dict) -> set[tuple[str, str]]:
+    found = set()
+    if "Relation Name" in node:
+        found.add((node["Relation Name"], node["Node Type"]))
+    for child in node.get("Plans", ()):
+        found |= scans(child)
+    return found
+
+
+async def capture(engine: AsyncEngine, sessionmaker: async_sessionmaker,
+                  scenario: Scenario, keys: Keys) -> tuple[list[tuple[str, object]], Exception | None]:
+    statements = []
+    error = None
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    try:
+        async with sessionmaker() as session:
+            try:
+                await scenario.call(session, keys)
+            except Exception as e:
+                # The failed statement was still captured, its plan is explained below
+                error = e
+            finally:
+                await session.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+    return statements, error
+
+
+async def explain(engine: AsyncEngine, statement: str, parameters) -> dict:
+    async with engine.connect() as connection:
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+        await connection.rollback()
+    if isinstance(plan, (str, bytes)):
+        plan = orjson.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def snapshot(engine: AsyncEngine, sessionmaker: async_sessionmaker,
+                   scenario: Scenario, keys: Keys) -> tuple[list[dict], Exception | None]:
+    statements = []
+    captured, error = await capture(engine, sessionmaker, scenario, keys)
+    for query, params in FAST_QUERIES.get(scenario.name, ()):
+        sql, positions = query.compile(engine.dialect)
+        values = params(keys)
+        captured.append((sql, tuple(values[name] for name in positions)))
+    for statement, parameters in captured:
+        try:
+            plan = await explain(engine, statement, parameters)
+        except Exception as e:
+            error = error or e
+            continue
+        statements.append({
+            "sql": fingerprint(statement),
+            "total_cost": plan["Total Cost"],
+            "plan": normalize(plan),
+        })
+    return statements, error
+
+
+def check_fingerprints(dialect: Dialect) -> list[str]:
+    # Statements that differ only in IN-list length must share one fingerprint,
+    # otherwise the instrumentation stats grow with every new list length
+    found = {}
+    for length in (1, 2, 5, 100):
+        sql = str(
+            select(Post.id).where(Post.id.in_(range(length)), Post.publish_date.in_([None] * length))
+            .compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+        )
+        found.setdefault(fingerprint(sql), length)
+    if len(found) == 1:
+        return []
+    return [f"fingerprint: IN-lists of length {sorted(found.values())} give {len(found)} fingerprints"]
+
+
+def check(name: str, before: list[dict], after: list[dict], cost_factor: float) -> tuple[list[str], list[str]]:
+    regressions, changes = [], []
+    if len(before) != len(after):
+        changes.append(f"{name}: {len(before)} statements -> {len(after)}")
+    for i, (old, new) in enumerate(zip(before, after)):
+        where = f"{name}[{i}]"
+        if old["sql"] != new["sql"]:
+            changes.append(f"{where}: statement changed")
+        old_scans, new_scans = scans(old["plan"]), scans(new["plan"])
+        indexed = {relation for relation, node_type in old_scans if node_type in INDEX_SCANS}
+        for relation, node_type in new_scans - old_scans:
+            if node_type == "Seq Scan" and relation in indexed:
+                regressions.append(f"{where}: {relation} is now read by a Seq Scan instead of an index")
+        if old["total_cost"] and new["total_cost"] > old["total_cost"] * cost_factor:
+            regressions.append(
+                f"{where}: estimated cost {old['total_cost']:.2f} -> {new['total_cost']:.2f} "
+                f"(more than x{cost_factor:g})"
+            )
+        if old["plan"] != new["plan"]:
+            changes.append(f"{where}: plan shape changed")
+    return regressions, changes
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="overwrite the stored snapshots")
+    parser.add_argument("--cost-factor", type=float, default=2.0)
+    parser.add_argument("--only", help="check scenarios whose name contains this substring")
+    args = parser.parse_args()
+
+    config = reader()
+    engine = build_engine(config.db.url, config.db)
+    sessionmaker = make_sessionmaker(engine)
+    regressions, changes = check_fingerprints(engine.dialect), []
+    try:
+        keys, dataset = await plan_keys(sessionmaker)
+        PLANS_DIR.mkdir(exist_ok=True)
+        for scenario in SCENARIOS:
+            if args.only and args.only not in scenario.name:
+                continue
+            path = PLANS_DIR / f"{scenario.name}.json"
+            statements, error = await snapshot(engine, sessionmaker, scenario, keys)
+            if error is not None:
+                if args.update:
+                    raise SystemExit(f"{scenario.name} failed, snapshot not stored: {error}")
+                regressions.append(f"{scenario.name}: failed with {type(error).__name__}: {str(error).splitlines()[0]}")
+            if args.update:
+                path.write_bytes(orjson.dumps(
+                    {"dataset": dataset, "statements": statements},
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+                ))
+                continue
+            if not path.exists():
+                changes.append(f"{scenario.name}: no snapshot, run with --update")
+                continue
+            stored = orjson.loads(path.read_bytes())
+            if stored["dataset"] != dataset:
+                changes.append(f"{scenario.name}: snapshot was taken on {stored['dataset']}, database has {dataset}")
+            found, changed = check(scenario.name, stored["statements"], statements, args.cost_factor)
+            regressions += found
+            changes += changed
+    finally:
+        await engine.dispose()
+
+    for line in changes:
+        print(f"note: {line}")
+    for line in regressions:
+        print(f"REGRESSION: {line}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
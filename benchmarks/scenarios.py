@@ -0,0 +1,213 @@
+"""
+Time the real DAO and service methods against the seeded database (see benchmarks.seed).
+
+    python -m benchmarks.scenarios --iterations 500 --output bench_output.json
+    python -m benchmarks.scenarios --baseline bench_output.json
+
+Every call runs in its own session, as it would inside one bot update.
+Results are written as JSON together with the git revision and dataset size,
+--baseline prints the p50/p95 change against an earlier run.
+"""
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import orjson
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config.reader import reader
+from src.adapters.database.dao import CommonDAO, PostDAO, PriceDAO, UserDAO
+from src.adapters.database.dto import PostRequestDTO
+from src.adapters.database.engine import build_engine
+from src.adapters.database.service import PostService, PriceService, SlotService, UserService
+from src.adapters.database.structures import Post, User
+from benchmarks.common import git_revision, make_sessionmaker, summarize
+
+
+@dataclass
+class Keys:
+    post_ids: list[int]
+    senders: list[tuple[int, int]]  # (users.id, users.tg_id)
+    search_terms: list[str]
+
+    def post_id(self) -> int:
+        return random.choice(self.post_ids)
+
+    def sender(self) -> tuple[int, int]:
+        return random.choice(self.senders)
+
+
+@dataclass
+class Scenario:
+    name: str
+    call: Callable[[AsyncSession, Keys], Awaitable[object]]
+    heavy: bool = False  # full-table reads, run with fewer iterations
+    rollback: bool = False  # writes, undone after each call
+
+
+def post_service(session: AsyncSession) -> PostService:
+    return PostService(post_dao=PostDAO(session=session), common_dao=CommonDAO(session=session))
+
+
+def user_service(session: AsyncSession, tg_id: int = -1) -> UserService:
+    return UserService(user_dao=UserDAO(session=session), common_dao=CommonDAO(session=session), current_user_tg_id=tg_id)
+
+
+def price_service(session: AsyncSession) -> PriceService:
+    return PriceService(price_dao=PriceDAO(session=session), common_dao=CommonDAO(session=session))
+
+
+def slot_service(session: AsyncSession) -> SlotService:
+    return SlotService(post_dao=PostDAO(session=session), common_dao=CommonDAO(session=session))
+
+
+def new_post(sender_id: int) -> PostRequestDTO:
+    return PostRequestDTO(
+        name=f"Benchmark {time.perf_counter_ns()}",
+        text="Текст объявления",
+        media_link=None,
+        media_type=None,
+        is_publish_now=True,
+        publish_date=None,
+        is_checked=False,
+        is_paid=False,
+        created_at=datetime.now(),
+        sender_id=sender_id,
+    )
+
+
+SCENARIOS = (
+    Scenario("post_dao.get_post", lambda s, k: PostDAO(session=s).get_post(post_id=k.post_id())),
+    Scenario("post_dao.get_posts", lambda s, k: PostDAO(session=s).get_posts(k.sender()[0], is_published=False)),
+    Scenario("post_dao.get_unchecked_posts_from_user",
+             lambda s, k: PostDAO(session=s).get_unchecked_posts_from_user(k.sender()[1])),
+    Scenario("post_dao.get_last_published_post_time",
+             lambda s, k: PostDAO(session=s).get_last_published_post_time(k.sender()[0])),
+    Scenario("post_dao.get_scheduled_posts_in_time_range",
+             lambda s, k: PostDAO(session=s).get_scheduled_posts_in_time_range(
+                 k.sender()[0], datetime.now(), datetime.now() + timedelta(days=2))),
+    Scenario("post_dao.get_similar_posts",
+             lambda s, k: PostDAO(session=s).get_similar_posts(k.post_id(), max_distance=3)),
+    Scenario("post_dao.get_deliveries", lambda s, k: PostDAO(session=s).get_deliveries(k.post_id())),
+    Scenario("post_dao.get_sender_organizations",
+             lambda s, k: PostDAO(session=s).get_sender_organizations([k.sender()[0]])),
+    Scenario("post_dao.get_unchecked_posts", lambda s, k: PostDAO(session=s).get_unchecked_posts(), heavy=True),
+    Scenario("post_dao.get_approved_posts", lambda s, k: PostDAO(session=s).get_approved_posts(), heavy=True),
+    Scenario("post_dao.get_unpaid_posts", lambda s, k: PostDAO(session=s).get_unpaid_posts(), heavy=True),
+    Scenario("post_dao.add_post", lambda s, k: PostDAO(session=s).add_post(new_post(k.sender()[0])), rollback=True),
+    Scenario("user_dao.get_user_by_id", lambda s, k: UserDAO(session=s).get_user_by_id(user_tg_id=k.sender()[1])),
+    Scenario("user_dao.search_users_by_fio",
+             lambda s, k: UserDAO(session=s).search_users_by_fio(random.choice(k.search_terms)), heavy=True),
+    Scenario("user_dao.get_unapproved_users", lambda s, k: UserDAO(session=s).get_unapproved_users(), heavy=True),
+    Scenario("price_dao.get_price", lambda s, k: PriceDAO(session=s).get_price("default")),
+    Scenario("post_service.can_user_publish_now",
+             lambda s, k: post_service(s).can_user_publish_now(k.sender()[0])),
+    Scenario("post_service.can_schedule_post",
+             lambda s, k: post_service(s).can_schedule_post(k.sender()[0], datetime.now() + timedelta(days=3))),
+    Scenario("post_service.get_unpublished_posts", lambda s, k: post_service(s).get_unpublished_posts(k.sender()[0])),
+    Scenario("slot_service.get_next_free_slot", lambda s, k: slot_service(s).get_next_free_slot(k.sender()[0])),
+    Scenario("slot_service.get_blocked_days",
+             lambda s, k: slot_service(s).get_blocked_days(k.sender()[0], datetime.now().year, datetime.now().month)),
+    Scenario("slot_service.get_calendar",
+             lambda s, k: slot_service(s).get_calendar(k.sender()[0], datetime.now().year, datetime.now().month)),
+    Scenario("user_service.get_current_user", lambda s, k: user_service(s, k.sender()[1]).get_current_user()),
+    Scenario("price_service.get_price", lambda s, k: price_service(s).get_price("default")),
+)
+
+
+async def load_keys(sessionmaker: async_sessionmaker, sample: int = 5000) -> tuple[Keys, dict]:
+    async with sessionmaker() as session:
+        users = await session.scalar(select(func.count(User.id)))
+        posts = await session.scalar(select(func.count(Post.id)))
+        post_ids = list(await session.scalars(select(Post.id).order_by(func.random()).limit(sample)))
+        senders = [tuple(row) for row in await session.execute(
+            select(User.id, User.tg_id).where(User.posts.any()).order_by(func.random()).limit(sample)
+        )]
+        surnames = list(await session.scalars(select(User.surname).distinct().limit(20)))
+    if not post_ids or not senders:
+        raise SystemExit("The database has no posts/users, run python -m benchmarks.seed first")
+    search_terms = [surname for surname in surnames if surname] or ["Иван"]
+    return Keys(post_ids, senders, search_terms), {"users": users, "posts": posts}
+
+
+async def run_scenario(sessionmaker: async_sessionmaker, scenario: Scenario, keys: Keys,
+                       iterations: int, warmup: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    for i in range(warmup + iterations):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            try:
+                await scenario.call(session, keys)
+            except Exception:
+                errors += 1
+                continue
+            finally:
+                if scenario.rollback:
+                    await session.rollback()
+            if i >= warmup:
+                latencies.append((time.perf_counter() - started) * 1000)
+    return {"scenario": scenario.name, "errors": errors, **summarize(latencies)}
+
+
+def compare(results: list[dict], baseline_path: Path) -> None:
+    baseline = {item["scenario"]: item for item in orjson.loads(baseline_path.read_bytes())["results"]}
+    for item in results:
+        before = baseline.get(item["scenario"])
+        if not before or not before.get("calls") or not item.get("calls"):
+            continue
+        changes = []
+        for metric in ("p50_ms", "p95_ms"):
+            delta = (item[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            changes.append(f"{metric} {before[metric]:.3f} -> {item[metric]:.3f} ({delta:+.1f}%)")
+        print(f"{item['scenario']:<45} " + ", ".join(changes))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--heavy-iterations", type=int, default=5, help="iterations of full-table scenarios")
+    parser.add_argument("--only", help="run scenarios whose name contains this substring")
+    parser.add_argument("--output", type=Path, help="write JSON here instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="earlier JSON output to compare against")
+    args = parser.parse_args()
+
+    config = reader()
+    engine = build_engine(config.db.url, config.db)
+    sessionmaker = make_sessionmaker(engine)
+    try:
+        keys, dataset = await load_keys(sessionmaker)
+        results = []
+        for scenario in SCENARIOS:
+            if args.only and args.only not in scenario.name:
+                continue
+            iterations = args.heavy_iterations if scenario.heavy else args.iterations
+            warmup = min(args.warmup, iterations)
+            results.append(await run_scenario(sessionmaker, scenario, keys, iterations, warmup))
+    finally:
+        await engine.dispose()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "dataset": dataset,
+        "results": results,
+    }
+    output = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    if args.output:
+        args.output.write_bytes(output)
+    else:
+        print(output.decode())
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
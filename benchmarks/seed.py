@@ -0,0 +1,191 @@
+"""
+Bulk-load a synthetic dataset for the benchmarks through COPY.
+
+    python -m benchmarks.seed --users 1000000 --posts 5000000 --truncate
+
+Connection settings come from .env (DB_*). Posts are spread over users with a skew
+(a few heavy senders, a long tail) and over every lifecycle state the bot uses.
+Run it against a dedicated database, --truncate wipes users, posts and prices.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from src.config.reader import reader, DBConfig
+
+USER_COLUMNS = (
+    "id", "tg_id", "tg_username", "surname", "name", "patronymic",
+    "number", "organization", "is_admin", "is_approved",
+)
+POST_COLUMNS = (
+    "id", "name", "text", "media_link", "media_type", "created_at", "is_publish_now",
+    "publish_date", "is_checked", "is_paid", "payment_id", "is_published", "sender_id", "media_phash",
+)
+
+SURNAMES = ("Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов", "Новиков", "Фёдоров")
+NAMES = ("Иван", "Алексей", "Дмитрий", "Сергей", "Андрей", "Мария", "Анна", "Елена", "Ольга", "Наталья")
+PATRONYMICS = ("Иванович", "Сергеевич", "Андреевич", "Петрович", "Алексеевич", "Ивановна", "Сергеевна", "Андреевна")
+ORGANIZATIONS = ("МГУ", "СПбГУ", "МФТИ", "ВШЭ", "ИТМО", "МГТУ", "УрФУ", "НГУ")
+MEDIA_TYPES = (None, "photo", "video")
+
+# (is_checked, is_paid, has payment_id, is_published) and the share of posts in that state
+POST_STATES = (
+    ((True, True, True, True), 70),     # published
+    ((False, False, False, False), 10), # waiting for moderation
+    ((True, False, False, False), 5),   # approved, payment not started
+    ((True, False, True, False), 5),    # approved, waiting for payment
+    ((True, True, True, False), 10),    # paid, waiting for publication
+)
+
+BATCH_SIZE = 50_000
+
+
+async def connect(db: DBConfig) -> asyncpg.Connection:
+    return await asyncpg.connect(
+        host=db.host, port=db.port, user=db.user, password=db.password, database=db.name
+    )
+
+
+def user_records(first_id: int, count: int, rnd: random.Random):
+    for user_id in range(first_id, first_id + count):
+        yield (
+            user_id,
+            1_000_000_000 + user_id,
+            f"user{user_id}",
+            rnd.choice(SURNAMES),
+            rnd.choice(NAMES),
+            rnd.choice(PATRONYMICS),
+            f"+7{rnd.randrange(10 ** 9, 10 ** 10)}",
+            rnd.choice(ORGANIZATIONS),
+            rnd.random() < 0.001,
+            rnd.random() < 0.9,
+        )
+
+
+def post_records(first_id: int, count: int, first_user_id: int, users: int, rnd: random.Random):
+    now = datetime.now()
+    states = [state for state, _ in POST_STATES]
+    weights = [weight for _, weight in POST_STATES]
+    # Scheduled unpublished posts of one sender are spaced over 24h apart,
+    # the same rule the bot enforces when scheduling
+    scheduled_per_sender: dict[int, int] = {}
+    # Some photos are resubmissions: an earlier hash with a couple of bits flipped
+    phashes: list[int] = []
+    for post_id in range(first_id, first_id + count):
+        sender_id = first_user_id + int(users * rnd.random() ** 2)
+        is_checked, is_paid, has_payment, is_published = rnd.choices(states, weights)[0]
+        if is_published:
+            created_at = now - timedelta(minutes=rnd.randrange(60, 365 * 24 * 60))
+            is_publish_now = rnd.random() < 0.5
+            publish_date = None if is_publish_now else created_at + timedelta(hours=rnd.randrange(1, 72))
+        else:
+            created_at = now - timedelta(minutes=rnd.randrange(1, 7 * 24 * 60))
+            is_publish_now = rnd.random() < 0.7
+            publish_date = None
+            if not is_publish_now:
+                slot = scheduled_per_sender.get(sender_id, 0)
+                scheduled_per_sender[sender_id] = slot + 1
+                publish_date = now + timedelta(hours=1 + 25 * slot, minutes=rnd.randrange(60))
+        media_type = rnd.choice(MEDIA_TYPES)
+        media_phash = None
+        if media_type == "photo":
+            if phashes and rnd.random() < 0.05:
+                media_phash = rnd.choice(phashes) ^ (1 << rnd.randrange(63)) ^ (1 << rnd.randrange(63))
+            else:
+                media_phash = rnd.randrange(-(1 << 63), 1 << 63)
+            if len(phashes) < 10_000:
+                phashes.append(media_phash)
+        yield (
+            post_id,
+            f"Пост {post_id}",
+            f"Текст объявления {post_id}. " * rnd.randrange(1, 10),
+            f"media/{post_id}.{'jpg' if media_type == 'photo' else 'mp4'}" if media_type else None,
+            media_type,
+            created_at,
+            is_publish_now,
+            publish_date,
+            is_checked,
+            is_paid,
+            f"pay-{post_id}" if has_payment else None,
+            is_published,
+            sender_id,
+            media_phash,
+        )
+
+
+async def copy_batches(connection: asyncpg.Connection, table: str, columns: tuple[str, ...], records) -> int:
+    total = 0
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= BATCH_SIZE:
+            await connection.copy_records_to_table(table, records=batch, columns=columns)
+            total += len(batch)
+            batch.clear()
+            print(f"{table}: {total}", flush=True)
+    if batch:
+        await connection.copy_records_to_table(table, records=batch, columns=columns)
+        total += len(batch)
+    return total
+
+
+async def seed(db: DBConfig, users: int, posts: int, truncate: bool, seed_value: int) -> None:
+    rnd = random.Random(seed_value)
+    connection = await connect(db)
+    try:
+        if truncate:
+            await connection.execute("TRUNCATE posts, users, prices RESTART IDENTITY CASCADE")
+        first_user_id = await connection.fetchval("SELECT COALESCE(MAX(id), 0) + 1 FROM users")
+        first_post_id = await connection.fetchval("SELECT COALESCE(MAX(id), 0) + 1 FROM posts")
+
+        started = time.perf_counter()
+        async with connection.transaction():
+            await copy_batches(connection, "users", USER_COLUMNS, user_records(first_user_id, users, rnd))
+            if users:
+                await copy_batches(
+                    connection, "posts", POST_COLUMNS,
+                    post_records(first_post_id, posts, first_user_id, users, rnd)
+                )
+            # users.last_published_at is denormalized from the published posts
+            await connection.execute(
+                "UPDATE users SET last_published_at = published.last_created_at "
+                "FROM (SELECT sender_id, max(created_at) AS last_created_at FROM posts "
+                "WHERE is_published GROUP BY sender_id) AS published "
+                "WHERE users.id = published.sender_id AND users.id >= $1",
+                first_user_id
+            )
+            # The band rows DAO.add_post writes for photos
+            await connection.execute(
+                "INSERT INTO post_phash_bands (post_id, band, value) "
+                "SELECT posts.id, band, ((posts.media_phash >> (16 * band)) & 65535)::int "
+                "FROM posts, generate_series(0, 3) AS band "
+                "WHERE posts.media_phash IS NOT NULL AND posts.id >= $1",
+                first_post_id
+            )
+            # Ids were written explicitly, move the sequences past them
+            await connection.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), COALESCE(MAX(id), 1)) FROM users")
+            await connection.execute("SELECT setval(pg_get_serial_sequence('posts', 'id'), COALESCE(MAX(id), 1)) FROM posts")
+            if not await connection.fetchval("SELECT 1 FROM prices WHERE name = 'default'"):
+                await connection.execute("INSERT INTO prices (name, price) VALUES ('default', 100)")
+        await connection.execute("ANALYZE users, posts, prices, post_phash_bands")
+        print(f"Seeded {users} users and {posts} posts in {time.perf_counter() - started:.1f}s")
+    finally:
+        await connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--posts", type=int, default=500_000)
+    parser.add_argument("--truncate", action="store_true", help="wipe users, posts and prices first")
+    parser.add_argument("--seed", type=int, default=42, help="random seed, the same seed gives the same dataset")
+    args = parser.parse_args()
+    asyncio.run(seed(reader().db, args.users, args.posts, args.truncate, args.seed))
+
+
+if __name__ == "__main__":
+    main()
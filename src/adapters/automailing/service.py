@@ -1,81 +1,245 @@
 import asyncio
 import datetime
-from dishka import FromDishka, AsyncContainer
+import math
+from dishka import AsyncContainer
 import logging
-from dishka.integrations.aiogram import FromDishka
-from dishka.integrations.aiogram_dialog import inject
 
 from src.adapters.database.service import AbstractPostService
-from src.adapters.mailing.service import Mailing
+from src.adapters.database.instrumentation import QueryInstrumentation
+from src.adapters.mailing.service import Mailing, AMBIGUOUS_ERRORS
+from src.adapters.mailing.limiter import RateLimiter
+from src.adapters.mailing.uploader import MediaUploader
+from src.adapters.database.dto import PostDTO, DeliveryDTO
+from src.config.reader import PublishingConfig
 
 
 class AutoMailing:
-    def __init__(self, mailing: Mailing, container: AsyncContainer):
+    def __init__(self, mailing: Mailing, container: AsyncContainer, config: PublishingConfig, limiter: RateLimiter,
+                 uploader: MediaUploader):
         self._mailing = mailing
+        self._uploader = uploader
         self._container = container
-        self._lock = asyncio.Lock()
+        self._config = config
+        self._limiter = limiter
         self._logger = logging.getLogger(__name__)
+        self.backlog = 0  # posts due for publishing at the start of the last cycle
+        self.drain_time = 0.0  # expected seconds until the backlog is published
+        self._held: dict[int, str] = {}  # posts with an unknown outcome the hold could not be saved for
+
+    def _batch_size(self, backlog: int) -> int:
+        # A backlog left by downtime is spread over the drain window instead of one burst,
+        # never exceeding what the channel ceiling allows per cycle
+        smoothed = math.ceil(backlog * self._config.check_interval / self._config.drain_window)
+        ceiling = max(1, int(self._config.max_posts_per_minute * self._config.check_interval / 60))
+        return min(max(self._config.burst, smoothed), ceiling)
+
+    @staticmethod
+    def _due_time(post: PostDTO) -> datetime.datetime:
+        if not post.is_publish_now and post.publish_date:
+            return post.publish_date
+        return post.created_at or datetime.datetime.min
+
+    @staticmethod
+    def _delivery(post: PostDTO, chat_id: str, result: int | BaseException) -> DeliveryDTO:
+        if isinstance(result, BaseException):
+            return DeliveryDTO(
+                post_id=post.id, chat_id=chat_id, is_delivered=False,
+                error=f"{type(result).__name__}: {result}"[:1000], updated_at=datetime.datetime.now()
+            )
+        return DeliveryDTO(
+            post_id=post.id, chat_id=chat_id, message_id=result, is_delivered=True,
+            updated_at=datetime.datetime.now()
+        )
+
+    async def recover(self, stale_after: float):
+        """
+        Finish publications interrupted between the claim and mark_as_published.
+        Journaled message_ids mean those chats already have the post; when every
+        destination has it the post is marked as published, otherwise the claim is
+        released and only the missing chats are sent to on the next cycle.
+        :param stale_after: seconds since the claim (0 recovers every claim)
+        :return:
+        """
+        started_before = datetime.datetime.now() - datetime.timedelta(seconds=stale_after)
+        async with self._container() as request_container:
+            post_service = await request_container.get(AbstractPostService)
+            posts = await post_service.get_publishing_posts(started_before=started_before)
+            organizations = await post_service.get_sender_organizations([post.sender_id for post in posts])
+            for post in posts:
+                if post.id in self._held:
+                    # Never released: it is unknown whether the post was sent
+                    if await post_service.hold_publishing(post.id, self._held[post.id]) is not None:
+                        del self._held[post.id]
+                    continue
+                try:
+                    acks = await self._mailing.get_acks(post.id)
+                except Exception as e:
+                    # Without the journal it is unknown whether the post was sent, keep the claim
+                    self._logger.error(f"Cannot read publication journal of post {post.id}: {e}")
+                    continue
+                await post_service.save_deliveries(
+                    [self._delivery(post, chat_id, message_id) for chat_id, message_id in acks.items()]
+                )
+                delivered = {**await post_service.get_deliveries(post.id), **acks}
+                destinations = self._mailing.destinations(organizations.get(post.sender_id))
+                if destinations and all(chat_id in delivered for chat_id in destinations):
+                    message_id = delivered[destinations[0]]
+                    await post_service.mark_as_published(post.id, message_id)
+                    await self._mailing.clear_ack(post.id)
+                    self._logger.warning(f"Recovered published post {post.id} (message {message_id})")
+                else:
+                    await post_service.abort_publishing(post.id)
+                    self._logger.warning(f"Released unfinished publication of post {post.id}")
+
+    async def _fail(self, post_service: AbstractPostService, post: PostDTO, error: Exception):
+        # Retries back off exponentially, so a broken post stops re-uploading its media every cycle
+        attempts = post.publish_attempts + 1
+        if attempts >= self._config.max_attempts:
+            retry_at = None
+            self._logger.error(f"Failed to publish post {post.id} {attempts} times, moved to dead letters: {error}")
+        else:
+            delay = min(self._config.retry_base_delay * 2 ** (attempts - 1), self._config.retry_max_delay)
+            retry_at = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+            self._logger.error(f"Failed to publish post {post.id} (attempt {attempts}), retry in {delay:.0f}s: {error}")
+        await post_service.fail_publishing(post.id, attempts, f"{type(error).__name__}: {error}", retry_at)
+
+    async def _hold(self, post_service: AbstractPostService, post: PostDTO, error: str):
+        # The post may already be in a chat: the claim is kept, so neither the next cycle
+        # nor recover() sends it again, and an admin retries it from dead letters
+        self._logger.error(f"Outcome of publishing post {post.id} is unknown, holding it: {error}")
+        if await post_service.hold_publishing(post.id, error) is None:
+            self._held[post.id] = error
+
+    async def publish(self, post_service: AbstractPostService, post: PostDTO, organization: str | None = None) -> bool:
+        # Phase one: the conditional claim lets exactly one publisher send the post
+        if await post_service.start_publishing(post.id) is None:
+            self._logger.info(f"Post {post.id} is already being published")
+            return False
+        destinations = self._mailing.destinations(organization)
+        if not destinations:
+            await self._fail(post_service, post, ValueError("no destination chats configured"))
+            return False
+        # Chats that got the post on an earlier, partially failed attempt are not sent to again
+        delivered = await post_service.get_deliveries(post.id)
+        try:
+            delivered.update(await self._mailing.get_acks(post.id))
+        except Exception as e:
+            # Nothing is sent without knowing which chats already have the post
+            self._logger.error(f"Cannot read publication journal of post {post.id}: {e}")
+            await post_service.abort_publishing(post.id)
+            return False
+        pending = [chat_id for chat_id in destinations if chat_id not in delivered]
+        results = await self._mailing.send_to_channels(post, pending)
+        errors = []
+        unknown = []
+        journaled = True
+        for chat_id, result in results.items():
+            if isinstance(result, AMBIGUOUS_ERRORS):
+                unknown.append((chat_id, result))
+            elif isinstance(result, BaseException):
+                errors.append(result)
+            else:
+                delivered[chat_id] = result
+                journaled = await self._mailing.ack(post.id, chat_id, result) and journaled
+        saved = await post_service.save_deliveries(
+            [self._delivery(post, chat_id, result) for chat_id, result in results.items()]
+        )
+        if not journaled and not saved:
+            await self._hold(post_service, post, "Не удалось записать журнал публикации, проверьте каналы перед повтором")
+            return False
+        if unknown:
+            chat_id, error = unknown[0]
+            await self._hold(
+                post_service, post,
+                f"Неизвестно, опубликован ли пост в {chat_id}, проверьте канал перед повтором. "
+                f"{type(error).__name__}: {error}"
+            )
+            return False
+        if errors:
+            await self._fail(post_service, post, errors[0])
+            return False
+        message_id = delivered[destinations[0]]
+        # Phase two: if this fails, recover() finishes it from the journal
+        if await post_service.mark_as_published(post.id, message_id) is None:
+            self._logger.error(f"Post {post.id} was sent (message {message_id}) but not marked as published")
+            return True
+        await self._mailing.clear_ack(post.id)
+        return True
 
-    @inject
     async def check_posts(self):
-        async with self._lock:
-            try:
-                async with self._container() as request_container:
-                    post_service = await request_container.get(AbstractPostService)
-                    posts = await post_service.get_approved_posts()
+        try:
+            async with self._container() as request_container:
+                post_service = await request_container.get(AbstractPostService)
+                posts = await post_service.get_approved_posts()
+
+                current_time = datetime.datetime.now()
+                published_users = set()  # Users who already have a post in this cycle's backlog
+                due_posts = []
 
-                    current_time = datetime.datetime.now()
-                    published_users = set()  # Track users who had posts published in this cycle
+                self._logger.info(f"Checking {len(posts)} approved posts for publishing")
 
-                    self._logger.info(f"Checking {len(posts)} approved posts for publishing")
+                # Oldest due first, so senders are served in the order they have been waiting
+                for post in sorted(posts, key=self._due_time):
+                    if post.sender_id in published_users:
+                        self._logger.debug(
+                            f"Skipping post {post.id} - user {post.sender_id} already published in this cycle")
+                        continue
 
-                    for post in posts:
-                        # Skip if user already had a post published in this cycle
-                        if post.sender_id in published_users:
-                            self._logger.debug(
-                                f"Skipping post {post.id} - user {post.sender_id} already published in this cycle")
+                    if not post.is_publish_now and not (post.publish_date and post.publish_date <= current_time):
+                        continue
+
+                    if post.media_link and not post.media_file_id:
+                        file_id = await self._uploader.get_file_id(post.media_link)
+                        if file_id:
+                            post = post.model_copy(update={"media_file_id": file_id})
+                        elif self._uploader.schedule(post.media_link, post.media_type):
+                            # The upload runs in the background, the post goes out on a later cycle
+                            self._logger.debug(f"Post {post.id} is waiting for its media upload")
                             continue
 
-                        # Check if post should be published now
-                        should_publish = False
-
-                        if post.is_publish_now:
-                            # For immediate posts, check 24h limit
-                            can_publish, reason = await post_service.can_user_publish_now(post.sender_id)
-                            if can_publish:
-                                should_publish = True
-                            else:
-                                self._logger.debug(f"Post {post.id} cannot be published now: {reason}")
-                        elif post.publish_date and post.publish_date <= current_time:
-                            # For scheduled posts, check if it's time and 24h limit
-                            can_publish, reason = await post_service.can_user_publish_now(post.sender_id)
-                            if can_publish:
-                                should_publish = True
-                            else:
-                                self._logger.debug(f"Scheduled post {post.id} cannot be published: {reason}")
-
-                        if should_publish:
-                            try:
-                                self._logger.info(f"Publishing post {post.id} for user {post.sender_id}")
-                                await self._mailing.send_to_channel(post)
-                                await post_service.mark_as_published(post.id)
-                                published_users.add(post.sender_id)  # Mark user as published in this cycle
-                                self._logger.info(f"Successfully published post {post.id}")
-
-                                # Небольшая задержка между публикациями
-                                await asyncio.sleep(1)
-
-                            except Exception as e:
-                                self._logger.error(f"Failed to publish post {post.id}: {e}")
+                    # Immediate and due scheduled posts both respect the 24h limit
+                    can_publish, reason = await post_service.can_user_publish_now(post.sender_id)
+                    if not can_publish:
+                        self._logger.debug(f"Post {post.id} cannot be published now: {reason}")
+                        continue
 
-            except Exception as e:
-                self._logger.error(f"Error in check_posts: {e}")
+                    due_posts.append(post)
+                    published_users.add(post.sender_id)
+
+                batch_size = self._batch_size(len(due_posts))
+                self.backlog = len(due_posts)
+                self.drain_time = math.ceil(self.backlog / batch_size) * self._config.check_interval if due_posts else 0.0
+                if self.backlog > batch_size:
+                    self._logger.warning(
+                        f"Catching up: {self.backlog} posts due, publishing {batch_size} per cycle, "
+                        f"expected drain time {self.drain_time / 60:.0f} min"
+                    )
+
+                batch = due_posts[:batch_size]
+                organizations = await post_service.get_sender_organizations([post.sender_id for post in batch])
+                for post in batch:
+                    # One permit per post: every destination chat gets at most the ceiling per minute
+                    await self._limiter.acquire()
+                    self._logger.info(f"Publishing post {post.id} for user {post.sender_id}")
+                    if await self.publish(post_service, post, organizations.get(post.sender_id)):
+                        self.backlog -= 1
+                        self._logger.info(f"Successfully published post {post.id}")
+
+        except Exception as e:
+            self._logger.error(f"Error in check_posts: {e}")
 
     async def start(self):
         self._logger.info("Starting AutoMailing service")
+        instrumentation = await self._container.get(QueryInstrumentation)
+        # Single polling instance: every claim left at startup belongs to a dead process
+        stale_after = 0.0
         while True:
             try:
-                await self.check_posts()
+                with instrumentation.scope("AutoMailing.recover"):
+                    await self.recover(stale_after)
+                stale_after = self._config.publish_timeout
+                with instrumentation.scope("AutoMailing.check_posts"):
+                    await self.check_posts()
             except Exception as e:
                 self._logger.error(f"Error in AutoMailing main loop: {e}")
-            await asyncio.sleep(60)
\ No newline at end of file
+            await asyncio.sleep(self._config.check_interval)
\ No newline at end of file
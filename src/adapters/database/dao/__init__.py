@@ -1,4 +1,5 @@
-from .post import AbstractPostDAO, PostDAO
+from .post import AbstractPostDAO, PostDAO, ScheduleConflictError, DuplicatePostNameError
 from .common import AbstractCommonDAO, CommonDAO
 from .user import AbstractUserDAO, UserDAO
-from .price import AbstractPriceDAO, PriceDAO
\ No newline at end of file
+from .price import AbstractPriceDAO, PriceDAO
+from .banned_word import AbstractBannedWordDAO, BannedWordDAO
\ No newline at end of file
@@ -0,0 +1,105 @@
+from abc import ABC, abstractmethod
+import logging
+
+from sqlalchemy import select, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.adapters.database.structures import BannedWord
+
+
+class AbstractBannedWordDAO(ABC):
+    @abstractmethod
+    async def get_banned_words(self) -> list[str]:
+        """
+        Get all banned words
+        :return: list[str]
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_banned_words_signature(self) -> str:
+        """
+        Get a checksum of the banned words, it changes whenever a word is added, removed or edited
+        :return: str
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def count_banned_words(self) -> int:
+        """
+        Count banned words
+        :return: int
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_recent_banned_words(self, limit: int) -> list[str]:
+        """
+        Get the last added banned words
+        :param limit:
+        :return: list[str] newest first
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def add_banned_words(self, words: list[str]) -> int:
+        """
+        Add banned words, already existing ones are skipped
+        :param words:
+        :return: int number of added words
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_banned_words(self, words: list[str]) -> int:
+        """
+        Delete banned words
+        :param words:
+        :return: int number of deleted words
+        """
+        raise NotImplementedError()
+
+class BannedWordDAO(AbstractBannedWordDAO):
+    __slots__ = ("_session", "_logger")
+
+    def __init__(self, session: AsyncSession, logger: logging.Logger | None = None):
+        self._session = session
+        self._logger = logger
+
+    async def get_banned_words(self) -> list[str]:
+        result = await self._session.scalars(select(BannedWord.word).order_by(BannedWord.id))
+        return list(result)
+
+    async def get_banned_words_signature(self) -> str:
+        # One row instead of the whole list, polled to detect changes
+        words = func.string_agg(BannedWord.word, aggregate_order_by(literal("\n"), BannedWord.id))
+        return await self._session.scalar(select(func.coalesce(func.md5(words), "")))
+
+    async def count_banned_words(self) -> int:
+        return await self._session.scalar(select(func.count(BannedWord.id)))
+
+    async def get_recent_banned_words(self, limit: int) -> list[str]:
+        result = await self._session.scalars(
+            select(BannedWord.word).order_by(BannedWord.id.desc()).limit(limit)
+        )
+        return list(result)
+
+    async def add_banned_words(self, words: list[str]) -> int:
+        if not words:
+            return 0
+        result = await self._session.scalars(
+            insert(BannedWord)
+            .values([{"word": word} for word in words])
+            .on_conflict_do_nothing(index_elements=[BannedWord.word])
+            .returning(BannedWord.id)
+        )
+        return len(result.all())
+
+    async def delete_banned_words(self, words: list[str]) -> int:
+        if not words:
+            return 0
+        result = await self._session.scalars(
+            delete(BannedWord).where(BannedWord.word.in_(words)).returning(BannedWord.id)
+        )
+        return len(result.all())
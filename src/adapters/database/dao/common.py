@@ -1,13 +1,28 @@
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, AsyncExitStack
+from contextvars import ContextVar
+from typing import AsyncIterator, AsyncContextManager, Awaitable, Callable
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.adapters.database.routing import RoutingSession
+
+# Session.info key set while a unit of work is open
+UNIT_OF_WORK = "unit_of_work"
+# Session.info key set when a write failed inside savepoint() and was already undone
+SAVEPOINT_ROLLED_BACK = "unit_of_work_savepoint_rolled_back"
+# Session.info key of the callbacks waiting for the unit of work to commit
+AFTER_COMMIT = "unit_of_work_after_commit"
+# Set by UnitOfWorkMiddleware while an event is handled: sessions created meanwhile
+# enter their unit of work on this stack (see AppProvider.new_connection)
+EVENT_UNITS_OF_WORK: ContextVar[AsyncExitStack | None] = ContextVar("event_units_of_work", default=None)
+
 
 class AbstractCommonDAO(ABC):
     @abstractmethod
     async def commit(self):
         """
-        SqlAlchemy commit
+        SqlAlchemy commit (only flush inside unit_of_work, the commit happens when it ends)
         :return:
         """
         raise NotImplementedError()
@@ -15,7 +30,56 @@ class AbstractCommonDAO(ABC):
     @abstractmethod
     async def rollback(self):
         """
-        SqlAlchemy rollback
+        SqlAlchemy rollback (inside unit_of_work a write that failed in savepoint() is already undone
+        and nothing else is discarded, any other failure rolls back the whole unit of work)
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def savepoint(self) -> AsyncContextManager[None]:
+        """
+        Guard a write that is expected to fail (e.g. a constraint violation): inside unit_of_work
+        the failure is rolled back alone and the earlier writes of the unit of work are kept.
+        Does nothing outside unit_of_work, where rollback() discards the transaction anyway.
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def after_commit(self, callback: Callable[[], Awaitable[None]]):
+        """
+        Run a side effect (Redis counters, caches) once the writes are committed:
+        right away outside unit_of_work, after its commit inside it, never if it is rolled back.
+        The callback has to handle its own errors.
+        :param callback:
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def unit_of_work(self) -> AsyncContextManager[None]:
+        """
+        Run the block as one transaction: commit() only flushes inside it,
+        pending writes are committed once on exit and rolled back on error
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def release(self):
+        """
+        Return the session's connection to the pool if the current transaction is read-only.
+        The session stays usable, the next statement checks out a connection again.
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def replica(self) -> AsyncContextManager[None]:
+        """
+        Route reads inside the block to a read replica (if configured and not lagging).
+        Reads fall back to primary once the session has written anything.
         :return:
         """
         raise NotImplementedError()
@@ -28,7 +92,79 @@ class CommonDAO(AbstractCommonDAO):
         self._session = session
 
     async def commit(self) -> None:
+        if self._session.info.get(UNIT_OF_WORK):
+            await self._session.flush()
+            self._session.info.pop(SAVEPOINT_ROLLED_BACK, None)
+            return
         await self._session.commit()
 
     async def rollback(self) -> None:
-        await self._session.rollback()
\ No newline at end of file
+        if self._session.info.get(UNIT_OF_WORK) and self._session.info.pop(SAVEPOINT_ROLLED_BACK, False):
+            return
+        # Outside a unit of work, or a failure savepoint() did not contain:
+        # the earlier writes are discarded too, so are their side effects
+        self._session.info.pop(AFTER_COMMIT, None)
+        await self._session.rollback()
+
+    @asynccontextmanager
+    async def savepoint(self) -> AsyncIterator[None]:
+        if not self._session.info.get(UNIT_OF_WORK):
+            yield
+            return
+        self._session.info.pop(SAVEPOINT_ROLLED_BACK, None)
+        savepoint = await self._session.begin_nested()
+        try:
+            yield
+        except BaseException:
+            if savepoint.is_active:
+                await savepoint.rollback()
+                self._session.info[SAVEPOINT_ROLLED_BACK] = True
+            raise
+        else:
+            await savepoint.commit()
+
+    async def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        if self._session.info.get(UNIT_OF_WORK):
+            self._session.info.setdefault(AFTER_COMMIT, []).append(callback)
+            return
+        await callback()
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[None]:
+        self._session.info[UNIT_OF_WORK] = True
+        try:
+            yield
+        except BaseException:
+            await self._session.rollback()
+            raise
+        else:
+            routing = self._session.sync_session
+            pending = routing.has_pending_writes if isinstance(routing, RoutingSession) else True
+            if pending and self._session.in_transaction():
+                await self._session.commit()
+        finally:
+            self._session.info[UNIT_OF_WORK] = False
+            self._session.info.pop(SAVEPOINT_ROLLED_BACK, None)
+            callbacks = self._session.info.pop(AFTER_COMMIT, [])
+        # Reached only once the writes are committed
+        for callback in callbacks:
+            await callback()
+
+    async def release(self) -> None:
+        routing = self._session.sync_session
+        if not isinstance(routing, RoutingSession) or routing.has_pending_writes:
+            return
+        if self._session.in_transaction():
+            await self._session.close()
+
+    @asynccontextmanager
+    async def replica(self) -> AsyncIterator[None]:
+        routing = self._session.sync_session
+        if not isinstance(routing, RoutingSession) or routing.replica_selector is None:
+            yield
+            return
+        routing.replica = await routing.replica_selector.choose()
+        try:
+            yield
+        finally:
+            routing.replica = None
\ No newline at end of file
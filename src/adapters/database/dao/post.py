@@ -1,14 +1,72 @@
 from abc import ABC, abstractmethod
 import logging
-from typing import Optional, List
+from typing import Optional, List, Any
 from datetime import datetime
 
-from sqlalchemy import select, insert, update, delete, func
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, insert, update, delete, func, bindparam, text, or_, cast
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from src.adapters.database.dto import PostDTO, PostRequestDTO
-from src.adapters.database.structures import Post, User
+from src.adapters.database.dto import PostDTO, PostRequestDTO, DeliveryDTO
+from src.adapters.database.structures import Post, User, PostDelivery, PostPhashBand
+
+# Hot statements are built once, so SQLAlchemy reuses their cache key and compiled form
+# instead of re-deriving them on every call
+POSTS_BY_SENDER = select(Post).where(
+    Post.sender_id == bindparam("sender_id"),
+    Post.is_published == bindparam("is_published")
+)
+UNCHECKED_POSTS_COUNT_BY_TG_ID = (
+    select(func.count(Post.id))
+    .join(User, User.id == Post.sender_id)
+    .where(User.tg_id == bindparam("sender_tg_id"), Post.is_checked == False)
+)
+LAST_PUBLISHED_POST_TIME = select(User.last_published_at).where(User.id == bindparam("sender_id"))
+# Same expression and predicate as ex_posts_sender_schedule, so its GiST index serves the lookup
+SCHEDULED_SLOTS_BY_SENDER = (
+    select(Post.publish_date)
+    .where(
+        Post.sender_id == bindparam("sender_id"),
+        Post.publish_date.is_not(None),
+        Post.is_published == False,
+        func.tsrange(Post.publish_date, Post.publish_date + text("interval '24 hours'")).op("&&")(
+            func.tsrange(bindparam("start_time"), bindparam("end_time"))
+        )
+    )
+    .order_by(Post.publish_date)
+)
+
+EXCLUSION_VIOLATION = "23P01"
+
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 16
+
+
+class ScheduleConflictError(ValueError):
+    """
+    The post's publish time is within 24h of another scheduled post of the same sender
+    (rejected by the ex_posts_sender_schedule constraint)
+    """
+
+
+class DuplicatePostNameError(ValueError):
+    """
+    The sender already has a post with this name (case-insensitive, ix_unique_post_sender_name)
+    """
+
+
+def _raise_for_schedule_conflict(error: IntegrityError) -> None:
+    if getattr(error.orig, "sqlstate", None) == EXCLUSION_VIOLATION:
+        raise ScheduleConflictError("Another scheduled post of this sender is within 24 hours") from error
+
+
+def phash_bands(phash: int) -> list[int]:
+    # Slices of the two's complement bits, the same as (media_phash >> 16 * band) & 65535 in SQL
+    mask = (1 << PHASH_BAND_BITS) - 1
+    return [(phash >> (PHASH_BAND_BITS * band)) & mask for band in range(PHASH_BANDS)]
 
 
 class AbstractPostDAO(ABC):
@@ -35,11 +93,20 @@ class AbstractPostDAO(ABC):
         raise NotImplementedError()
 
     @abstractmethod
-    async def get_unchecked_posts_from_user(self, sender_tg_id: int) -> bool:
+    async def get_unchecked_posts_from_user(self, sender_tg_id: int, limit: int = 3) -> bool:
         """
         Get unchecked posts from user
         :param sender_tg_id:
-        :return: bool True if user has less than 3 unchecked posts
+        :param limit: max number of posts waiting for moderation
+        :return: bool True if user has less than limit unchecked posts
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_unchecked_posts_counts(self) -> dict[int, int]:
+        """
+        Count unchecked posts of every sender
+        :return: dict[int, int] sender_id -> number of unchecked posts
         """
         raise NotImplementedError()
 
@@ -57,6 +124,7 @@ class AbstractPostDAO(ABC):
         Add post
         :param post: PostRequestDTO
         :return: PostDTO | None
+        :raises DuplicatePostNameError: the sender already has a post with this name
         """
         raise NotImplementedError()
 
@@ -71,11 +139,24 @@ class AbstractPostDAO(ABC):
         raise NotImplementedError()
 
     @abstractmethod
-    async def delete_post(self, post_id: int) -> bool:
+    async def transition_post(self, post_id: int, values: dict[str, Any],
+                              expected: dict[str, Any]) -> PostDTO | None:
+        """
+        Update post only if it is still in the expected state (single conditional UPDATE)
+        :param post_id:
+        :param values: column values to set
+        :param expected: column values the post must currently have
+        :return: PostDTO | None (None if post not found or not in the expected state)
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_post(self, post_id: int, expected: dict[str, Any] | None = None) -> PostDTO | None:
         """
-        Delete post
+        Delete post (only if it is in the expected state, when passed)
         :param post_id:
-        :return: bool
+        :param expected: column values the post must currently have
+        :return: PostDTO | None deleted post
         """
         raise NotImplementedError()
 
@@ -87,6 +168,71 @@ class AbstractPostDAO(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    async def get_publishing_posts(self, started_before: datetime) -> list[PostDTO]:
+        """
+        Get posts claimed for publishing but not marked as published
+        (held posts with an unknown outcome are left to an admin)
+        :param started_before: only claims older than this
+        :return: list[PostDTO]
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_dead_posts(self) -> list[PostDTO]:
+        """
+        Get posts whose publication failed too many times
+        :return: list[PostDTO]
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def revive_dead_posts(self) -> int:
+        """
+        Return all dead-lettered posts to the publishing queue with reset attempts
+        (a kept publishing claim is released)
+        :return: int number of posts
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_sender_organizations(self, sender_ids: list[int]) -> dict[int, str | None]:
+        """
+        Get organizations of post senders, they route posts to destination chats
+        :param sender_ids: users.id of senders
+        :return: dict[int, str | None] organization by sender id
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_deliveries(self, post_id: int) -> dict[str, int]:
+        """
+        Get chats the post has already been delivered to
+        :param post_id:
+        :return: dict[str, int] message_id by chat id
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def save_deliveries(self, deliveries: list[DeliveryDTO]) -> None:
+        """
+        Insert or update delivery statuses, unique by post and chat
+        :param deliveries:
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_similar_posts(self, post_id: int, max_distance: int, limit: int = 5) -> list[tuple[PostDTO, int]]:
+        """
+        Get other posts whose photo is a near-duplicate of the post's photo
+        :param post_id:
+        :param max_distance: max differing bits of the perceptual hashes (below PHASH_BANDS)
+        :param limit:
+        :return: list[tuple[PostDTO, int]] posts with the distance, closest first
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     async def get_unpaid_posts(self) -> list[PostDTO]:
         """
@@ -104,6 +250,28 @@ class AbstractPostDAO(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    async def set_last_published_post_time(self, sender_id: int, published_at: datetime) -> None:
+        """
+        Store the time of the last published post on the user (never moves it back)
+        :param sender_id: user id
+        :param published_at:
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_scheduled_publish_dates(self, sender_id: int, start_time: datetime,
+                                          end_time: datetime) -> list[datetime]:
+        """
+        Get publish dates of scheduled unpublished posts whose 24h slot overlaps the time range
+        :param sender_id: user id
+        :param start_time: start of time range
+        :param end_time: end of time range
+        :return: list of datetime in ascending order
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     async def get_scheduled_posts_in_time_range(self, sender_id: int, start_time: datetime, end_time: datetime) -> list[
         PostDTO]:
@@ -140,26 +308,30 @@ class PostDAO(AbstractPostDAO):
         return PostDTO.model_validate(result, from_attributes=True) if result else None
 
     async def get_posts(self, sender_id: int, is_published: bool) -> list[PostDTO]:
-        stmt = select(Post).where(
-            Post.sender_id == sender_id,
-            Post.is_published == is_published
+        result = await self._session.scalars(
+            POSTS_BY_SENDER,
+            {"sender_id": sender_id, "is_published": is_published}
         )
-        result = await self._session.scalars(stmt)
         posts = result.all()
 
         return [PostDTO.model_validate(post, from_attributes=True) for post in posts]
 
-    async def get_unchecked_posts_from_user(self, sender_tg_id: int) -> bool:
-        user_stmt = select(User).where(User.tg_id == sender_tg_id)
-        user_result = await self._session.scalar(user_stmt)
-        if not user_result:
-            return True
-        stmt = select(func.count(Post.id)).where(
-            Post.sender_id == user_result.id,
-            Post.is_checked == False
+    async def get_unchecked_posts_from_user(self, sender_tg_id: int, limit: int = 3) -> bool:
+        # An unknown user simply has no posts, so one joined count covers both cases
+        count = await self._session.scalar(
+            UNCHECKED_POSTS_COUNT_BY_TG_ID,
+            {"sender_tg_id": sender_tg_id}
         )
-        count = await self._session.scalar(stmt)
-        return count < 3
+        return count < limit
+
+    async def get_unchecked_posts_counts(self) -> dict[int, int]:
+        stmt = (
+            select(Post.sender_id, func.count(Post.id))
+            .where(Post.is_checked == False)
+            .group_by(Post.sender_id)
+        )
+        result = await self._session.execute(stmt)
+        return {sender_id: count for sender_id, count in result}
 
     async def get_unchecked_posts(self) -> list[PostDTO]:
         stmt = select(Post).where(
@@ -170,43 +342,73 @@ class PostDAO(AbstractPostDAO):
         return [PostDTO.model_validate(post, from_attributes=True) for post in posts]
 
     async def add_post(self, post: PostRequestDTO) -> PostDTO | None:
-        existing_post = await self._session.scalar(
-            select(Post).where(
-                Post.sender_id == post.sender_id,
-                func.lower(Post.name) == func.lower(post.name)
-            )
-        )
-        if existing_post:
-            raise ValueError("Post with this name already exists for this sender")
+        # ix_unique_post_sender_name is the conflict arbiter, so a duplicate name
+        # (even from a concurrent submission) yields no row instead of an error
+        # The schedule exclusion constraint is not an arbiter, its violation still raises
         stmt = (
-            insert(Post)
+            pg_insert(Post)
             .values(**post.model_dump())
+            .on_conflict_do_nothing(index_elements=[Post.sender_id, func.lower(Post.name)])
             .returning(Post)
         )
-        result = await self._session.scalar(stmt)
+        try:
+            result = await self._session.scalar(stmt)
+        except IntegrityError as e:
+            _raise_for_schedule_conflict(e)
+            raise
+        if not result:
+            raise DuplicatePostNameError("Post with this name already exists for this sender")
+        if result.media_phash is not None:
+            await self._set_phash_bands(result.id, result.media_phash)
         return PostDTO.model_validate(result, from_attributes=True)
 
     async def update_post(self, post_id: int, post: PostRequestDTO) -> PostDTO | None:
-        ex_post = await self._session.scalar(
-            select(Post).where(
-                Post.id == post_id
-            )
+        stmt = (
+            update(Post)
+            .where(Post.id == post_id)
+            .values(**post.model_dump(exclude_unset=True))
+            .returning(Post)
         )
-        if not ex_post:
+        try:
+            result = await self._session.scalar(stmt)
+        except IntegrityError as e:
+            _raise_for_schedule_conflict(e)
+            raise
+        if not result:
             raise ValueError(f"Post with id {post_id} not found")
+        if "media_phash" in post.model_fields_set:
+            await self._session.execute(delete(PostPhashBand).where(PostPhashBand.post_id == post_id))
+            if result.media_phash is not None:
+                await self._set_phash_bands(post_id, result.media_phash)
+        return PostDTO.model_validate(result, from_attributes=True)
+
+    async def _set_phash_bands(self, post_id: int, phash: int) -> None:
+        await self._session.execute(
+            insert(PostPhashBand),
+            [{"post_id": post_id, "band": band, "value": value} for band, value in enumerate(phash_bands(phash))]
+        )
+
+    async def transition_post(self, post_id: int, values: dict[str, Any],
+                              expected: dict[str, Any]) -> PostDTO | None:
         stmt = (
             update(Post)
             .where(Post.id == post_id)
-            .values(**post.model_dump(exclude_unset=True))
+            .filter_by(**expected)
+            .values(**values)
             .returning(Post)
         )
         result = await self._session.scalar(stmt)
-        return PostDTO.model_validate(result, from_attributes=True)
+        return PostDTO.model_validate(result, from_attributes=True) if result else None
 
-    async def delete_post(self, post_id: int) -> bool:
-        stmt = delete(Post).where(Post.id == post_id)
-        result = await self._session.execute(stmt)
-        return result.rowcount > 0
+    async def delete_post(self, post_id: int, expected: dict[str, Any] | None = None) -> PostDTO | None:
+        stmt = (
+            delete(Post)
+            .where(Post.id == post_id)
+            .filter_by(**(expected or {}))
+            .returning(Post)
+        )
+        result = await self._session.scalar(stmt)
+        return PostDTO.model_validate(result, from_attributes=True) if result else None
 
     async def get_approved_posts(self) -> list[PostDTO]:
         result = await self._session.scalars(
@@ -214,10 +416,97 @@ class PostDAO(AbstractPostDAO):
             .where(Post.is_checked == True)
             .where(Post.is_paid == True)
             .where(Post.is_published == False)
+            .where(Post.publishing_started_at.is_(None))
+            .where(Post.is_dead == False)
+            .where(or_(Post.next_attempt_at.is_(None), Post.next_attempt_at <= datetime.now()))
         )
         posts = result.all()
         return [PostDTO.model_validate(post, from_attributes=True) for post in posts]
 
+    async def get_publishing_posts(self, started_before: datetime) -> list[PostDTO]:
+        result = await self._session.scalars(
+            select(Post)
+            .where(Post.publishing_started_at.is_not(None))
+            .where(Post.publishing_started_at <= started_before)
+            .where(Post.is_published == False)
+            .where(Post.is_dead == False)
+        )
+        return [PostDTO.model_validate(post, from_attributes=True) for post in result.all()]
+
+    async def get_dead_posts(self) -> list[PostDTO]:
+        result = await self._session.scalars(
+            select(Post)
+            .where(Post.is_dead == True)
+            .order_by(Post.id)
+        )
+        return [PostDTO.model_validate(post, from_attributes=True) for post in result.all()]
+
+    async def revive_dead_posts(self) -> int:
+        result = await self._session.scalars(
+            update(Post)
+            .where(Post.is_dead == True)
+            .values(
+                is_dead=False, publish_attempts=0, next_attempt_at=None, last_error=None, publishing_started_at=None
+            )
+            .returning(Post.id)
+        )
+        return len(result.all())
+
+    async def get_sender_organizations(self, sender_ids: list[int]) -> dict[int, str | None]:
+        if not sender_ids:
+            return {}
+        result = await self._session.execute(
+            select(User.id, User.organization).where(User.id.in_(set(sender_ids)))
+        )
+        return {user_id: organization for user_id, organization in result}
+
+    async def get_deliveries(self, post_id: int) -> dict[str, int]:
+        result = await self._session.execute(
+            select(PostDelivery.chat_id, PostDelivery.message_id)
+            .where(PostDelivery.post_id == post_id)
+            .where(PostDelivery.is_delivered == True)
+        )
+        return {chat_id: message_id for chat_id, message_id in result}
+
+    async def save_deliveries(self, deliveries: list[DeliveryDTO]) -> None:
+        if not deliveries:
+            return
+        stmt = pg_insert(PostDelivery).values([delivery.model_dump() for delivery in deliveries])
+        await self._session.execute(
+            stmt.on_conflict_do_update(
+                constraint='uq_post_deliveries_post_chat',
+                set_={
+                    "message_id": stmt.excluded.message_id,
+                    "is_delivered": stmt.excluded.is_delivered,
+                    "error": stmt.excluded.error,
+                    "updated_at": stmt.excluded.updated_at
+                }
+            )
+        )
+
+    async def get_similar_posts(self, post_id: int, max_distance: int, limit: int = 5) -> list[tuple[PostDTO, int]]:
+        if max_distance >= PHASH_BANDS:
+            # A hash differing in one bit per band shares none of them, it would be missed silently
+            raise ValueError(f"{PHASH_BANDS} hash bands find near-duplicates within {PHASH_BANDS - 1} bits only")
+        # Candidates share a band value with the post (an index lookup per band),
+        # only they are compared bit by bit
+        source, other = aliased(PostPhashBand), aliased(PostPhashBand)
+        candidates = (
+            select(other.post_id)
+            .join(source, (source.band == other.band) & (source.value == other.value))
+            .where(source.post_id == post_id, other.post_id != post_id)
+        )
+        source_hash = select(Post.media_phash).where(Post.id == post_id).scalar_subquery()
+        distance = func.bit_count(cast(Post.media_phash.op("#")(source_hash), BIT(64)))
+        result = await self._session.execute(
+            select(Post, distance.label("distance"))
+            .where(Post.id.in_(candidates))
+            .where(distance <= max_distance)
+            .order_by(distance, Post.id.desc())
+            .limit(limit)
+        )
+        return [(PostDTO.model_validate(post, from_attributes=True), distance) for post, distance in result]
+
     async def get_unpaid_posts(self) -> list[PostDTO]:
         result = await self._session.execute(
             select(Post)
@@ -228,13 +517,23 @@ class PostDAO(AbstractPostDAO):
         return [PostDTO.model_validate(post, from_attributes=True) for post in posts]
 
     async def get_last_published_post_time(self, sender_id: int) -> datetime | None:
-        stmt = select(Post.created_at).where(
-            Post.sender_id == sender_id,
-            Post.is_published == True
-        ).order_by(Post.created_at.desc()).limit(1)
+        return await self._session.scalar(LAST_PUBLISHED_POST_TIME, {"sender_id": sender_id})
 
-        result = await self._session.scalar(stmt)
-        return result
+    async def set_last_published_post_time(self, sender_id: int, published_at: datetime) -> None:
+        # GREATEST skips NULL, so the first publication just sets the value
+        await self._session.execute(
+            update(User)
+            .where(User.id == sender_id)
+            .values(last_published_at=func.greatest(User.last_published_at, published_at))
+        )
+
+    async def get_scheduled_publish_dates(self, sender_id: int, start_time: datetime,
+                                          end_time: datetime) -> list[datetime]:
+        result = await self._session.scalars(
+            SCHEDULED_SLOTS_BY_SENDER,
+            {"sender_id": sender_id, "start_time": start_time, "end_time": end_time}
+        )
+        return list(result)
 
     async def get_scheduled_posts_in_time_range(self, sender_id: int, start_time: datetime, end_time: datetime) -> list[
         PostDTO]:
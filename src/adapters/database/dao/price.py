@@ -2,12 +2,15 @@ from abc import ABC, abstractmethod
 import logging
 from typing import Optional, List
 
-from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy import select, insert, update, delete, func, bindparam
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.adapters.database.dto import PriceDTO, PriceRequestDTO
 from src.adapters.database.structures import Post, User, Price
+from src.adapters.database.fastpath import FastQuery
+
+PRICE_BY_NAME = FastQuery(select(Price.__table__).where(Price.name == bindparam("name")))
 
 class AbstractPriceDAO(ABC):
     @abstractmethod
@@ -66,13 +69,11 @@ class PriceDAO(AbstractPriceDAO):
         return PriceDTO.model_validate(result, from_attributes=True)
 
     async def get_price(self, name: str) -> PriceDTO | None:
-        stmt = select(Price).where(
-            Price.name == name
-        )
-        result = await self._session.scalar(stmt)
-        if not result:
+        row = await PRICE_BY_NAME.fetch_one(self._session, name=name)
+        if not row:
             return []
-        return PriceDTO.model_validate(result, from_attributes=True)
+        # price is a double precision column, the DTO holds whole roubles
+        return PriceDTO.model_construct(id=row["id"], name=row["name"], price=int(row["price"]))
 
     async def change_price(self, name: str, price: int) -> PriceDTO | None:
         stmt = (
@@ -2,12 +2,16 @@ from typing import Optional
 from abc import ABC, abstractmethod
 import logging
 
-from sqlalchemy import select, delete, insert, update, func
+from sqlalchemy import select, delete, insert, update, func, bindparam
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.adapters.database.dto import UserRequestDTO, UserDTO
 from src.adapters.database.structures import User
+from src.adapters.database.fastpath import FastQuery
+
+# Runs on nearly every update (current user lookup)
+USER_BY_TG_ID = FastQuery(select(User.__table__).where(User.tg_id == bindparam("tg_id")))
 
 
 class AbstractUserDAO(ABC):
@@ -102,6 +106,9 @@ class UserDAO(AbstractUserDAO):
     async def get_user_by_id(self, user_id: int | None = None, user_tg_id: int | None = None) -> UserDTO | None:
         if not user_id and not user_tg_id:
             raise ValueError("One of the parameters (user_id or user_tg_id) must be passed")
+        if user_tg_id and not user_id:
+            row = await USER_BY_TG_ID.fetch_one(self._session, tg_id=user_tg_id)
+            return UserDTO.model_construct(**row) if row else None
         stmt = select(User)
         if user_id:
             stmt = stmt.where(User.id == user_id)
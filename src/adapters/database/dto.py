@@ -20,6 +20,8 @@ class PostRequestDTO(BaseModel):
     text: str # content (text) of post
     media_link: str | None # link to image of post (if exists), the image itself is stored in memory
     media_type: str | None # type of media (image, video)
+    media_file_id: str | None = None # Telegram file_id of the media, sent instead of uploading the file
+    media_phash: int | None = None # perceptual hash (dHash) of the photo
     is_publish_now: bool # is post published now or not (after moderation)
     publish_date: datetime | None # date of publishing post (if user choose publish then)
     is_checked: bool # is post moderated by admin or not
@@ -32,6 +34,20 @@ class PostRequestDTO(BaseModel):
 
 class PostDTO(PostRequestDTO):
     id: int
+    publishing_started_at: datetime | None = None # set while the post is being sent to the channel
+    channel_message_id: int | None = None # message_id of the published channel message
+    publish_attempts: int = 0 # failed publication attempts
+    next_attempt_at: datetime | None = None # publication is not retried before this time
+    last_error: str | None = None # error of the last failed publication attempt
+    is_dead: bool = False # publication gave up after too many attempts
+
+class DeliveryDTO(BaseModel):
+    post_id: int # id of published post
+    chat_id: str # destination chat
+    message_id: int | None = None # message_id in the destination chat (if delivered)
+    is_delivered: bool # is post delivered to the chat or not
+    error: str | None = None # error of the last failed delivery
+    updated_at: datetime
 
 class PriceRequestDTO(BaseModel):
     name: str | None
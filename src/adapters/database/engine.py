@@ -0,0 +1,45 @@
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.config.reader import DBConfig
+from src.adapters.database.pool import InstrumentedPool
+
+
+def _statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
+def build_engine(url: str, db: DBConfig) -> AsyncEngine:
+    """
+    Create an asyncpg engine with the pool settings from DBConfig
+    :param url: DSN of the server (primary, replica or pooler)
+    :param db: DBConfig
+    :return: AsyncEngine
+    """
+    if db.pgbouncer:
+        # PgBouncer in transaction mode hands each transaction to any server connection,
+        # so prepared statements must not be cached and their names must never repeat.
+        # It also rejects unknown startup parameters, so jit has to be set on the
+        # database/role side (ALTER DATABASE ... SET jit = off) instead.
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": _statement_name,
+        }
+    else:
+        connect_args = {
+            "statement_cache_size": db.statement_cache_size,
+            "prepared_statement_cache_size": db.prepared_statement_cache_size,
+            "server_settings": {"jit": "off"},
+        }
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=db.pool_size,
+        pool_timeout=db.pool_timeout,
+        pool_recycle=db.pool_recycle,
+        pool_pre_ping=db.pool_pre_ping,
+        max_overflow=db.max_overflow,
+        connect_args=connect_args,
+    )
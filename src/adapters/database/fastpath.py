@@ -0,0 +1,44 @@
+from typing import Mapping
+
+from sqlalchemy import Select
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class FastQuery:
+    """
+    Single-row SELECT for the hottest lookups, executed straight on the asyncpg
+    connection behind the session: no ORM statement compilation, identity map or
+    entity hydration. SQL is compiled once per dialect. The connection is taken from
+    the session, so the lookup shares its transaction (and replica routing).
+    Note that it bypasses SQLAlchemy cursor events (QueryInstrumentation).
+    """
+
+    __slots__ = ("_stmt", "_compiled")
+
+    def __init__(self, stmt: Select):
+        self._stmt = stmt
+        self._compiled: dict[str, tuple[str, tuple[str, ...]]] = {}
+
+    def compile(self, dialect: Dialect) -> tuple[str, tuple[str, ...]]:
+        """
+        :param dialect:
+        :return: SQL string and the bindparam names in positional order
+        """
+        compiled = self._compiled.get(dialect.name)
+        if compiled is None:
+            statement = self._stmt.compile(dialect=dialect)
+            compiled = self._compiled[dialect.name] = (statement.string, tuple(statement.positiontup))
+        return compiled
+
+    async def fetch_one(self, session: AsyncSession, **params) -> Mapping | None:
+        """
+        Run the statement with the given bind parameters
+        :param session:
+        :param params: values of the statement's bindparams
+        :return: asyncpg Record (a mapping of column name to value) | None
+        """
+        connection = await session.connection(bind_arguments={"clause": self._stmt})
+        sql, positions = self.compile(connection.dialect)
+        raw_connection = await connection.get_raw_connection()
+        return await raw_connection.driver_connection.fetchrow(sql, *(params[name] for name in positions))
@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+\b|\?")
+# asyncpg renders a cast after every bound parameter: $1::INTEGER, $2::TIMESTAMP WITHOUT TIME ZONE
+_CAST_RE = re.compile(
+    r"(?<=\?)::(?:DOUBLE PRECISION|CHARACTER VARYING|\w+)(?:\(\s*\d+(?:\s*,\s*\d+)?\s*\))?"
+    r"(?: WITH(?:OUT)? TIME ZONE)?(?:\[\])*"
+)
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+# Longest repr of bound parameters written to the slow query log
+MAX_PARAMS_LOG_LENGTH = 500
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    Normalize SQL so that statements differing only in literals,
+    bound parameters or IN-list length share a fingerprint
+    :param statement: SQL string
+    :return: str
+    """
+    sql = _STRING_RE.sub("?", statement)
+    sql = _PARAM_RE.sub("?", sql)
+    sql = _CAST_RE.sub("", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _LIST_RE.sub("(...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+class FingerprintStats:
+    __slots__ = ("count", "total_ms", "max_ms", "cache_hits", "cache_misses", "uncached")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        # SQLAlchemy compiled cache: reused, compiled now, or not cacheable at all
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.uncached = 0
+
+    def observe(self, elapsed_ms: float, cache_hit: CacheStats | None) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if cache_hit is CacheStats.CACHE_HIT:
+            self.cache_hits += 1
+        elif cache_hit is CacheStats.CACHE_MISS:
+            self.cache_misses += 1
+        elif cache_hit is not None:
+            self.uncached += 1
+
+    @property
+    def cache_hit_rate(self) -> float | None:
+        compiled = self.cache_hits + self.cache_misses + self.uncached
+        return self.cache_hits / compiled if compiled else None
+
+
+class QueryScope:
+    """
+    Queries issued while handling one unit of work (a Telegram update, a background cycle)
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.fingerprints: Counter[str] = Counter()
+
+    def observe(self, sql_fingerprint: str) -> None:
+        self.count += 1
+        self.fingerprints[sql_fingerprint] += 1
+
+
+_current_scope: ContextVar[QueryScope | None] = ContextVar("query_scope", default=None)
+
+
+class QueryInstrumentation:
+    """
+    Cursor-level statement timing for the engines it is attached to.
+    Keeps per-fingerprint latency stats, logs slow statements with their parameters
+    and warns when a scope (see scope()) issues more queries than the budget allows.
+    """
+
+    def __init__(self, slow_query_ms: float, query_budget: int, stats_interval: float):
+        self._slow_query_ms = slow_query_ms
+        self._query_budget = query_budget
+        self._stats_interval = stats_interval
+        self.stats: dict[str, FingerprintStats] = {}
+        self._logger = logging.getLogger(__name__)
+
+    def attach(self, engine: AsyncEngine) -> None:
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, not the pooled connection: a failed statement
+        # never reaches after_cursor_execute and would leave its start time behind
+        context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._query_started) * 1000
+        sql_fingerprint = fingerprint(statement)
+        stats = self.stats.get(sql_fingerprint)
+        if stats is None:
+            stats = self.stats[sql_fingerprint] = FingerprintStats()
+        # exec_driver_sql statements have no compiled form to cache
+        stats.observe(elapsed_ms, context.cache_hit if context.compiled is not None else None)
+
+        scope = _current_scope.get()
+        if scope is not None:
+            scope.observe(sql_fingerprint)
+
+        if elapsed_ms >= self._slow_query_ms:
+            self._logger.warning(
+                "Slow query (%.1f ms): %s; parameters: %s",
+                elapsed_ms, _SPACE_RE.sub(" ", statement), repr(parameters)[:MAX_PARAMS_LOG_LENGTH]
+            )
+
+    @contextmanager
+    def scope(self, label: str) -> Iterator[QueryScope]:
+        """
+        Count the queries issued inside the block (including awaited coroutines)
+        :param label: what is being handled, used in the budget warning
+        :return: QueryScope
+        """
+        scope = QueryScope(label)
+        token = _current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _current_scope.reset(token)
+            if scope.count > self._query_budget:
+                repeated = ", ".join(
+                    f"{count}x {sql[:120]}" for sql, count in scope.fingerprints.most_common(3)
+                )
+                self._logger.warning(
+                    "%s issued %d queries (budget %d), most repeated: %s",
+                    label, scope.count, self._query_budget, repeated
+                )
+
+    def top(self, limit: int = 10) -> list[tuple[str, FingerprintStats]]:
+        return sorted(self.stats.items(), key=lambda item: item[1].total_ms, reverse=True)[:limit]
+
+    def report(self) -> None:
+        for sql, stats in self.top():
+            hit_rate = stats.cache_hit_rate
+            self._logger.info(
+                "Query stats: %d calls, %.1f ms total, %.2f ms avg, %.1f ms max, compiled cache hits %s: %s",
+                stats.count, stats.total_ms, stats.total_ms / stats.count, stats.max_ms,
+                f"{hit_rate:.0%}" if hit_rate is not None else "n/a", sql[:300]
+            )
+        recompiled = [sql for sql, stats in self.stats.items() if stats.uncached]
+        if recompiled:
+            self._logger.warning("Statements compiled on every call (no cache key): %s", recompiled[:5])
+
+    async def start(self):
+        self._logger.info("Starting QueryInstrumentation reporting")
+        while True:
+            await asyncio.sleep(self._stats_interval)
+            try:
+                self.report()
+            except Exception as e:
+                self._logger.error("Error in QueryInstrumentation report: %s", e)
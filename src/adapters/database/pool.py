@@ -0,0 +1,130 @@
+import asyncio
+import bisect
+import logging
+import time
+
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Upper bounds (ms) of the checkout wait histogram buckets, the last bucket is +Inf
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """
+    Checkout wait-time histogram and counters of a single connection pool
+    """
+
+    def __init__(self):
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_count = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.timeouts = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        wait_ms = seconds * 1000
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+        self.wait_count += 1
+        self.wait_sum_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def observe_timeout(self) -> None:
+        self.timeouts += 1
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records how long each checkout waited for a connection
+    and how many checkouts timed out (pool_timeout exceeded)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "InstrumentedPool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+
+def pool_snapshot(engine: AsyncEngine) -> dict:
+    """
+    Current gauges and accumulated metrics of the engine's pool
+    :param engine:
+    :return: dict
+    """
+    pool = engine.pool
+    snapshot = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics:
+        bounds = [str(bound) for bound in WAIT_BUCKETS_MS] + ["+Inf"]
+        snapshot.update(
+            wait_count=metrics.wait_count,
+            wait_avg_ms=round(metrics.wait_sum_ms / metrics.wait_count, 2) if metrics.wait_count else 0.0,
+            wait_max_ms=round(metrics.wait_max_ms, 2),
+            wait_histogram_ms=dict(zip(bounds, metrics.wait_buckets)),
+            timeouts=metrics.timeouts,
+        )
+    return snapshot
+
+
+class PoolMonitor:
+    """
+    Background liveness check and saturation reporting for the database pools.
+    A failed probe on a dead server invalidates the whole pool (SQLAlchemy treats it
+    as a disconnect), so stale connections are replaced without pre-pinging every checkout.
+    """
+
+    def __init__(self, engines: dict[str, AsyncEngine], liveness_interval: float, stats_interval: float):
+        self._engines = engines
+        self._liveness_interval = liveness_interval
+        self._stats_interval = stats_interval
+        self._logger = logging.getLogger(__name__)
+
+    async def check_liveness(self) -> None:
+        for name, engine in self._engines.items():
+            try:
+                async with engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+            except Exception as e:
+                self._logger.error("Database %s liveness check failed: %s", name, e)
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: pool_snapshot(engine) for name, engine in self._engines.items()}
+
+    def report(self) -> None:
+        for name, snapshot in self.snapshot().items():
+            self._logger.info("Pool %s: %s", name, snapshot)
+            if snapshot["overflow"] > 0:
+                self._logger.warning("Pool %s is saturated, overflow connections in use: %s", name, snapshot["overflow"])
+
+    async def start(self):
+        self._logger.info("Starting PoolMonitor service")
+        last_report = time.monotonic()
+        while True:
+            try:
+                await self.check_liveness()
+                if time.monotonic() - last_report >= self._stats_interval:
+                    self.report()
+                    last_report = time.monotonic()
+            except Exception as e:
+                self._logger.error("Error in PoolMonitor main loop: %s", e)
+            await asyncio.sleep(self._liveness_interval)
@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import GenerativeSelect
+
+# Replication lag in seconds; 0 when the replica has replayed everything it received
+# (or when the server is not in recovery at all, e.g. a second standalone instance)
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+# A replica that does not answer the lag query in time is treated as unavailable
+REPLICA_PROBE_TIMEOUT = 2.0
+
+
+class ReplicaSelector:
+    """
+    Picks a read replica whose replication lag is within the allowed limit.
+    Lag is measured lazily, at most once per check_interval for each replica, in a
+    background task: reads never wait for a probe and use the last measurement meanwhile.
+    """
+
+    def __init__(self, replicas: list[AsyncEngine], max_lag: float, check_interval: float):
+        self._replicas = replicas
+        self._max_lag = max_lag
+        self._check_interval = check_interval
+        self._healthy: list[AsyncEngine] = []
+        self._checked_at = 0.0
+        self._round_robin = itertools.count()
+        self._refreshing: asyncio.Task | None = None
+        self._logger = logging.getLogger(__name__)
+
+    @staticmethod
+    async def _lag(engine: AsyncEngine) -> float:
+        async with engine.connect() as connection:
+            return float(await connection.scalar(REPLICA_LAG_QUERY))
+
+    async def _measure(self, engine: AsyncEngine) -> float | None:
+        try:
+            return await asyncio.wait_for(self._lag(engine), REPLICA_PROBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._logger.warning("Replica %s did not answer within %.1fs", engine.url.host, REPLICA_PROBE_TIMEOUT)
+            return None
+        except Exception as e:
+            self._logger.warning("Replica %s is unavailable: %s", engine.url.host, e)
+            return None
+
+    async def refresh(self) -> None:
+        lags = await asyncio.gather(*(self._measure(engine) for engine in self._replicas))
+        self._healthy = [
+            engine for engine, lag in zip(self._replicas, lags)
+            if lag is not None and lag <= self._max_lag
+        ]
+        self._checked_at = time.monotonic()
+        if not self._healthy:
+            self._logger.warning("No replica within %.1fs lag, reading from primary", self._max_lag)
+
+    @property
+    def replicas(self) -> list[AsyncEngine]:
+        return self._replicas
+
+    async def choose(self) -> AsyncEngine | None:
+        """
+        Get a healthy replica engine
+        :return: AsyncEngine | None (None means fall back to primary)
+        """
+        if not self._replicas:
+            return None
+        stale = time.monotonic() - self._checked_at >= self._check_interval
+        if stale and (self._refreshing is None or self._refreshing.done()):
+            # Until the first probe finishes reads go to primary
+            self._refreshing = asyncio.create_task(self.refresh())
+        if not self._healthy:
+            return None
+        return self._healthy[next(self._round_robin) % len(self._healthy)]
+
+    async def dispose(self) -> None:
+        if self._refreshing is not None:
+            self._refreshing.cancel()
+        for engine in self._replicas:
+            await engine.dispose()
+
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs to a replica while one is assigned (see CommonDAO.replica).
+    Everything else goes to the primary, and once the session has written anything
+    it sticks to the primary so the rest of the update reads its own writes.
+    It also tracks whether the current transaction has uncommitted writes,
+    so read-only transactions can hand their connection back early (see CommonDAO.release).
+    Only SELECTs without FOR UPDATE count as reads: text() and any other statement
+    may write, so it is treated as a write.
+    """
+
+    def __init__(self, *args, replica_selector: ReplicaSelector | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_selector = replica_selector
+        self.replica: AsyncEngine | None = None
+        self.has_written = False
+        self.has_pending_writes = False
+
+    def commit(self) -> None:
+        super().commit()
+        self.has_pending_writes = False
+
+    def rollback(self) -> None:
+        super().rollback()
+        self.has_pending_writes = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        # No clause: a connection is requested without a statement (e.g. Session.connection())
+        is_read = clause is None or (isinstance(clause, GenerativeSelect) and clause._for_update_arg is None)
+        if self._flushing or not is_read:
+            self.has_written = True
+            self.has_pending_writes = True
+        elif self.replica is not None and not self.has_written and clause is not None:
+            return self.replica.sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
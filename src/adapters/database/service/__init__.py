@@ -1,3 +1,5 @@
 from .user import AbstractUserService, UserService
 from .post import AbstractPostService, PostService
-from .price import AbstractPriceService, PriceService
\ No newline at end of file
+from .price import AbstractPriceService, PriceService
+from .slot import AbstractSlotService, SlotService
+from .banned_word import AbstractBannedWordService, BannedWordService
\ No newline at end of file
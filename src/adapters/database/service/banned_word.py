@@ -0,0 +1,124 @@
+import logging
+
+from ..dao.banned_word import AbstractBannedWordDAO
+from ..dao.common import AbstractCommonDAO
+
+from abc import ABC, abstractmethod
+
+class AbstractBannedWordService(ABC):
+    @abstractmethod
+    async def get_banned_words(self) -> list[str] | None:
+        """
+        Get all banned words
+        :return: list[str] | None (None on database error)
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_banned_words_signature(self) -> str | None:
+        """
+        Get a checksum of the banned words to detect changes
+        :return: str | None (None on database error)
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def count_banned_words(self) -> int | None:
+        """
+        Count banned words
+        :return: int | None (None on database error)
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_recent_banned_words(self, limit: int = 20) -> list[str]:
+        """
+        Get the last added banned words
+        :param limit:
+        :return: list[str] newest first
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def add_banned_words(self, words: list[str]) -> int | None:
+        """
+        Add banned words, already existing ones are skipped
+        :param words:
+        :return: int | None number of added words
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_banned_words(self, words: list[str]) -> int | None:
+        """
+        Delete banned words
+        :param words:
+        :return: int | None number of deleted words
+        """
+        raise NotImplementedError()
+
+class BannedWordService(AbstractBannedWordService):
+    def __init__(
+            self,
+            banned_word_dao: AbstractBannedWordDAO,
+            common_dao: AbstractCommonDAO
+    ):
+        self._banned_word_dao = banned_word_dao
+        self._common_dao = common_dao
+        self._logger = logging.getLogger(__name__)
+
+    async def get_banned_words(self) -> list[str] | None:
+        try:
+            return await self._banned_word_dao.get_banned_words()
+        except Exception as e:
+            self._logger.error("Error getting banned words from database: %s", e, exc_info=True)
+            return None
+        finally:
+            await self._common_dao.release()
+
+    async def get_banned_words_signature(self) -> str | None:
+        try:
+            return await self._banned_word_dao.get_banned_words_signature()
+        except Exception as e:
+            self._logger.error("Error getting banned words signature from database: %s", e, exc_info=True)
+            return None
+        finally:
+            await self._common_dao.release()
+
+    async def count_banned_words(self) -> int | None:
+        try:
+            return await self._banned_word_dao.count_banned_words()
+        except Exception as e:
+            self._logger.error("Error counting banned words in database: %s", e, exc_info=True)
+            return None
+        finally:
+            await self._common_dao.release()
+
+    async def get_recent_banned_words(self, limit: int = 20) -> list[str]:
+        try:
+            return await self._banned_word_dao.get_recent_banned_words(limit=limit)
+        except Exception as e:
+            self._logger.error("Error getting recent banned words from database: %s", e, exc_info=True)
+            return []
+        finally:
+            await self._common_dao.release()
+
+    async def add_banned_words(self, words: list[str]) -> int | None:
+        try:
+            result = await self._banned_word_dao.add_banned_words(words=words)
+            await self._common_dao.commit()
+            return result
+        except Exception as e:
+            self._logger.error("Error adding banned words in database: %s", e, exc_info=True)
+            await self._common_dao.rollback()
+            return None
+
+    async def delete_banned_words(self, words: list[str]) -> int | None:
+        try:
+            result = await self._banned_word_dao.delete_banned_words(words=words)
+            await self._common_dao.commit()
+            return result
+        except Exception as e:
+            self._logger.error("Error deleting banned words from database: %s", e, exc_info=True)
+            await self._common_dao.rollback()
+            return None
@@ -1,10 +1,12 @@
 from typing import Optional, List
+import functools
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from ..dao.post import AbstractPostDAO
+from ..dao.post import AbstractPostDAO, ScheduleConflictError, DuplicatePostNameError
 from ..dao.common import AbstractCommonDAO
-from src.adapters.database.dto import PostDTO, PostRequestDTO
+from src.adapters.database.dto import PostDTO, PostRequestDTO, DeliveryDTO
+from src.adapters.quota.moderation import ModerationQuota
 
 from abc import ABC, abstractmethod
 
@@ -40,12 +42,31 @@ class AbstractPostService(ABC):
     @abstractmethod
     async def get_unchecked_posts_from_user(self, sender_tg_id: int) -> bool:
         """
-        Check if user has less than 3 unchecked posts
+        Check if user has less unchecked posts than the moderation limit
         :param sender_tg_id:
         :return: bool
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    async def can_submit_post(self, sender_id: int, sender_tg_id: int) -> bool:
+        """
+        Check the moderation limit through the Redis counter, counting in the database
+        only when Redis is unavailable
+        :param sender_id: user id
+        :param sender_tg_id: user telegram id
+        :return: bool
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_unchecked_posts_counts(self) -> dict[int, int] | None:
+        """
+        Count unchecked posts of every sender
+        :return: dict[int, int] | None sender_id -> number of unchecked posts
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     async def get_unchecked_posts(self) -> list[PostDTO]:
         """
@@ -60,6 +81,8 @@ class AbstractPostService(ABC):
         Add post
         :param post: PostRequestDTO
         :return: PostDTO | None
+        :raises ScheduleConflictError: another scheduled post of the sender is within 24h
+        :raises DuplicatePostNameError: the sender already has a post with this name
         """
         raise NotImplementedError()
 
@@ -70,6 +93,7 @@ class AbstractPostService(ABC):
         :param post_id:
         :param post: PostRequestDTO
         :return: PostDTO | None
+        :raises ScheduleConflictError: another scheduled post of the sender is within 24h
         """
         raise NotImplementedError()
 
@@ -109,10 +133,115 @@ class AbstractPostService(ABC):
         raise NotImplementedError()
 
     @abstractmethod
-    async def mark_as_published(self, post_id: int) -> PostDTO | None:
+    async def start_publishing(self, post_id: int) -> PostDTO | None:
+        """
+        Claim post for publishing (first phase), only one publisher gets it
+        :param post_id:
+        :return: PostDTO | None (None if post is already claimed or not ready)
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def abort_publishing(self, post_id: int) -> PostDTO | None:
+        """
+        Release the publishing claim, the post will be picked up again
+        :param post_id:
+        :return: PostDTO | None
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def fail_publishing(self, post_id: int, attempts: int, error: str,
+                              retry_at: datetime | None) -> PostDTO | None:
+        """
+        Release the publishing claim after a failed attempt
+        :param post_id:
+        :param attempts: failed attempts including this one
+        :param error: error text
+        :param retry_at: time of the next attempt, None moves the post to dead letters
+        :return: PostDTO | None
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def hold_publishing(self, post_id: int, error: str) -> PostDTO | None:
+        """
+        Move a post whose publication outcome is unknown to dead letters keeping the claim,
+        so it is neither retried nor recovered until an admin retries it
+        :param post_id:
+        :param error: error text
+        :return: PostDTO | None
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_dead_posts(self) -> list[PostDTO]:
+        """
+        Get dead-lettered posts
+        :return: list[PostDTO]
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def retry_dead_posts(self) -> int:
+        """
+        Return all dead-lettered posts to the publishing queue
+        :return: int number of posts
         """
-        Mark post as published
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_sender_organizations(self, sender_ids: list[int]) -> dict[int, str | None]:
+        """
+        Get organizations of post senders
+        :param sender_ids: users.id of senders
+        :return: dict[int, str | None] organization by sender id
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_deliveries(self, post_id: int) -> dict[str, int]:
+        """
+        Get chats the post has already been delivered to
         :param post_id:
+        :return: dict[str, int] message_id by chat id
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def save_deliveries(self, deliveries: list[DeliveryDTO]) -> bool:
+        """
+        Record delivery statuses of a post
+        :param deliveries:
+        :return: bool saved or not
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_similar_posts(self, post_id: int, max_distance: int) -> list[tuple[PostDTO, int]]:
+        """
+        Get near-duplicates of the post's photo among other posts
+        :param post_id:
+        :param max_distance: max differing bits of the perceptual hashes
+        :return: list[tuple[PostDTO, int]] posts with the distance, closest first
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_publishing_posts(self, started_before: datetime) -> list[PostDTO]:
+        """
+        Get posts claimed for publishing but not marked as published
+        :param started_before: only claims older than this
+        :return: list[PostDTO]
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def mark_as_published(self, post_id: int, message_id: int | None = None) -> PostDTO | None:
+        """
+        Mark post as published (second phase)
+        :param post_id:
+        :param message_id: message_id of the channel message
         :return: PostDTO | None
         """
         raise NotImplementedError()
@@ -156,7 +285,8 @@ class AbstractPostService(ABC):
     @abstractmethod
     async def can_schedule_post(self, sender_id: int, publish_time: datetime) -> tuple[bool, str]:
         """
-        Check if user can schedule post at specified time (24h interval)
+        Check if user can schedule post at specified time (24h after the last publication).
+        Spacing between scheduled posts is enforced by the database on add_post
         :param sender_id: user id
         :param publish_time: desired publish time
         :return: (can_schedule, reason_message)
@@ -167,16 +297,22 @@ class PostService(AbstractPostService):
     __slots__ = (
         "_common_dao",
         "_post_dao",
+        "_quota",
+        "_max_unchecked_posts",
         "_logger"
     )
 
     def __init__(
             self,
             post_dao: AbstractPostDAO,
-            common_dao: AbstractCommonDAO
+            common_dao: AbstractCommonDAO,
+            quota: ModerationQuota | None = None,
+            max_unchecked_posts: int = 3
     ):
         self._post_dao = post_dao
         self._common_dao = common_dao
+        self._quota = quota
+        self._max_unchecked_posts = max_unchecked_posts
         self._logger = logging.getLogger(__name__)
 
     async def get_post_by_id(self, post_id: int) -> PostDTO | None:
@@ -186,6 +322,8 @@ class PostService(AbstractPostService):
         except Exception as e:
             self._logger.error("Error getting post by id %s in database: %s", post_id, e, exc_info=True)
             return None
+        finally:
+            await self._common_dao.release()
 
     async def get_post_by_name(self, sender_id: int, name: str) -> PostDTO | None:
         try:
@@ -194,6 +332,8 @@ class PostService(AbstractPostService):
         except Exception as e:
             self._logger.error("Error getting post by sender_id %s and name %s in database: %s", sender_id, name, e, exc_info=True)
             return None
+        finally:
+            await self._common_dao.release()
 
     async def get_unpublished_posts(self, sender_id: int) -> list[PostDTO]:
         try:
@@ -202,36 +342,70 @@ class PostService(AbstractPostService):
         except Exception as e:
             self._logger.error("Error getting posts for sender_id %s in database: %s", sender_id, e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
     async def get_published_posts(self, sender_id: int) -> list[PostDTO]:
         try:
-            result = await self._post_dao.get_posts(sender_id=sender_id, is_published=True)
-            return result
+            async with self._common_dao.replica():
+                return await self._post_dao.get_posts(sender_id=sender_id, is_published=True)
         except Exception as e:
             self._logger.error("Error getting posts for sender_id %s in database: %s", sender_id, e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
     async def get_unchecked_posts_from_user(self, sender_tg_id: int) -> bool:
         try:
-            result = await self._post_dao.get_unchecked_posts_from_user(sender_tg_id=sender_tg_id)
+            result = await self._post_dao.get_unchecked_posts_from_user(
+                sender_tg_id=sender_tg_id,
+                limit=self._max_unchecked_posts
+            )
             return result
         except Exception as e:
             self._logger.error("Error getting unchecked posts from user %s in database: %s", sender_tg_id, e, exc_info=True)
             return False
+        finally:
+            await self._common_dao.release()
+
+    async def can_submit_post(self, sender_id: int, sender_tg_id: int) -> bool:
+        if self._quota is not None:
+            has_room = await self._quota.has_room(sender_id)
+            if has_room is not None:
+                return has_room
+        return await self.get_unchecked_posts_from_user(sender_tg_id)
+
+    async def get_unchecked_posts_counts(self) -> dict[int, int] | None:
+        try:
+            return await self._post_dao.get_unchecked_posts_counts()
+        except Exception as e:
+            self._logger.error("Error counting unchecked posts in database: %s", e, exc_info=True)
+            return None
+        finally:
+            await self._common_dao.release()
 
     async def get_unchecked_posts(self) -> list[PostDTO]:
         try:
-            result = await self._post_dao.get_unchecked_posts()
-            return result
+            async with self._common_dao.replica():
+                return await self._post_dao.get_unchecked_posts()
         except Exception as e:
             self._logger.error("Error getting unchecked posts in database: %s", e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
     async def add_post(self, post: PostRequestDTO) -> PostDTO | None:
         try:
-            result = await self._post_dao.add_post(post=post)
+            # The schedule exclusion constraint may reject the insert
+            async with self._common_dao.savepoint():
+                result = await self._post_dao.add_post(post=post)
             await self._common_dao.commit()
+            if self._quota is not None and not result.is_checked:
+                await self._common_dao.after_commit(functools.partial(self._quota.increment, result.sender_id))
             return result
+        except (ScheduleConflictError, DuplicatePostNameError):
+            await self._common_dao.rollback()
+            raise
         except Exception as e:
             self._logger.error("Error adding post in database: %s", e, exc_info=True)
             await self._common_dao.rollback()
@@ -239,9 +413,13 @@ class PostService(AbstractPostService):
 
     async def update_post(self, post_id: int, post: PostRequestDTO) -> PostDTO | None:
         try:
-            result = await self._post_dao.update_post(post_id=post_id, post=post)
+            async with self._common_dao.savepoint():
+                result = await self._post_dao.update_post(post_id=post_id, post=post)
             await self._common_dao.commit()
             return result
+        except ScheduleConflictError:
+            await self._common_dao.rollback()
+            raise
         except Exception as e:
             self._logger.error("Error updating post %s in database: %s", post_id, e, exc_info=True)
             await self._common_dao.rollback()
@@ -249,14 +427,15 @@ class PostService(AbstractPostService):
 
     async def delete_post(self, post_id: int) -> bool:
         try:
-            post = await self.get_post_by_id(post_id)
-            if not post:
-                return False
-            if post.is_checked or post.is_paid:
-                return False
-            result = await self._post_dao.delete_post(post_id=post_id)
+            # Only posts that are neither moderated nor paid can be deleted
+            result = await self._post_dao.delete_post(
+                post_id=post_id,
+                expected={"is_checked": False, "is_paid": False}
+            )
             await self._common_dao.commit()
-            return result
+            if self._quota is not None and result is not None:
+                await self._common_dao.after_commit(functools.partial(self._quota.decrement, result.sender_id))
+            return result is not None
         except Exception as e:
             self._logger.error("Error deleting post %s in database: %s", post_id, e, exc_info=True)
             await self._common_dao.rollback()
@@ -264,12 +443,14 @@ class PostService(AbstractPostService):
 
     async def approve_post(self, post_id: int) -> PostDTO | None:
         try:
-            post = await self.get_post_by_id(post_id)
-            if not post:
-                return
-            post.is_checked = True
-            result = await self.update_post(post_id, post)
+            result = await self._post_dao.transition_post(
+                post_id=post_id,
+                values={"is_checked": True},
+                expected={"is_checked": False}
+            )
             await self._common_dao.commit()
+            if self._quota is not None and result is not None:
+                await self._common_dao.after_commit(functools.partial(self._quota.decrement, result.sender_id))
             return result
         except Exception as e:
             self._logger.error("Error approving post %s in database: %s", post_id, e, exc_info=True)
@@ -277,28 +458,154 @@ class PostService(AbstractPostService):
             return None
 
     async def reject_post(self, post_id: int) -> bool:
+        return await self.delete_post(post_id)
+
+    async def get_approved_posts(self) -> list[PostDTO]:
+        try:
+            return await self._post_dao.get_approved_posts()
+        except Exception as e:
+            self._logger.error("Error getting approved posts in database: %s", e, exc_info=True)
+            return []
+        finally:
+            await self._common_dao.release()
+
+    async def start_publishing(self, post_id: int) -> PostDTO | None:
+        try:
+            result = await self._post_dao.transition_post(
+                post_id=post_id,
+                values={"publishing_started_at": datetime.now()},
+                expected={"is_checked": True, "is_paid": True, "is_published": False, "publishing_started_at": None}
+            )
+            await self._common_dao.commit()
+            return result
+        except Exception as e:
+            self._logger.error("Error claiming post %s for publishing in database: %s", post_id, e, exc_info=True)
+            await self._common_dao.rollback()
+            return None
+
+    async def abort_publishing(self, post_id: int) -> PostDTO | None:
+        try:
+            result = await self._post_dao.transition_post(
+                post_id=post_id,
+                values={"publishing_started_at": None},
+                expected={"is_published": False}
+            )
+            await self._common_dao.commit()
+            return result
+        except Exception as e:
+            self._logger.error("Error releasing publishing claim of post %s in database: %s", post_id, e, exc_info=True)
+            await self._common_dao.rollback()
+            return None
+
+    async def fail_publishing(self, post_id: int, attempts: int, error: str,
+                              retry_at: datetime | None) -> PostDTO | None:
+        try:
+            result = await self._post_dao.transition_post(
+                post_id=post_id,
+                values={
+                    "publishing_started_at": None,
+                    "publish_attempts": attempts,
+                    "last_error": error[:1000],
+                    "next_attempt_at": retry_at,
+                    "is_dead": retry_at is None
+                },
+                expected={"is_published": False}
+            )
+            await self._common_dao.commit()
+            return result
+        except Exception as e:
+            self._logger.error("Error recording failed publication of post %s in database: %s", post_id, e, exc_info=True)
+            await self._common_dao.rollback()
+            return None
+
+    async def hold_publishing(self, post_id: int, error: str) -> PostDTO | None:
         try:
-            result = await self.delete_post(post_id)
+            result = await self._post_dao.transition_post(
+                post_id=post_id,
+                values={"last_error": error[:1000], "is_dead": True},
+                expected={"is_published": False}
+            )
             await self._common_dao.commit()
             return result
         except Exception as e:
-            self._logger.error("Error rejecting post %s in database: %s", post_id, e, exc_info=True)
+            self._logger.error("Error holding publication of post %s in database: %s", post_id, e, exc_info=True)
+            await self._common_dao.rollback()
+            return None
+
+    async def get_dead_posts(self) -> list[PostDTO]:
+        try:
+            return await self._post_dao.get_dead_posts()
+        except Exception as e:
+            self._logger.error("Error getting dead-lettered posts in database: %s", e, exc_info=True)
+            return []
+        finally:
+            await self._common_dao.release()
+
+    async def retry_dead_posts(self) -> int:
+        try:
+            result = await self._post_dao.revive_dead_posts()
+            await self._common_dao.commit()
+            return result
+        except Exception as e:
+            self._logger.error("Error retrying dead-lettered posts in database: %s", e, exc_info=True)
+            await self._common_dao.rollback()
+            return 0
+
+    async def get_sender_organizations(self, sender_ids: list[int]) -> dict[int, str | None]:
+        try:
+            return await self._post_dao.get_sender_organizations(sender_ids)
+        except Exception as e:
+            self._logger.error("Error getting sender organizations in database: %s", e, exc_info=True)
+            return {}
+        finally:
+            await self._common_dao.release()
+
+    async def get_deliveries(self, post_id: int) -> dict[str, int]:
+        try:
+            return await self._post_dao.get_deliveries(post_id)
+        except Exception as e:
+            self._logger.error("Error getting deliveries of post %s in database: %s", post_id, e, exc_info=True)
+            return {}
+        finally:
+            await self._common_dao.release()
+
+    async def save_deliveries(self, deliveries: list[DeliveryDTO]) -> bool:
+        try:
+            await self._post_dao.save_deliveries(deliveries)
+            await self._common_dao.commit()
+            return True
+        except Exception as e:
+            self._logger.error("Error saving post deliveries in database: %s", e, exc_info=True)
             await self._common_dao.rollback()
             return False
 
-    async def get_approved_posts(self) -> list[PostDTO]:
+    async def get_similar_posts(self, post_id: int, max_distance: int) -> list[tuple[PostDTO, int]]:
         try:
-            return await self._post_dao.get_approved_posts()
+            return await self._post_dao.get_similar_posts(post_id=post_id, max_distance=max_distance)
         except Exception as e:
-            self._logger.error("Error getting approved posts in database: %s", e, exc_info=True)
+            self._logger.error("Error getting posts similar to %s in database: %s", post_id, e, exc_info=True)
+            return []
+        finally:
+            await self._common_dao.release()
+
+    async def get_publishing_posts(self, started_before: datetime) -> list[PostDTO]:
+        try:
+            return await self._post_dao.get_publishing_posts(started_before=started_before)
+        except Exception as e:
+            self._logger.error("Error getting posts being published in database: %s", e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
-    async def mark_as_published(self, post_id: int) -> PostDTO | None:
+    async def mark_as_published(self, post_id: int, message_id: int | None = None) -> PostDTO | None:
         try:
-            result = await self._post_dao.update_post(
+            result = await self._post_dao.transition_post(
                 post_id=post_id,
-                post=PostRequestDTO(is_published=True),
+                values={"is_published": True, "channel_message_id": message_id},
+                expected={"is_checked": True, "is_paid": True, "is_published": False}
             )
+            if result is not None:
+                await self._post_dao.set_last_published_post_time(result.sender_id, datetime.now())
             await self._common_dao.commit()
             return result
         except Exception as e:
@@ -312,12 +619,15 @@ class PostService(AbstractPostService):
         except Exception as e:
             self._logger.error("Error getting unpaid posts in database: %s", e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
     async def mark_as_paid(self, post_id: int) -> PostDTO | None:
         try:
-            result = await self._post_dao.update_post(
+            result = await self._post_dao.transition_post(
                 post_id=post_id,
-                post=PostRequestDTO(is_paid=True),
+                values={"is_paid": True},
+                expected={"is_paid": False}
             )
             await self._common_dao.commit()
             return result
@@ -328,9 +638,11 @@ class PostService(AbstractPostService):
 
     async def set_payment_id(self, post_id: int, payment_id: str) -> PostDTO | None:
         try:
-            result = await self._post_dao.update_post(
+            # Payment can only be (re)started for a moderated post that is not paid yet
+            result = await self._post_dao.transition_post(
                 post_id=post_id,
-                post=PostRequestDTO(payment_id=payment_id)
+                values={"payment_id": payment_id},
+                expected={"is_checked": True, "is_paid": False}
             )
             await self._common_dao.commit()
             return result
@@ -358,6 +670,8 @@ class PostService(AbstractPostService):
         except Exception as e:
             self._logger.error("Error checking publish limit for user %s: %s", sender_id, e, exc_info=True)
             return False, "Ошибка проверки ограничений публикации"
+        finally:
+            await self._common_dao.release()
 
     async def can_schedule_post(self, sender_id: int, publish_time: datetime) -> tuple[bool, str]:
         try:
@@ -375,22 +689,10 @@ class PostService(AbstractPostService):
                     hours_left = 24 - hours_since_last
                     return False, f"Нельзя публиковать чаще чем раз в 24 часа. Следующий пост можно опубликовать через {hours_left:.1f} часов после последней публикации."
 
-            # Check for conflicts with other scheduled posts
-            time_range_start = publish_time - timedelta(hours=24)
-            time_range_end = publish_time + timedelta(hours=24)
-
-            conflicting_posts = await self._post_dao.get_scheduled_posts_in_time_range(
-                sender_id, time_range_start, time_range_end
-            )
-
-            # Filter out the current post being edited if any
-            conflicting_posts = [p for p in conflicting_posts if p.publish_date != publish_time]
-
-            if conflicting_posts:
-                return False, "У вас уже есть запланированные посты в пределах 24 часов от выбранного времени. Выберите другое время."
-
             return True, "Можно запланировать публикацию"
 
         except Exception as e:
             self._logger.error("Error checking schedule limit for user %s: %s", sender_id, e, exc_info=True)
-            return False, "Ошибка проверки ограничений планирования"
\ No newline at end of file
+            return False, "Ошибка проверки ограничений планирования"
+        finally:
+            await self._common_dao.release()
\ No newline at end of file
@@ -62,6 +62,8 @@ class PriceService(AbstractPriceService):
         except Exception as e:
             self._logger.error("Error getting price from database: %s", name, e, exc_info=True)
             return None
+        finally:
+            await self._common_dao.release()
 
     async def change_price(self, name: str, price: int) -> PriceDTO:
         try:
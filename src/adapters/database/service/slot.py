@@ -0,0 +1,173 @@
+import calendar
+import logging
+from datetime import date, datetime, time, timedelta
+
+from ..dao.post import AbstractPostDAO
+from ..dao.common import AbstractCommonDAO
+
+from abc import ABC, abstractmethod
+
+PUBLISH_INTERVAL = timedelta(hours=24)
+SLOT_STEP = timedelta(minutes=1) # publish time is entered as ЧЧ:ММ
+
+
+def ceil_to_step(value: datetime) -> datetime:
+    rounded = value.replace(second=0, microsecond=0)
+    return rounded if rounded == value else rounded + SLOT_STEP
+
+
+def free_windows(earliest: datetime, busy: list[datetime], end: datetime) -> list[tuple[datetime, datetime]]:
+    """
+    Sweep the 24h exclusion zones of scheduled posts in publish date order
+    :param earliest: first allowed publish time
+    :param busy: publish dates of scheduled posts in ascending order
+    :param end: last publish time of interest
+    :return: list of closed [start, end] windows of allowed publish times
+    """
+    windows = []
+    cursor = earliest
+    for publish_date in busy:
+        if cursor > end:
+            break
+        # A post at p blocks the open interval (p - 24h, p + 24h), its ends are allowed
+        zone_start, zone_end = publish_date - PUBLISH_INTERVAL, publish_date + PUBLISH_INTERVAL
+        if zone_end <= cursor:
+            continue
+        if zone_start >= cursor:
+            windows.append((cursor, min(zone_start, end)))
+        cursor = zone_end
+    if cursor <= end:
+        windows.append((cursor, end))
+    return windows
+
+
+def blocked_days(windows: list[tuple[datetime, datetime]], year: int, month: int) -> set[date]:
+    """
+    Days of the month no free window touches
+    :param windows: free windows, see free_windows
+    :param year:
+    :param month:
+    :return: set[date]
+    """
+    first_day = date(year, month, 1)
+    last_day = first_day + timedelta(days=calendar.monthrange(year, month)[1] - 1)
+    free_days = set()
+    for window_start, window_end in windows:
+        day = max(window_start.date(), first_day)
+        while day <= min(window_end.date(), last_day):
+            free_days.add(day)
+            day += timedelta(days=1)
+    return {first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)} - free_days
+
+
+class AbstractSlotService(ABC):
+    @abstractmethod
+    async def get_next_free_slot(self, sender_id: int, after: datetime | None = None) -> datetime | None:
+        """
+        Get the earliest time the user can schedule a post at
+        :param sender_id: user id
+        :param after: search from this time (now by default)
+        :return: datetime | None
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_blocked_days(self, sender_id: int, year: int, month: int) -> set[date]:
+        """
+        Get days of the month without any time the user can schedule a post at
+        :param sender_id: user id
+        :param year:
+        :param month:
+        :return: set[date]
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_calendar(self, sender_id: int, year: int, month: int) -> tuple[datetime | None, set[date]]:
+        """
+        Get both the next free slot and the blocked days of the month from one load of the user's schedule
+        :param sender_id: user id
+        :param year:
+        :param month:
+        :return: tuple[datetime | None, set[date]] (next free slot, blocked days)
+        """
+        raise NotImplementedError()
+
+
+class SlotService(AbstractSlotService):
+    __slots__ = (
+        "_common_dao",
+        "_post_dao",
+        "_horizon",
+        "_logger"
+    )
+
+    def __init__(
+            self,
+            post_dao: AbstractPostDAO,
+            common_dao: AbstractCommonDAO,
+            horizon: timedelta = timedelta(days=365)
+    ):
+        self._post_dao = post_dao
+        self._common_dao = common_dao
+        self._horizon = horizon
+        self._logger = logging.getLogger(__name__)
+
+    async def _free_windows(self, sender_id: int, start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+        # Same rules as can_schedule_post and ex_posts_sender_schedule:
+        # in the future, 24h after the last publication, 24h apart from scheduled posts
+        earliest = max(start, datetime.now().replace(second=0, microsecond=0) + SLOT_STEP)
+        last_published = await self._post_dao.get_last_published_post_time(sender_id)
+        if last_published:
+            earliest = max(earliest, last_published + PUBLISH_INTERVAL)
+        earliest = ceil_to_step(earliest)
+        if earliest > end:
+            return []
+        busy = await self._post_dao.get_scheduled_publish_dates(
+            sender_id, earliest - PUBLISH_INTERVAL, end + PUBLISH_INTERVAL
+        )
+        windows = []
+        for window_start, window_end in free_windows(earliest, busy, end):
+            window_start = ceil_to_step(window_start)
+            window_end = window_end.replace(second=0, microsecond=0)
+            if window_start <= window_end:
+                windows.append((window_start, window_end))
+        return windows
+
+    async def get_next_free_slot(self, sender_id: int, after: datetime | None = None) -> datetime | None:
+        try:
+            start = after or datetime.now()
+            windows = await self._free_windows(sender_id, start, start + self._horizon)
+            return windows[0][0] if windows else None
+        except Exception as e:
+            self._logger.error("Error finding free slot for user %s: %s", sender_id, e, exc_info=True)
+            return None
+        finally:
+            await self._common_dao.release()
+
+    async def get_blocked_days(self, sender_id: int, year: int, month: int) -> set[date]:
+        try:
+            start = datetime.combine(date(year, month, 1), time())
+            end = start + timedelta(days=calendar.monthrange(year, month)[1]) - SLOT_STEP
+            return blocked_days(await self._free_windows(sender_id, start, end), year, month)
+        except Exception as e:
+            self._logger.error("Error getting blocked days for user %s: %s", sender_id, e, exc_info=True)
+            return set()
+        finally:
+            await self._common_dao.release()
+
+    async def get_calendar(self, sender_id: int, year: int, month: int) -> tuple[datetime | None, set[date]]:
+        try:
+            # One sweep from now over the horizon and the shown month covers both answers
+            start = datetime.now()
+            month_end = (
+                datetime.combine(date(year, month, 1), time())
+                + timedelta(days=calendar.monthrange(year, month)[1]) - SLOT_STEP
+            )
+            windows = await self._free_windows(sender_id, start, max(start + self._horizon, month_end))
+            return (windows[0][0] if windows else None), blocked_days(windows, year, month)
+        except Exception as e:
+            self._logger.error("Error getting calendar for user %s: %s", sender_id, e, exc_info=True)
+            return None, set()
+        finally:
+            await self._common_dao.release()
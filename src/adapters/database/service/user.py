@@ -127,17 +127,23 @@ class UserService(AbstractUserService):
 
     async def get_all_users(self) -> list[UserDTO]:
         try:
-            return await self._user_dao.get_all_users()
+            async with self._common_dao.replica():
+                return await self._user_dao.get_all_users()
         except Exception as e:
             self._logger.error("Error getting all users in database: %s", e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
     async def search_users_by_fio(self, search_string: str) -> list[UserDTO]:
         try:
-            return await self._user_dao.search_users_by_fio(search_string=search_string)
+            async with self._common_dao.replica():
+                return await self._user_dao.search_users_by_fio(search_string=search_string)
         except Exception as e:
             self._logger.error("Error searching users by fio in database: %s", e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
     async def approve_user(self, user_id: int) -> bool:
         try:
@@ -151,10 +157,13 @@ class UserService(AbstractUserService):
 
     async def get_unapproved_users(self) -> list[UserDTO]:
         try:
-            return await self._user_dao.get_unapproved_users()
+            async with self._common_dao.replica():
+                return await self._user_dao.get_unapproved_users()
         except Exception as e:
             self._logger.error("Error getting unapproved users in database: %s", e, exc_info=True)
             return []
+        finally:
+            await self._common_dao.release()
 
     async def get_user_by_id(self, user_id: int) -> UserDTO | None:
         try:
@@ -162,6 +171,8 @@ class UserService(AbstractUserService):
         except Exception as e:
             self._logger.error("Error getting user by id %s in database: %s", user_id, e, exc_info=True)
             return None
+        finally:
+            await self._common_dao.release()
 
     async def get_user_by_tg_id(self, user_tg_id: int) -> UserDTO | None:
         try:
@@ -169,6 +180,8 @@ class UserService(AbstractUserService):
         except Exception as e:
             self._logger.error("Error getting user by tg_id %s in database: %s", user_tg_id, e, exc_info=True)
             return None
+        finally:
+            await self._common_dao.release()
 
     async def get_current_user(self) -> UserDTO | None:
         try:
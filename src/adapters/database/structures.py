@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional, List
 
-from sqlalchemy import BigInteger, String, ForeignKey, Index, DateTime, Boolean
+from sqlalchemy import BigInteger, SmallInteger, String, ForeignKey, Index, DateTime, Boolean, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -21,6 +22,8 @@ class User(Base):
     organization: Mapped[Optional[str]] = mapped_column(nullable=True)
     is_admin: Mapped[bool] = mapped_column(default=False)
     is_approved: Mapped[bool] = mapped_column(default=False)
+    # Denormalized from posts, written together with mark_as_published (24h publishing rule)
+    last_published_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     posts: Mapped[List["Post"]] = relationship(
         "Post",
@@ -41,6 +44,10 @@ class Post(Base):
     text: Mapped[str] = mapped_column(String(1000))
     media_link: Mapped[Optional[str]] = mapped_column(String(500))
     media_type: Mapped[Optional[str]]
+    # Telegram file_id of the media, the publisher sends it instead of uploading the file
+    media_file_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # Perceptual hash (dHash) of the photo, near-duplicates are found through post_phash_bands
+    media_phash: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.now, nullable=True)
     is_publish_now: Mapped[bool]
     publish_date: Mapped[Optional[datetime]] = mapped_column(DateTime)
@@ -48,6 +55,14 @@ class Post(Base):
     is_paid: Mapped[bool] = mapped_column(default=False)
     payment_id: Mapped[Optional[str]]
     is_published: Mapped[bool] = mapped_column(default=False)
+    # Two-phase publishing: claimed by a publisher, then published with the channel message_id
+    publishing_started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    channel_message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    # Failed publications are retried with backoff, then dead-lettered
+    publish_attempts: Mapped[int] = mapped_column(default=0, server_default='0')
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    is_dead: Mapped[bool] = mapped_column(default=False, server_default='false')
 
     sender_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE")
@@ -67,6 +82,73 @@ class Post(Base):
         Index('ix_posts_checked_published', 'is_checked', 'is_published'),
     )
 
+# Case-insensitive post name uniqueness per sender (functional index,
+# so it has to reference the mapped columns after the class is built)
+Index('ix_unique_post_sender_name', Post.sender_id, func.lower(Post.name), unique=True)
+
+# Dead letters are few, the admin list reads them through this partial index
+Index('ix_posts_dead', Post.id, postgresql_where=Post.is_dead == True)
+
+# Only posts in flight are indexed, the publishing recovery pass reads them
+Index(
+    'ix_posts_publishing',
+    Post.publishing_started_at,
+    postgresql_where=Post.publishing_started_at.is_not(None) & (Post.is_published == False)
+)
+
+# Scheduled unpublished posts of one sender occupy [publish_date, publish_date + 24h)
+# and must not overlap (needs the btree_gist extension for sender_id)
+Post.__table__.append_constraint(
+    ExcludeConstraint(
+        (Post.sender_id, '='),
+        (func.tsrange(Post.publish_date, Post.publish_date + text("interval '24 hours'")), '&&'),
+        name='ex_posts_sender_schedule',
+        using='gist',
+        where=(Post.publish_date.is_not(None)) & (Post.is_published == False)
+    )
+)
+
+
+class PostDelivery(Base):
+    """Publication of a post in one destination chat"""
+    __tablename__ = "post_deliveries"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("posts.id", ondelete="CASCADE")
+    )
+    chat_id: Mapped[str] = mapped_column(String(64))
+    message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    is_delivered: Mapped[bool] = mapped_column(default=False)
+    error: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint('post_id', 'chat_id', name='uq_post_deliveries_post_chat'),
+    )
+
+class PostPhashBand(Base):
+    """
+    16-bit slice of posts.media_phash. Hashes within Hamming distance 3 share at
+    least one of the 4 slices, so near-duplicates are looked up by equality
+    """
+    __tablename__ = "post_phash_bands"
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True
+    )
+    band: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    value: Mapped[int]
+
+    __table_args__ = (
+        Index('ix_post_phash_bands_band_value', 'band', 'value'),
+    )
+
+class BannedWord(Base):
+    """Word (or stem) that sends a post text to the moderation warning"""
+    __tablename__ = "banned_words"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    word: Mapped[str] = mapped_column(String(100), unique=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, server_default=func.now())
+
 class Price(Base):
     __tablename__ = "prices"
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Spaces channel posts evenly so that no more than rate_per_minute are sent in any minute.
+    Shared by every publisher sending to the channel.
+    """
+
+    def __init__(self, rate_per_minute: int):
+        self.rate_per_minute = rate_per_minute
+        self._interval = 60 / rate_per_minute
+        self._next_allowed = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_allowed - now
+            self._next_allowed = max(now, self._next_allowed) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -3,45 +3,135 @@ import asyncio
 import logging
 from typing import Optional
 from aiogram import Bot
-from aiogram.types import FSInputFile
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramAPIError
+from aiogram.types import FSInputFile, Message
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramAPIError, TelegramNetworkError, TelegramServerError
+)
 from redis.asyncio import Redis
 
 from src.config.reader import Config
 from src.adapters.database.dto import PostDTO
+from src.adapters.mailing.uploader import MediaUploader
+
+# The request may have reached Telegram and the message may have been posted anyway
+AMBIGUOUS_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
 
 
 class Mailing:
+    ACK_TTL = 7 * 24 * 3600
+
     def __init__(self, bot: Bot, redis: Redis, config: Config):
         self._bot = bot
         self._redis = redis
         self._channel_chat_id = config.bot.channel_chat_id
+        self._channel_routes = config.bot.channel_routes
         self._media_root = config.media.media_root
 
-    async def send_to_channel(self, post: PostDTO):
+    def destinations(self, organization: str | None) -> list[str]:
+        """
+        Chats a post of the organization is published to, the main channel first
+        :param organization: organization of the sender
+        :return: list[str] chat ids
+        """
+        chat_ids = [self._channel_chat_id] if self._channel_chat_id else []
+        for chat_id in self._channel_routes.get(organization, ()) if organization else ():
+            if chat_id not in chat_ids:
+                chat_ids.append(chat_id)
+        return chat_ids
+
+    async def send_to_channels(self, post: PostDTO, chat_ids: list[str]) -> dict[str, int | BaseException]:
+        """
+        Send post to several chats concurrently, so the total time is that of the slowest chat
+        :param post: PostDTO
+        :param chat_ids: destination chats
+        :return: dict[str, int | BaseException] message_id or the error by chat id
+        """
+        results = {}
+        if post.media_link and post.media_type in ('photo', 'video') and not post.media_file_id and chat_ids:
+            # Without a file_id the file is uploaded once, the other chats get the file_id of that message
+            first, *chat_ids = chat_ids
+            try:
+                message = await self._send(post, first)
+                results[first] = message.message_id
+                post = post.model_copy(update={"media_file_id": MediaUploader.extract_file_id(message)})
+            except Exception as e:
+                results[first] = e
+        sent = await asyncio.gather(
+            *(self.send_to_channel(post, chat_id) for chat_id in chat_ids),
+            return_exceptions=True
+        )
+        results.update(zip(chat_ids, sent))
+        return results
+
+    async def send_to_channel(self, post: PostDTO, chat_id: str | None = None) -> int:
+        """
+        Send post to the channel
+        :param post: PostDTO
+        :param chat_id: destination chat, the main channel by default
+        :return: int message_id of the channel message
+        :raises TelegramAPIError: the post was not sent
+        """
+        message = await self._send(post, chat_id or self._channel_chat_id)
+        return message.message_id
+
+    async def _send(self, post: PostDTO, chat_id: str) -> Message:
         try:
             text = f"{post.name}\n\n{post.text}" if post.name else post.text
 
-            if post.media_link:
-                filename = os.path.basename(post.media_link)
-                file_path = os.path.join(self._media_root, 'posts', filename)
+            if post.media_link and post.media_type in ('photo', 'video'):
+                # A cached file_id is a lightweight message, the file is uploaded only without one
+                if post.media_file_id:
+                    media = post.media_file_id
+                else:
+                    filename = os.path.basename(post.media_link)
+                    media = FSInputFile(os.path.join(self._media_root, 'posts', filename))
 
                 if post.media_type == 'photo':
-                    await self._bot.send_photo(
-                        chat_id=self._channel_chat_id,
-                        photo=FSInputFile(file_path),
+                    message = await self._bot.send_photo(
+                        chat_id=chat_id,
+                        photo=media,
                         caption=text
                     )
-                elif post.media_type == 'video':
-                    await self._bot.send_video(
-                        chat_id=self._channel_chat_id,
-                        video=FSInputFile(file_path),
+                else:
+                    message = await self._bot.send_video(
+                        chat_id=chat_id,
+                        video=media,
                         caption=text
                     )
             else:
-                await self._bot.send_message(
-                    chat_id=self._channel_chat_id,
+                message = await self._bot.send_message(
+                    chat_id=chat_id,
                     text=text
                 )
+            return message
         except (TelegramBadRequest, TelegramForbiddenError, TelegramAPIError) as e:
-            logging.error(f"Failed to send post {post.id} to channel: {e}")
\ No newline at end of file
+            logging.error(f"Failed to send post {post.id} to chat {chat_id}: {e}")
+            raise
+
+    # Ack journal: written right after Telegram accepted the post in a chat, so a crash
+    # before the database is updated can be told apart from a send that never happened
+
+    async def ack(self, post_id: int, chat_id: str, message_id: int) -> bool:
+        key = f"publish:acks:{post_id}"
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, chat_id, message_id)
+                pipe.expire(key, self.ACK_TTL)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logging.error(f"Failed to journal publication of post {post_id} in chat {chat_id}: {e}")
+            return False
+
+    async def get_acks(self, post_id: int) -> dict[str, int]:
+        acks = await self._redis.hgetall(f"publish:acks:{post_id}")
+        return {
+            (chat_id.decode() if isinstance(chat_id, bytes) else chat_id): int(message_id)
+            for chat_id, message_id in acks.items()
+        }
+
+    async def clear_ack(self, post_id: int) -> None:
+        try:
+            await self._redis.delete(f"publish:acks:{post_id}")
+        except Exception as e:
+            logging.error(f"Failed to clear publication journal of post {post_id}: {e}")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+import asyncio
+import logging
+from aiogram import Bot
+from aiogram.types import FSInputFile, Message
+from redis.asyncio import Redis
+
+from src.config.reader import Config
+
+
+class MediaUploader:
+    """
+    Uploads post media to a private storage chat in the background and caches the
+    resulting file_id in Redis, so the publisher only sends file_id messages.
+    file_ids belong to the bot and can be sent to any chat it posts to.
+    """
+    FILE_ID_TTL = 30 * 24 * 3600
+
+    def __init__(self, bot: Bot, redis: Redis, config: Config):
+        self._bot = bot
+        self._redis = redis
+        self._storage_chat_id = config.media.storage_chat_id
+        self._media_root = config.media.media_root
+        self._uploads: dict[str, asyncio.Task] = {}
+        self._failed: set[str] = set()  # not retried in the background, the publisher sends the file itself
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def enabled(self) -> bool:
+        return self._storage_chat_id is not None
+
+    @staticmethod
+    def _key(media_link: str) -> str:
+        return f"media:file_id:{media_link}"
+
+    @staticmethod
+    def extract_file_id(message: Message) -> str | None:
+        if message.photo:
+            return message.photo[-1].file_id
+        if message.video:
+            return message.video.file_id
+        return None
+
+    async def get_file_id(self, media_link: str) -> str | None:
+        try:
+            file_id = await self._redis.get(self._key(media_link))
+        except Exception as e:
+            self._logger.error(f"Failed to read cached file_id of {media_link}: {e}")
+            return None
+        return file_id.decode() if isinstance(file_id, bytes) else file_id
+
+    async def remember(self, media_link: str, file_id: str) -> None:
+        try:
+            await self._redis.set(self._key(media_link), file_id, ex=self.FILE_ID_TTL)
+        except Exception as e:
+            self._logger.error(f"Failed to cache file_id of {media_link}: {e}")
+
+    def schedule(self, media_link: str, media_type: str | None) -> bool:
+        """
+        Start a background upload unless one is running
+        :param media_link: media_link of the post
+        :param media_type: photo or video
+        :return: bool upload is in progress (False when disabled or it failed before)
+        """
+        if not self.enabled or media_type not in ('photo', 'video') or media_link in self._failed:
+            return False
+        if media_link not in self._uploads:
+            task = asyncio.create_task(self.upload(media_link, media_type))
+            self._uploads[media_link] = task
+            task.add_done_callback(lambda _: self._uploads.pop(media_link, None))
+        return True
+
+    async def upload(self, media_link: str, media_type: str) -> str | None:
+        """
+        Upload media to the storage chat, the cached file_id is reused
+        :param media_link: media_link of the post
+        :param media_type: photo or video
+        :return: str | None file_id
+        """
+        file_id = await self.get_file_id(media_link)
+        if file_id:
+            return file_id
+        file_path = os.path.join(self._media_root, 'posts', os.path.basename(media_link))
+        try:
+            if media_type == 'photo':
+                message = await self._bot.send_photo(chat_id=self._storage_chat_id, photo=FSInputFile(file_path))
+            else:
+                message = await self._bot.send_video(chat_id=self._storage_chat_id, video=FSInputFile(file_path))
+        except Exception as e:
+            self._failed.add(media_link)
+            self._logger.error(f"Failed to upload {media_link} to the storage chat: {e}")
+            return None
+        file_id = self.extract_file_id(message)
+        if file_id:
+            await self.remember(media_link, file_id)
+        return file_id
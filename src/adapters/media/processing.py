@@ -0,0 +1,186 @@
+import os
+import struct
+import asyncio
+import logging
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+
+class MediaError(ValueError):
+    """The file is broken or its format is not supported"""
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str  # normalized file, may differ from the uploaded one
+    width: int
+    height: int
+    size: int  # bytes
+    thumbnail_path: str | None = None
+    duration: float | None = None  # seconds, videos only
+    phash: int | None = None  # dHash of photos, signed to fit a BIGINT column
+
+
+def thumbnail_path(media_root: str, media_link: str) -> Path:
+    """
+    Path of the thumbnail generated for a photo
+    :param media_root:
+    :param media_link: media_link of the post
+    :return: Path
+    """
+    return Path(media_root) / "posts" / f"{Path(media_link).stem}_thumb.jpg"
+
+
+# The functions below run in worker processes, they must stay module level and picklable
+
+def dhash(image: Image.Image) -> int:
+    """
+    64-bit difference hash: every bit tells whether a pixel of the 9x8 grayscale
+    image is brighter than its right neighbour. Rescaled or recompressed copies
+    differ in a few bits only.
+    :param image:
+    :return: int signed 64-bit hash
+    """
+    pixels = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = value << 1 | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def process_image(path: str, max_side: int, thumbnail_side: int, quality: int = 85) -> MediaInfo:
+    """
+    Validate an image, apply its EXIF orientation, downscale it to max_side and
+    re-encode it as JPEG without metadata, next to it a thumbnail is saved
+    :param path: uploaded file, replaced by the normalized .jpg
+    :param max_side: longest side of the normalized image
+    :param thumbnail_side: longest side of the thumbnail
+    :param quality: JPEG quality
+    :return: MediaInfo
+    """
+    source = Path(path)
+    target = source.with_suffix(".jpg")
+    thumbnail = source.with_name(f"{source.stem}_thumb.jpg")
+    try:
+        # verify() detects truncated and corrupt files, the image has to be reopened after it
+        with Image.open(source) as image:
+            image.verify()
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            # Saved without exif/icc, so location and camera data are dropped
+            image.save(target, "JPEG", quality=quality, optimize=True)
+            preview = image.copy()
+            preview.thumbnail((thumbnail_side, thumbnail_side), Image.Resampling.LANCZOS)
+            preview.save(thumbnail, "JPEG", quality=80)
+            width, height = image.size
+            phash = dhash(image)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise MediaError(f"broken image: {e}") from e
+    if target != source:
+        source.unlink(missing_ok=True)
+    return MediaInfo(
+        path=str(target), width=width, height=height,
+        size=target.stat().st_size, thumbnail_path=str(thumbnail), phash=phash
+    )
+
+
+def _boxes(file, start: int, end: int):
+    # ISO BMFF (MP4/MOV) boxes between start and end: (type, payload start, box end)
+    position = start
+    while position + 8 <= end:
+        file.seek(position)
+        size, box_type = struct.unpack(">I4s", file.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", file.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            raise MediaError(f"truncated {box_type!r} box")
+        yield box_type, position + header, position + size
+        position += size
+
+
+def probe_video(path: str) -> MediaInfo:
+    """
+    Read the MP4/MOV headers without decoding: the file has to have ftyp, moov and mdat,
+    the duration is taken from mvhd and the frame size from the video track tkhd
+    :param path:
+    :return: MediaInfo
+    """
+    size = os.path.getsize(path)
+    width = height = 0
+    duration = None
+    with open(path, "rb") as file:
+        try:
+            top = {box_type: (start, end) for box_type, start, end in _boxes(file, 0, size)}
+            if b"ftyp" not in top or b"moov" not in top or b"mdat" not in top:
+                raise MediaError("not an MP4 video or the file is incomplete")
+            for box_type, start, end in _boxes(file, *top[b"moov"]):
+                if box_type == b"mvhd":
+                    file.seek(start)
+                    version = file.read(1)[0]
+                    if version == 1:
+                        file.seek(start + 20)
+                        timescale, length = struct.unpack(">IQ", file.read(12))
+                    else:
+                        file.seek(start + 12)
+                        timescale, length = struct.unpack(">II", file.read(8))
+                    duration = length / timescale if timescale else None
+                elif box_type == b"trak" and not width:
+                    for child, child_start, child_end in _boxes(file, start, end):
+                        if child == b"tkhd":
+                            # Width and height are the last 8 bytes, 16.16 fixed point
+                            file.seek(child_end - 8)
+                            track_width, track_height = struct.unpack(">II", file.read(8))
+                            width, height = track_width >> 16, track_height >> 16
+        except (struct.error, IndexError) as e:
+            raise MediaError(f"truncated video header: {e}") from e
+    if not width or not height:
+        raise MediaError("no video track")
+    return MediaInfo(path=path, width=width, height=height, size=size, duration=duration)
+
+
+class MediaProcessor:
+    """
+    Runs media validation and normalization in a process pool, so CPU-heavy
+    decoding never blocks the event loop
+    """
+
+    def __init__(self, workers: int, max_image_side: int, thumbnail_side: int):
+        # spawn: forking a process with running event loop and driver threads is unsafe
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._max_image_side = max_image_side
+        self._thumbnail_side = thumbnail_side
+        self._logger = logging.getLogger(__name__)
+
+    async def process(self, path: str, media_type: str) -> MediaInfo:
+        """
+        Validate and normalize an uploaded file
+        :param path: local path of the file
+        :param media_type: photo or video
+        :return: MediaInfo
+        :raises MediaError: the file is broken or not supported
+        """
+        if media_type == "photo":
+            job = partial(process_image, path, self._max_image_side, self._thumbnail_side)
+        elif media_type == "video":
+            job = partial(probe_video, path)
+        else:
+            raise MediaError(f"unsupported media type {media_type}")
+        info = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        self._logger.debug(f"Processed {path}: {info}")
+        return info
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,144 @@
+import re
+import asyncio
+import logging
+from collections import deque
+from typing import Iterable
+
+from dishka import AsyncContainer
+
+from src.adapters.database.service import AbstractBannedWordService
+
+# Latin letters and digits written instead of the Cyrillic ones they look like,
+# zero-width characters and soft hyphens splitting a word are dropped
+HOMOGLYPHS = str.maketrans({
+    **dict(zip("AaBCcEeHKkMOoPpTXxYy", "АаВСсЕеНКкМОоРрТХхУу")),
+    **dict(zip("036", "озб")),
+    "Ё": "Е", "ё": "е",
+    **dict.fromkeys("\u00ad\u200b\u200c\u200d\u2060\ufeff"),
+})
+REPEATS = re.compile(r"(\w)\1+")
+
+
+def normalize(text: str) -> str:
+    """
+    Fold the text so spelling tricks do not hide a word: homoglyphs and ё are
+    replaced, the case is lowered and repeated letters are collapsed ("МААААТ" -> "мат").
+    Words and texts go through the same folding, so they are compared consistently
+    :param text:
+    :return: str
+    """
+    return REPEATS.sub(r"\1", text.translate(HOMOGLYPHS).lower())
+
+
+class Automaton:
+    """
+    Aho-Corasick automaton over normalized words: one pass over a text finds every
+    word it contains, however long the dictionary is
+    """
+    __slots__ = ("words", "_goto", "_fail", "_output")
+
+    def __init__(self, words: Iterable[str]):
+        self.words: list[str] = []
+        goto: list[dict[str, int]] = [{}]
+        output: list[tuple[int, ...]] = [()]
+        seen = set()
+        for word in words:
+            key = normalize(word.strip())
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            state = 0
+            for char in key:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto.append({})
+                    output.append(())
+                state = next_state
+            output[state] = (len(self.words),)
+            self.words.append(word.strip())
+
+        # Failure links in breadth-first order, a state also reports the words
+        # ending in its failure state (the longest proper suffix in the trie)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                suffix = fail[state]
+                while suffix and char not in goto[suffix]:
+                    suffix = fail[suffix]
+                fail[next_state] = goto[suffix].get(char, 0)
+                if output[fail[next_state]]:
+                    output[next_state] += output[fail[next_state]]
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def find(self, text: str) -> list[str]:
+        """
+        Find the words occurring in the text
+        :param text:
+        :return: list[str] words in dictionary order, each once
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in normalize(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return [self.words[index] for index in sorted(found)]
+
+
+class BannedWordsMatcher:
+    """
+    Finds banned words in post texts. The words live in the banned_words table,
+    a background loop recompiles the automaton when their checksum changes,
+    so edits apply to every running bot without a restart
+    """
+
+    def __init__(self, container: AsyncContainer, interval: float):
+        self._container = container
+        self._interval = interval
+        self._automaton = Automaton(())
+        self._signature: str | None = None
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def size(self) -> int:
+        return len(self._automaton.words)
+
+    def find(self, text: str) -> list[str]:
+        return self._automaton.find(text)
+
+    async def reload(self) -> bool:
+        """
+        Load the words and rebuild the automaton if they changed since the last load
+        :return: bool the automaton was rebuilt
+        """
+        async with self._container() as request_container:
+            banned_word_service = await request_container.get(AbstractBannedWordService)
+            signature = await banned_word_service.get_banned_words_signature()
+            if signature is None or signature == self._signature:
+                return False
+            words = await banned_word_service.get_banned_words()
+        if words is None:
+            return False
+        # Built off the event loop, a large dictionary takes a noticeable time
+        self._automaton = await asyncio.to_thread(Automaton, words)
+        self._signature = signature
+        self._logger.info("Banned words reloaded: %d words", self.size)
+        return True
+
+    async def start(self):
+        self._logger.info("Starting BannedWordsMatcher reload loop")
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                self._logger.error("Error in BannedWordsMatcher reload loop: %s", e)
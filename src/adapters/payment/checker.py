@@ -3,6 +3,7 @@ import logging
 from yookassa import Payment
 from dishka import AsyncContainer
 from src.adapters.database.service import AbstractPostService
+from src.adapters.database.instrumentation import QueryInstrumentation
 
 
 class PaymentChecker:
@@ -28,6 +29,8 @@ class PaymentChecker:
                     logging.error(f"Error checking payment {post.payment_id}: {e}")
 
     async def start(self):
+        instrumentation = await self._container.get(QueryInstrumentation)
         while True:
-            await self.check_payments()
+            with instrumentation.scope("PaymentChecker.check_payments"):
+                await self.check_payments()
             await asyncio.sleep(15)
\ No newline at end of file
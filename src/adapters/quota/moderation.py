@@ -0,0 +1,105 @@
+import logging
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+# Decrement that never goes below zero; the field is removed once it reaches zero
+DECREMENT_SCRIPT = """
+local value = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if value <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    return 0
+end
+return value
+"""
+
+# Corrections as (user id, value at snapshot time, value counted in the database) triples.
+# A counter is only rewritten if it still equals its snapshot: one that changed meanwhile
+# belongs to a submission or review the database count may not include yet
+RECONCILE_SCRIPT = """
+local corrected = 0
+for i = 1, #ARGV, 3 do
+    local current = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    local counted = tonumber(ARGV[i + 2])
+    if current == tonumber(ARGV[i + 1]) and current ~= counted then
+        if counted > 0 then
+            redis.call('HSET', KEYS[1], ARGV[i], counted)
+        else
+            redis.call('HDEL', KEYS[1], ARGV[i])
+        end
+        corrected = corrected + 1
+    end
+end
+return corrected
+"""
+
+
+class ModerationQuota:
+    """
+    Per-user counters of posts waiting for moderation, kept in one Redis hash
+    (field = users.id). Redis errors are logged and never break the caller:
+    has_room returns None then, so the caller can fall back to the database.
+    The counters drift if Redis is unavailable for a while, QuotaReconciler
+    corrects them from Postgres periodically.
+    """
+    RECONCILE_BATCH = 1000
+
+    def __init__(self, redis: Redis, limit: int, key: str = "quota:pending_moderation"):
+        self._redis = redis
+        self._key = key
+        self.limit = limit
+        self._decrement = redis.register_script(DECREMENT_SCRIPT)
+        self._reconcile = redis.register_script(RECONCILE_SCRIPT)
+        self._logger = logging.getLogger(__name__)
+
+    async def has_room(self, user_id: int) -> bool | None:
+        """
+        Check if the user can submit one more post for moderation
+        :param user_id: users.id
+        :return: bool | None (None if Redis is unavailable)
+        """
+        try:
+            pending = await self._redis.hget(self._key, str(user_id))
+        except RedisError as e:
+            self._logger.warning("Moderation quota check failed for user %s: %s", user_id, e)
+            return None
+        return int(pending or 0) < self.limit
+
+    async def increment(self, user_id: int) -> None:
+        try:
+            await self._redis.hincrby(self._key, str(user_id), 1)
+        except RedisError as e:
+            self._logger.warning("Moderation quota increment failed for user %s: %s", user_id, e)
+
+    async def decrement(self, user_id: int) -> None:
+        try:
+            await self._decrement(keys=[self._key], args=[str(user_id)])
+        except RedisError as e:
+            self._logger.warning("Moderation quota decrement failed for user %s: %s", user_id, e)
+
+    async def snapshot(self) -> dict[int, int]:
+        """
+        Read all counters, taken before the database is counted (see reconcile)
+        :return: users.id -> counter
+        """
+        counters = await self._redis.hgetall(self._key)
+        return {int(user_id): int(value) for user_id, value in counters.items()}
+
+    async def reconcile(self, counts: dict[int, int], snapshot: dict[int, int]) -> int:
+        """
+        Set counters to the values counted in the database, skipping those that
+        changed since the snapshot (the next run corrects them)
+        :param counts: users.id -> number of unchecked posts
+        :param snapshot: counters read before the database was counted
+        :return: int number of corrected counters
+        """
+        corrections = [
+            (user_id, snapshot.get(user_id, 0), counts.get(user_id, 0))
+            for user_id in counts.keys() | snapshot.keys()
+            if snapshot.get(user_id, 0) != counts.get(user_id, 0)
+        ]
+        corrected = 0
+        for start in range(0, len(corrections), self.RECONCILE_BATCH):
+            args = [value for correction in corrections[start:start + self.RECONCILE_BATCH] for value in correction]
+            corrected += await self._reconcile(keys=[self._key], args=args)
+        return corrected
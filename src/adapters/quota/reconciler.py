@@ -0,0 +1,35 @@
+import asyncio
+import logging
+
+from dishka import AsyncContainer
+
+from src.adapters.database.service import AbstractPostService
+from src.adapters.quota.moderation import ModerationQuota
+
+
+class QuotaReconciler:
+    def __init__(self, container: AsyncContainer, quota: ModerationQuota, interval: float):
+        self._container = container
+        self._quota = quota
+        self._interval = interval
+        self._logger = logging.getLogger(__name__)
+
+    async def reconcile(self):
+        # Snapshot first: a counter that moves while the database is counted is left alone
+        snapshot = await self._quota.snapshot()
+        async with self._container() as request_container:
+            post_service = await request_container.get(AbstractPostService)
+            counts = await post_service.get_unchecked_posts_counts()
+        if counts is None:
+            return
+        corrected = await self._quota.reconcile(counts, snapshot)
+        self._logger.info("Moderation quota reconciled for %d users, %d counters corrected", len(counts), corrected)
+
+    async def start(self):
+        self._logger.info("Starting QuotaReconciler service")
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                self._logger.error("Error in QuotaReconciler main loop: %s", e)
+            await asyncio.sleep(self._interval)
@@ -1,9 +1,14 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from environs import Env
+from marshmallow.validate import Range
 from typing import Optional
 from pathlib import Path
 from urllib.parse import quote_plus
 
+# Photo hashes are indexed in 4 bands of 16 bits (PHASH_BANDS in dao/post.py),
+# only hashes within 3 bits are sure to share a band and be found
+MAX_DUPLICATE_DISTANCE = 3
+
 @dataclass
 class PaymentsConfig:
     shop_id: str
@@ -14,6 +19,11 @@ class MediaConfig:
     media_root: str
     media_url: str
     max_file_size: int = 10 * 1024 * 1024
+    storage_chat_id: str | None = None # private chat media is pre-uploaded to for file_ids
+    max_image_side: int = 2560 # uploaded photos are downscaled to this longest side
+    thumbnail_side: int = 320 # longest side of photo thumbnails
+    processing_workers: int = 2 # processes validating and normalizing media
+    duplicate_distance: int = 3 # differing dHash bits of photos shown as near-duplicates
 
 @dataclass
 class BotConfig:
@@ -21,6 +31,11 @@ class BotConfig:
     bot_url: str | None = None
     admin_ids: list[int] | None = None
     channel_chat_id: str | None = None
+    channel_routes: dict[str, list[str]] = field(default_factory=dict) # extra chats by sender organization
+    api_server_url: str | None = None # self-hosted telegram-bot-api server, the cloud Bot API if not set
+    api_server_local: bool = False # the server runs with --local, files are read from its file path
+    api_server_files_dir: str | None = None # server files directory as the server sees it
+    api_local_files_dir: str | None = None # the same directory as the bot sees it (e.g. a docker volume)
 
 @dataclass
 class DBConfig:
@@ -29,6 +44,22 @@ class DBConfig:
     name: str | None = None
     user: str | None = None
     password: str | None = None
+    replica_urls: list[str] = field(default_factory=list) # DSNs of read replicas (optional)
+    replica_max_lag: float = 5.0 # seconds, lagging replicas are skipped
+    replica_check_interval: float = 10.0 # seconds between replica lag checks
+    pool_size: int = 50
+    max_overflow: int = 15
+    pool_timeout: float = 15.0 # seconds to wait for a free connection
+    pool_recycle: int = 1500 # seconds after which a connection is reopened
+    pool_pre_ping: bool = False # ping on every checkout (background liveness check is used instead)
+    liveness_interval: float = 30.0 # seconds between background liveness checks
+    pool_stats_interval: float = 300.0 # seconds between pool metrics reports
+    pgbouncer: bool = False # connecting through PgBouncer in transaction mode
+    statement_cache_size: int = 100 # asyncpg prepared statement cache (ignored with pgbouncer)
+    prepared_statement_cache_size: int = 100 # SQLAlchemy adapter cache (ignored with pgbouncer)
+    slow_query_ms: float = 200.0 # statements slower than this are logged with their parameters
+    query_budget: int = 20 # queries per update before a warning is logged
+    query_stats_interval: float = 300.0 # seconds between per-statement stats reports
 
     @property
     def url(self) -> str:
@@ -41,6 +72,23 @@ class RedisConfig:
     port: int | None = 6379
     db: int | None = 0
 
+@dataclass
+class LimitsConfig:
+    max_unchecked_posts: int = 3 # posts of one user waiting for moderation at the same time
+    quota_reconcile_interval: float = 300.0 # seconds between Redis quota counters reconciliation
+    banned_words_reload_interval: float = 60.0 # seconds between checks of the banned words table for changes
+
+@dataclass
+class PublishingConfig:
+    check_interval: float = 60.0 # seconds between publisher cycles
+    max_posts_per_minute: int = 20 # channel posts ceiling
+    drain_window: float = 3600.0 # seconds to spread an overdue backlog over after downtime
+    burst: int = 5 # posts per cycle published without smoothing
+    publish_timeout: float = 300.0 # seconds after which an unfinished publication is recovered
+    max_attempts: int = 5 # failed sends before a post is dead-lettered
+    retry_base_delay: float = 60.0 # seconds before the first retry, doubled after every failure
+    retry_max_delay: float = 3600.0 # upper bound of the retry delay
+
 @dataclass
 class Config:
     bot: BotConfig
@@ -48,6 +96,8 @@ class Config:
     redis: RedisConfig
     media: MediaConfig
     payments: PaymentsConfig
+    limits: LimitsConfig = field(default_factory=LimitsConfig)
+    publishing: PublishingConfig = field(default_factory=PublishingConfig)
 
 
 def reader() -> Config:
@@ -68,14 +118,38 @@ def reader() -> Config:
             bot_token=env('BOT_TOKEN', None),
             bot_url=env('BOT_URL', None),
             admin_ids=[env.int('ADMIN_IDS', None)],
-            channel_chat_id=env('CHANNEL_CHAT_ID', None)
+            channel_chat_id=env('CHANNEL_CHAT_ID', None),
+            channel_routes={
+                organization: chat_ids.split(';')
+                for organization, chat_ids in env.dict('CHANNEL_ROUTES', {}).items()
+            },
+            api_server_url=env('BOT_API_SERVER_URL', None),
+            api_server_local=env.bool('BOT_API_LOCAL', False),
+            api_server_files_dir=env('BOT_API_SERVER_FILES_DIR', None),
+            api_local_files_dir=env('BOT_API_LOCAL_FILES_DIR', None)
         ),
         db=DBConfig(
             host=env('DB_HOST', None),
             port=env.int('DB_PORT', None),
             name=env('DB_NAME', None),
             user=env('DB_USER', None),
-            password=env('DB_PASSWORD', None)
+            password=env('DB_PASSWORD', None),
+            replica_urls=env.list('DB_REPLICA_URLS', []),
+            replica_max_lag=env.float('DB_REPLICA_MAX_LAG', 5.0),
+            replica_check_interval=env.float('DB_REPLICA_CHECK_INTERVAL', 10.0),
+            pool_size=env.int('DB_POOL_SIZE', 50),
+            max_overflow=env.int('DB_MAX_OVERFLOW', 15),
+            pool_timeout=env.float('DB_POOL_TIMEOUT', 15.0),
+            pool_recycle=env.int('DB_POOL_RECYCLE', 1500),
+            pool_pre_ping=env.bool('DB_POOL_PRE_PING', False),
+            liveness_interval=env.float('DB_LIVENESS_INTERVAL', 30.0),
+            pool_stats_interval=env.float('DB_POOL_STATS_INTERVAL', 300.0),
+            pgbouncer=env.bool('DB_PGBOUNCER', False),
+            statement_cache_size=env.int('DB_STATEMENT_CACHE_SIZE', 100),
+            prepared_statement_cache_size=env.int('DB_PREPARED_STATEMENT_CACHE_SIZE', 100),
+            slow_query_ms=env.float('DB_SLOW_QUERY_MS', 200.0),
+            query_budget=env.int('DB_QUERY_BUDGET', 20),
+            query_stats_interval=env.float('DB_QUERY_STATS_INTERVAL', 300.0)
         ),
         redis=RedisConfig(
             host=env('REDIS_HOST', 'localhost'),
@@ -86,10 +160,32 @@ def reader() -> Config:
         media=MediaConfig(
             media_root=media_root,
             media_url=media_url,
-            max_file_size=env.int('MAX_FILE_SIZE', 10 * 1024 * 1024)
+            max_file_size=env.int('MAX_FILE_SIZE', 10 * 1024 * 1024),
+            storage_chat_id=env('MEDIA_STORAGE_CHAT_ID', None),
+            max_image_side=env.int('MEDIA_MAX_IMAGE_SIDE', 2560),
+            thumbnail_side=env.int('MEDIA_THUMBNAIL_SIDE', 320),
+            processing_workers=env.int('MEDIA_PROCESSING_WORKERS', 2),
+            duplicate_distance=env.int(
+                'MEDIA_DUPLICATE_DISTANCE', 3, validate=Range(min=0, max=MAX_DUPLICATE_DISTANCE)
+            )
         ),
         payments=PaymentsConfig(
             shop_id=env('YOOKASSA_SHOP_ID'),
             secret_key=env('YOOKASSA_SECRET_KEY'),
+        ),
+        limits=LimitsConfig(
+            max_unchecked_posts=env.int('MAX_UNCHECKED_POSTS', 3),
+            quota_reconcile_interval=env.float('QUOTA_RECONCILE_INTERVAL', 300.0),
+            banned_words_reload_interval=env.float('BANNED_WORDS_RELOAD_INTERVAL', 60.0)
+        ),
+        publishing=PublishingConfig(
+            check_interval=env.float('PUBLISH_CHECK_INTERVAL', 60.0),
+            max_posts_per_minute=env.int('PUBLISH_MAX_POSTS_PER_MINUTE', 20),
+            drain_window=env.float('PUBLISH_DRAIN_WINDOW', 3600.0),
+            burst=env.int('PUBLISH_BURST', 5),
+            publish_timeout=env.float('PUBLISH_TIMEOUT', 300.0),
+            max_attempts=env.int('PUBLISH_MAX_ATTEMPTS', 5),
+            retry_base_delay=env.float('PUBLISH_RETRY_BASE_DELAY', 60.0),
+            retry_max_delay=env.float('PUBLISH_RETRY_MAX_DELAY', 3600.0)
         )
     )
\ No newline at end of file
@@ -2,9 +2,12 @@ import asyncio
 import orjson
 import logging
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer, SimpleFilesPathWrapper, BareFilesPathWrapper
 from aiogram.enums.parse_mode import ParseMode
 from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
 from aiogram_dialog import setup_dialogs
@@ -17,20 +20,48 @@ from dishka.integrations.aiogram import AiogramProvider, setup_dishka
 from yookassa import Configuration
 
 from src.presentation.providers.app import AppProvider, MailingProvider
-from src.config.reader import reader, Config
+from src.config.reader import reader, Config, BotConfig
 
 from src.presentation.routers.common import common_router
 
-from src.adapters.mailing.service import Mailing
 from src.adapters.automailing.service import AutoMailing
 from src.adapters.payment.checker import PaymentChecker
+from src.adapters.database.pool import PoolMonitor
+from src.adapters.database.instrumentation import QueryInstrumentation
+from src.adapters.quota.moderation import ModerationQuota
+from src.adapters.quota.reconciler import QuotaReconciler
+from src.adapters.moderation.banned_words import BannedWordsMatcher
+from src.presentation.middlewares import QueryBudgetMiddleware, UnitOfWorkMiddleware
 
 background_tasks = set()
 
+CLOUD_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+
+def build_session(config: BotConfig) -> AiohttpSession | None:
+    """
+    Session for a self-hosted Bot API server, None keeps the cloud Bot API.
+    In local mode the server has no download/upload size caps and files are read from its file path
+    """
+    if not config.api_server_url:
+        return None
+    if config.api_server_files_dir and config.api_local_files_dir:
+        wrap_local_file = SimpleFilesPathWrapper(Path(config.api_server_files_dir), Path(config.api_local_files_dir))
+    else:
+        wrap_local_file = BareFilesPathWrapper()
+    return AiohttpSession(
+        api=TelegramAPIServer.from_base(
+            config.api_server_url,
+            is_local=config.api_server_local,
+            wrap_local_file=wrap_local_file
+        )
+    )
+
 async def main():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
 
     config = reader()
+    if not config.bot.api_server_local and config.media.max_file_size > CLOUD_DOWNLOAD_LIMIT:
+        logging.warning("MAX_FILE_SIZE is above the 20 MB the cloud Bot API can download, use a local Bot API server")
 
     Configuration.account_id = config.payments.shop_id
     Configuration.secret_key = config.payments.secret_key
@@ -49,6 +80,7 @@ async def main():
 
     bot = Bot(
         token=config.bot.bot_token,
+        session=build_session(config.bot),
         default=DefaultBotProperties(
             parse_mode=ParseMode.HTML
         )
@@ -57,29 +89,48 @@ async def main():
 
     container = make_async_container(
         AppProvider(),
+        MailingProvider(),
         AiogramProvider(),
-        context={Config: config}
+        context={Config: config, Redis: redis, Bot: bot}
     )
 
     isolation = storage.create_isolation()
 
     dp = Dispatcher(events_isolation=isolation, storage=storage)
 
+    query_instrumentation = await container.get(QueryInstrumentation)
+    dp.update.outer_middleware(QueryBudgetMiddleware(query_instrumentation))
+
     dp.include_router(common_router)
 
     setup_dialogs(dp, events_isolation=isolation)
     setup_dishka(container=container, router=dp, auto_inject=True)
 
-    dp.shutdown.register(container.close)
+    unit_of_work = UnitOfWorkMiddleware()
+    for event_name, observer in dp.observers.items():
+        if event_name not in ("update", "error"):
+            observer.outer_middleware(unit_of_work)
 
-    mailing = Mailing(bot=bot, redis=redis, config=config)
+    dp.shutdown.register(container.close)
 
-    payment_checker = PaymentChecker(container=container)
-    auto_mailing = AutoMailing(mailing=mailing, container=container)
+    payment_checker = await container.get(PaymentChecker)
+    auto_mailing = await container.get(AutoMailing)
+    pool_monitor = await container.get(PoolMonitor)
+    quota_reconciler = QuotaReconciler(
+        container=container,
+        quota=await container.get(ModerationQuota),
+        interval=config.limits.quota_reconcile_interval
+    )
+    banned_words = await container.get(BannedWordsMatcher)
+    await banned_words.reload()
 
     try:
         background_tasks.add(asyncio.create_task(auto_mailing.start()))
         background_tasks.add(asyncio.create_task(payment_checker.start()))
+        background_tasks.add(asyncio.create_task(pool_monitor.start()))
+        background_tasks.add(asyncio.create_task(query_instrumentation.start()))
+        background_tasks.add(asyncio.create_task(quota_reconciler.start()))
+        background_tasks.add(asyncio.create_task(banned_words.start()))
         await dp.start_polling(bot)
     finally:
         await container.close()
@@ -0,0 +1,2 @@
+from .query_budget import QueryBudgetMiddleware
+from .unit_of_work import UnitOfWorkMiddleware
\ No newline at end of file
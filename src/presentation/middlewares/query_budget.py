@@ -0,0 +1,25 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from src.adapters.database.instrumentation import QueryInstrumentation
+
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """
+    Counts the database queries of every update, see QueryInstrumentation.scope
+    """
+
+    def __init__(self, instrumentation: QueryInstrumentation):
+        self._instrumentation = instrumentation
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        label = f"Update {event.update_id} ({event.event_type})" if isinstance(event, Update) else type(event).__name__
+        with self._instrumentation.scope(label):
+            return await handler(event, data)
@@ -0,0 +1,30 @@
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.adapters.database.dao.common import EVENT_UNITS_OF_WORK
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """
+    One transaction per event: service writes only flush and are committed once
+    after the handler, their side effects (CommonDAO.after_commit) run after that. Nothing is resolved here, a session joins the unit of work
+    when the handler first asks for one (see AppProvider.new_connection), so events
+    that never touch the database build no DAOs. Has to be registered after
+    setup_dishka, so the commit happens before the request container closes the session.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        async with AsyncExitStack() as units_of_work:
+            token = EVENT_UNITS_OF_WORK.set(units_of_work)
+            try:
+                return await handler(event, data)
+            finally:
+                EVENT_UNITS_OF_WORK.reset(token)
@@ -4,7 +4,7 @@ from aiogram.types import TelegramObject
 from redis.asyncio import Redis
 from dishka import Provider, provide, Scope, from_context
 from dishka import AsyncContainer, FromDishka
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, async_sessionmaker
 from src.config.reader import Config
 from src.adapters.database.dao import (
     AbstractUserDAO,
@@ -14,41 +14,128 @@ from src.adapters.database.dao import (
     AbstractPostDAO,
     PostDAO,
     AbstractPriceDAO,
-    PriceDAO
+    PriceDAO,
+    AbstractBannedWordDAO,
+    BannedWordDAO
 )
 from src.adapters.database.service import (
     UserService, AbstractUserService,
     PostService, AbstractPostService,
-    PriceService, AbstractPriceService
+    PriceService, AbstractPriceService,
+    SlotService, AbstractSlotService,
+    BannedWordService, AbstractBannedWordService
 )
+from src.adapters.database.dao.common import EVENT_UNITS_OF_WORK
 from src.adapters.database.structures import Base
+from src.adapters.database.routing import RoutingSession, ReplicaSelector
+from src.adapters.database.pool import PoolMonitor
+from src.adapters.database.engine import build_engine
+from src.adapters.database.instrumentation import QueryInstrumentation
+from src.adapters.quota.moderation import ModerationQuota
+from src.adapters.media.processing import MediaProcessor
+from src.adapters.moderation.banned_words import BannedWordsMatcher
 
 from src.adapters.mailing.service import Mailing
+from src.adapters.mailing.limiter import RateLimiter
+from src.adapters.mailing.uploader import MediaUploader
 from src.adapters.automailing.service import AutoMailing
 from src.adapters.payment.checker import PaymentChecker
 
 class AppProvider(Provider):
     scope = Scope.APP
     config_provider = from_context(provides=Config)
+    redis_provider = from_context(provides=Redis)
+    bot_provider = from_context(provides=Bot)
 
     @provide(scope=Scope.APP)
-    async def config(self, config: Config) -> async_sessionmaker:
-        engine = create_async_engine(
-            f"postgresql+asyncpg://{config.db.user}:{config.db.password}@{config.db.host}:{config.db.port}/{config.db.name}",
-            pool_size=50,
-            pool_timeout=15,
-            pool_recycle=1500,
-            pool_pre_ping=True,
-            max_overflow=15,
-            connect_args={
-                "server_settings": {"jit": "off"}
-            },
+    async def moderation_quota(self, config: Config, redis: Redis) -> ModerationQuota:
+        return ModerationQuota(redis=redis, limit=config.limits.max_unchecked_posts)
+
+    @provide(scope=Scope.APP)
+    async def media_uploader(self, bot: Bot, redis: Redis, config: Config) -> MediaUploader:
+        return MediaUploader(bot=bot, redis=redis, config=config)
+
+    @provide(scope=Scope.APP)
+    async def media_processor(self, config: Config) -> AsyncIterable[MediaProcessor]:
+        processor = MediaProcessor(
+            workers=config.media.processing_workers,
+            max_image_side=config.media.max_image_side,
+            thumbnail_side=config.media.thumbnail_side
+        )
+        yield processor
+        processor.close()
+
+    @provide(scope=Scope.APP)
+    async def banned_words_matcher(self, container: AsyncContainer, config: Config) -> BannedWordsMatcher:
+        return BannedWordsMatcher(container=container, interval=config.limits.banned_words_reload_interval)
+
+    @provide(scope=Scope.APP)
+    async def query_instrumentation(self, config: Config) -> QueryInstrumentation:
+        return QueryInstrumentation(
+            slow_query_ms=config.db.slow_query_ms,
+            query_budget=config.db.query_budget,
+            stats_interval=config.db.query_stats_interval
+        )
+
+    @provide(scope=Scope.APP)
+    async def engine(self, config: Config, instrumentation: QueryInstrumentation) -> AsyncIterable[AsyncEngine]:
+        engine = build_engine(config.db.url, config.db)
+        instrumentation.attach(engine)
+        yield engine
+        await engine.dispose()
+
+    @provide(scope=Scope.APP)
+    async def replica_selector(
+            self,
+            config: Config,
+            instrumentation: QueryInstrumentation
+    ) -> AsyncIterable[ReplicaSelector]:
+        replicas = [build_engine(url, config.db) for url in config.db.replica_urls]
+        for replica in replicas:
+            instrumentation.attach(replica)
+        replica_selector = ReplicaSelector(
+            replicas=replicas,
+            max_lag=config.db.replica_max_lag,
+            check_interval=config.db.replica_check_interval
+        )
+        yield replica_selector
+        await replica_selector.dispose()
+
+    @provide(scope=Scope.APP)
+    async def pool_monitor(
+            self,
+            config: Config,
+            engine: AsyncEngine,
+            replica_selector: ReplicaSelector
+    ) -> PoolMonitor:
+        engines = {"primary": engine}
+        for i, replica in enumerate(replica_selector.replicas, start=1):
+            engines[f"replica{i}"] = replica
+        return PoolMonitor(
+            engines=engines,
+            liveness_interval=config.db.liveness_interval,
+            stats_interval=config.db.pool_stats_interval
+        )
+
+    @provide(scope=Scope.APP)
+    async def config(self, engine: AsyncEngine, replica_selector: ReplicaSelector) -> async_sessionmaker:
+        return async_sessionmaker(
+            engine,
+            autoflush=False,
+            expire_on_commit=False,
+            sync_session_class=RoutingSession,
+            replica_selector=replica_selector
         )
-        return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
     @provide(scope=Scope.REQUEST)
     async def new_connection(self, sessionmaker: async_sessionmaker) -> AsyncIterable[AsyncSession]:
+        # No connection is checked out here: the session takes one on its first statement
+        # and gives it back on commit/rollback or CommonDAO.release()
         async with sessionmaker() as session:
+            units_of_work = EVENT_UNITS_OF_WORK.get()
+            if units_of_work is not None:
+                # Created while a Telegram event is handled: commit once when it ends
+                await units_of_work.enter_async_context(CommonDAO(session=session).unit_of_work())
             yield session
 
     @provide(scope=Scope.REQUEST)
@@ -63,6 +150,10 @@ class AppProvider(Provider):
     async def price_dao(self, session: AsyncSession) -> AbstractPriceDAO:
         return PriceDAO(session=session)
 
+    @provide(scope=Scope.REQUEST)
+    async def banned_word_dao(self, session: AsyncSession) -> AbstractBannedWordDAO:
+        return BannedWordDAO(session=session)
+
     @provide(scope=Scope.REQUEST)
     async def common_dao(self, session: AsyncSession) -> AbstractCommonDAO:
         return CommonDAO(session=session)
@@ -87,12 +178,16 @@ class AppProvider(Provider):
     @provide(scope=Scope.REQUEST)
     async def post_service(
             self,
+            config: Config,
             post_dao: AbstractPostDAO,
             common_dao: AbstractCommonDAO,
+            quota: ModerationQuota,
     ) -> AbstractPostService:
         return PostService(
             common_dao=common_dao,
-            post_dao=post_dao
+            post_dao=post_dao,
+            quota=quota,
+            max_unchecked_posts=config.limits.max_unchecked_posts
         )
 
     @provide(scope=Scope.REQUEST)
@@ -106,14 +201,49 @@ class AppProvider(Provider):
             price_dao=price_dao
         )
 
+    @provide(scope=Scope.REQUEST)
+    async def slot_service(
+            self,
+            post_dao: AbstractPostDAO,
+            common_dao: AbstractCommonDAO,
+    ) -> AbstractSlotService:
+        return SlotService(
+            common_dao=common_dao,
+            post_dao=post_dao
+        )
+
+    @provide(scope=Scope.REQUEST)
+    async def banned_word_service(
+            self,
+            banned_word_dao: AbstractBannedWordDAO,
+            common_dao: AbstractCommonDAO,
+    ) -> AbstractBannedWordService:
+        return BannedWordService(
+            common_dao=common_dao,
+            banned_word_dao=banned_word_dao
+        )
+
 class MailingProvider(Provider):
     @provide(scope=Scope.APP)
     async def mailing(self, bot: Bot, redis: Redis, config: Config) -> Mailing:
-        return Mailing(bot=bot, redis=redis, channel_chat_id=config.bot.channel_chat_id)
+        return Mailing(bot=bot, redis=redis, config=config)
+
+    @provide(scope=Scope.APP)
+    async def rate_limiter(self, config: Config) -> RateLimiter:
+        return RateLimiter(rate_per_minute=config.publishing.max_posts_per_minute)
 
     @provide(scope=Scope.APP)
-    async def auto_mailing(self, mailing: Mailing, container: AsyncContainer) -> AutoMailing:
-        return AutoMailing(mailing=mailing, container=container)
+    async def auto_mailing(
+            self,
+            mailing: Mailing,
+            container: AsyncContainer,
+            config: Config,
+            limiter: RateLimiter,
+            uploader: MediaUploader
+    ) -> AutoMailing:
+        return AutoMailing(
+            mailing=mailing, container=container, config=config.publishing, limiter=limiter, uploader=uploader
+        )
 
     @provide(scope=Scope.APP)
     async def payment_checker(self, container: AsyncContainer) -> PaymentChecker:
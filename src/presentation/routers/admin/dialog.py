@@ -1,6 +1,6 @@
 from aiogram_dialog import Dialog, Window
 from aiogram_dialog.widgets.text import Const, Format, Multi
-from aiogram_dialog.widgets.kbd import Button, Group, Back, Select, Cancel
+from aiogram_dialog.widgets.kbd import Button, Group, Back, Select, Cancel, SwitchTo
 from aiogram_dialog.widgets.media import DynamicMedia
 from aiogram_dialog.widgets.input import TextInput, MessageInput
 
@@ -15,6 +15,8 @@ dialog = Dialog(
             Button(Const("Верификация пользователей"), id="user_management", on_click=on_event.on_user_management),
             Button(Const("Все пользователи"), id="all_users", on_click=on_event.on_all_users),  # Новая кнопка
             Button(Const("Изменить цену публикации"), id="change_price", on_click=on_event.on_change_price),
+            SwitchTo(Const("Ошибки публикации"), id="dead_letters", state=AdminSG.dead_letters),
+            SwitchTo(Const("Запрещённые слова"), id="banned_words", state=AdminSG.banned_words),
             width=1
         ),
         state=AdminSG.menu,
@@ -45,6 +47,7 @@ dialog = Dialog(
             Format("Телефон: {sender_phone}"),
             Format(""),
             Format("Статус: {post_status}"),
+            Format("\n{similar_posts}", when="has_similar"),
         ),
         DynamicMedia("media", when="has_media"),
         Group(
@@ -168,4 +171,23 @@ dialog = Dialog(
         state=AdminSG.search_results,
         getter=getter.get_search_results
     ),
+    Window(
+        Format("{queue}\n\n{dead_list}"),
+        Button(Const("🔁 Повторить все"), id="retry_dead", on_click=on_event.on_retry_dead_posts, when="has_dead"),
+        SwitchTo(Const("◀️ Назад"), id="dead_back", state=AdminSG.menu),
+        state=AdminSG.dead_letters,
+        getter=getter.get_dead_letters
+    ),
+    Window(
+        Format(
+            "Запрещённых слов: {words_count}\n"
+            "Последние добавленные: {recent_words}\n\n"
+            "Отправьте слова через запятую, чтобы добавить их, "
+            "или со знаком «-» (например: -слово), чтобы удалить."
+        ),
+        MessageInput(on_event.on_banned_words_input),
+        SwitchTo(Const("◀️ Назад"), id="banned_back", state=AdminSG.menu),
+        state=AdminSG.banned_words,
+        getter=getter.get_banned_words
+    ),
 )
\ No newline at end of file
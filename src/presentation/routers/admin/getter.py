@@ -1,3 +1,5 @@
+import html
+import math
 from typing import Any
 from aiogram_dialog import DialogManager
 from dishka.integrations.aiogram import FromDishka
@@ -6,8 +8,17 @@ from dishka import FromDishka
 from aiogram.types import ContentType
 from aiogram_dialog.api.entities import MediaAttachment, MediaId
 
-from src.adapters.database.service import AbstractUserService, AbstractPostService, AbstractPriceService
+from src.adapters.database.service import (
+    AbstractUserService, AbstractPostService, AbstractPriceService, AbstractBannedWordService
+)
 from src.config.reader import Config
+from src.adapters.media.processing import thumbnail_path
+from src.adapters.moderation.banned_words import BannedWordsMatcher
+from src.adapters.automailing.service import AutoMailing
+
+# The dead letters window has to stay within Telegram's 4096 characters message limit
+DEAD_LETTERS_SHOWN = 10
+DEAD_LETTER_ERROR_LENGTH = 200
 
 
 @inject
@@ -99,7 +110,6 @@ async def get_current_price(
 @inject
 async def get_posts_list(
         dialog_manager: DialogManager,
-        user_service: FromDishka[AbstractUserService],
         post_service: FromDishka[AbstractPostService],
         **kwargs
 ) -> dict[str, Any]:
@@ -134,8 +144,6 @@ async def get_posts_list(
                         posts_dicts]
     posts_list = "\n".join(posts_list_items)
 
-    user = await user_service.get_user_by_id(posts_dicts[0]['sender_id'])
-
     return {
         "posts_list": f"Всего на модерации: {len(posts_dicts)}\n\n{posts_list}",
         "posts": [{"id": i, "name": f"{post_dict['name']}"} for
@@ -147,6 +155,7 @@ async def get_posts_list(
 async def get_post_details(
         dialog_manager: DialogManager,
         user_service: FromDishka[AbstractUserService],
+        post_service: FromDishka[AbstractPostService],
         config: FromDishka[Config],
         **kwargs
 ) -> dict[str, Any]:
@@ -161,7 +170,9 @@ async def get_post_details(
             "sender_phone": "Неизвестно",
             "post_status": "Неизвестно",
             "has_media": False,
-            "post_media": ""
+            "post_media": "",
+            "similar_posts": "",
+            "has_similar": False
         }
 
     # Ensure we're working with a dictionary, not a PostDTO object
@@ -188,12 +199,26 @@ async def get_post_details(
             post_media = media_path
 
     if post.get('media_type') == 'photo':
+        # Moderation only needs a preview, the thumbnail is much lighter to send
+        thumbnail = thumbnail_path(config.media.media_root, post['media_link']) if post.get('media_link') else None
+        if thumbnail and thumbnail.exists():
+            post_media = str(thumbnail)
         media = MediaAttachment(ContentType.PHOTO, path=post_media)
     elif post.get('media_type') == 'video':
         media = MediaAttachment(ContentType.VIDEO, path=post_media)
     else:
         media = None
 
+    # Near-duplicate photos of other posts, e.g. the same picture resubmitted under another name
+    similar = []
+    if post.get('media_type') == 'photo':
+        similar = await post_service.get_similar_posts(post['id'], config.media.duplicate_distance)
+    similar_posts = "\n".join(
+        f"• {similar_post.name} (пользователь {similar_post.sender_id}, "
+        f"{'опубликован' if similar_post.is_published else 'не опубликован'}, отличие {distance} бит)"
+        for similar_post, distance in similar
+    )
+
     return {
         "post_name": post['name'],
         "post_text": post['text'],
@@ -202,6 +227,8 @@ async def get_post_details(
         "post_status": "На модерации",
         "has_media": bool(post['media_link']),
         "media": media,
+        "similar_posts": f"⚠️ Похожие изображения:\n{similar_posts}" if similar else "",
+        "has_similar": bool(similar)
     }
 
 @inject
@@ -285,7 +312,6 @@ async def get_all_users_list(
 @inject
 async def get_all_user_details(
         dialog_manager: DialogManager,
-        user_service: FromDishka[AbstractUserService],
         post_service: FromDishka[AbstractPostService],
         **kwargs
 ) -> dict[str, Any]:
@@ -416,4 +442,61 @@ async def get_search_results(
         "search_results": [{"id": i, "name": f"{user_dict['name']} ({user_dict['posts_count']} пост.)"}
                            for i, user_dict in enumerate(users_dicts)],
         "search_query": search_query
-    }
\ No newline at end of file
+    }
+
+
+def _shorten(text: str, length: int) -> str:
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+
+@inject
+async def get_dead_letters(
+        dialog_manager: DialogManager,
+        post_service: FromDishka[AbstractPostService],
+        auto_mailing: FromDishka[AutoMailing],
+        **kwargs
+) -> dict[str, Any]:
+    posts = await post_service.get_dead_posts()
+    # As of the last publishing cycle
+    queue = f"Ожидают публикации: {auto_mailing.backlog}"
+    if auto_mailing.backlog:
+        queue += f", примерно {math.ceil(auto_mailing.drain_time / 60)} мин"
+
+    if not posts:
+        return {
+            "queue": queue,
+            "dead_list": "Нет постов с ошибками публикации.",
+            "has_dead": False
+        }
+
+    dead_list = "\n\n".join(
+        f"• {html.escape(post.name)} (попыток: {post.publish_attempts})\n"
+        f"{html.escape(_shorten(post.last_error or 'ошибка неизвестна', DEAD_LETTER_ERROR_LENGTH))}"
+        for post in posts[:DEAD_LETTERS_SHOWN]
+    )
+    if len(posts) > DEAD_LETTERS_SHOWN:
+        dead_list += f"\n\n…и ещё {len(posts) - DEAD_LETTERS_SHOWN}"
+
+    return {
+        "queue": queue,
+        "dead_list": f"Не удалось опубликовать: {len(posts)}\n\n{dead_list}",
+        "has_dead": True
+    }
+
+
+@inject
+async def get_banned_words(
+        dialog_manager: DialogManager,
+        banned_word_service: FromDishka[AbstractBannedWordService],
+        banned_words_matcher: FromDishka[BannedWordsMatcher],
+        **kwargs
+) -> dict[str, Any]:
+    # Counted in the event's transaction: right after an edit the matcher
+    # is rebuilt only once the edit is committed
+    words_count = await banned_word_service.count_banned_words()
+    recent_words = await banned_word_service.get_recent_banned_words(limit=20)
+
+    return {
+        "words_count": words_count if words_count is not None else banned_words_matcher.size,
+        "recent_words": ", ".join(recent_words) if recent_words else "список пуст"
+    }
@@ -5,7 +5,12 @@ from typing import Any
 from dishka import FromDishka
 
 from src.presentation.states import AdminSG
-from src.adapters.database.service import AbstractUserService, AbstractPostService, AbstractPriceService
+from src.adapters.database.service import (
+    AbstractUserService, AbstractPostService, AbstractPriceService, AbstractBannedWordService
+)
+from src.adapters.database.dao import AbstractCommonDAO
+from src.adapters.mailing.uploader import MediaUploader
+from src.adapters.moderation.banned_words import BannedWordsMatcher
 
 async def on_user_management(
         callback: CallbackQuery,
@@ -19,8 +24,7 @@ async def on_user_selected(
         callback: CallbackQuery,
         widget: Any,
         dialog_manager: DialogManager,
-        item_id: str,
-        user_service: FromDishka[AbstractUserService]
+        item_id: str
 ):
     dialog_manager.dialog_data["current_user_index"] = int(item_id)
     await dialog_manager.switch_to(AdminSG.user_detail)
@@ -48,8 +52,7 @@ async def on_approve_user(
 async def on_revoke_approval(
         callback: CallbackQuery,
         widget: Any,
-        dialog_manager: DialogManager,
-        user_service: FromDishka[AbstractUserService]
+        dialog_manager: DialogManager
 ):
     users = dialog_manager.dialog_data.get("users", [])
     current_index = dialog_manager.dialog_data.get("current_user_index", 0)
@@ -102,8 +105,7 @@ async def on_post_selected(
         callback: CallbackQuery,
         widget: Any,
         dialog_manager: DialogManager,
-        item_id: str,
-        post_service: FromDishka[AbstractPostService]
+        item_id: str
 ):
     dialog_manager.dialog_data["current_index"] = int(item_id)
     await dialog_manager.switch_to(AdminSG.review_post)
@@ -122,14 +124,18 @@ async def on_approve_post(
         callback: CallbackQuery,
         widget: Any,
         dialog_manager: DialogManager,
-        post_service: FromDishka[AbstractPostService]
+        post_service: FromDishka[AbstractPostService],
+        uploader: FromDishka[MediaUploader]
 ):
     posts = dialog_manager.dialog_data.get("posts", [])
     current_index = dialog_manager.dialog_data.get("current_index", 0)
 
     if current_index < len(posts):
         post = posts[current_index]
-        await post_service.approve_post(post['id'])
+        approved = await post_service.approve_post(post['id'])
+        # Media without a file_id is uploaded now, so publishing does not wait for it
+        if approved and approved.media_link and not approved.media_file_id:
+            uploader.schedule(approved.media_link, approved.media_type)
         await callback.message.answer("Пост одобрен.")
 
     await dialog_manager.switch_to(AdminSG.moderation_list)
@@ -165,8 +171,7 @@ async def on_all_user_selected(
         callback: CallbackQuery,
         widget: Any,
         dialog_manager: DialogManager,
-        item_id: str,
-        user_service: FromDishka[AbstractUserService]
+        item_id: str
 ):
     dialog_manager.dialog_data["all_users_current_index"] = int(item_id)
     await dialog_manager.switch_to(AdminSG.all_user_detail)
@@ -203,8 +208,7 @@ async def on_search_users(
 async def on_search_input(
         message: Message,
         widget: Any,
-        dialog_manager: DialogManager,
-        user_service: FromDishka[AbstractUserService]
+        dialog_manager: DialogManager
 ):
     search_string = message.text
     if not search_string:
@@ -220,8 +224,7 @@ async def on_searched_user_selected(
         callback: CallbackQuery,
         widget: Any,
         dialog_manager: DialogManager,
-        item_id: str,
-        user_service: FromDishka[AbstractUserService]
+        item_id: str
 ):
     dialog_manager.dialog_data["searched_user_index"] = int(item_id)
     await dialog_manager.switch_to(AdminSG.all_user_detail)
@@ -237,4 +240,46 @@ async def on_back_from_user_detail(
     if source == "search":
         await dialog_manager.switch_to(AdminSG.search_results)
     else:
-        await dialog_manager.switch_to(AdminSG.all_users_list)
\ No newline at end of file
+        await dialog_manager.switch_to(AdminSG.all_users_list)
+
+@inject
+async def on_retry_dead_posts(
+        callback: CallbackQuery,
+        widget: Any,
+        dialog_manager: DialogManager,
+        post_service: FromDishka[AbstractPostService]
+):
+    count = await post_service.retry_dead_posts()
+    await callback.answer(f"Возвращено в очередь публикации: {count}")
+
+@inject
+async def on_banned_words_input(
+        message: Message,
+        widget: Any,
+        dialog_manager: DialogManager,
+        banned_word_service: FromDishka[AbstractBannedWordService],
+        banned_words_matcher: FromDishka[BannedWordsMatcher],
+        common_dao: FromDishka[AbstractCommonDAO]
+):
+    """
+    Words are separated by commas or new lines, a word starting with "-" is removed
+    """
+    items = [item.strip().lower() for item in (message.text or "").replace("\n", ",").split(",")]
+    to_delete = [item[1:].strip() for item in items if item.startswith("-") and item[1:].strip()]
+    to_add = [item for item in items if item and not item.startswith("-")]
+    if not to_add and not to_delete:
+        await message.answer("Введите слова через запятую, для удаления — со знаком «-».")
+        return
+    if any(len(word) > 100 for word in to_add):
+        await message.answer("Слово должно содержать не более 100 символов.")
+        return
+
+    added = await banned_word_service.add_banned_words(to_add)
+    deleted = await banned_word_service.delete_banned_words(to_delete)
+    if added is None or deleted is None:
+        await message.answer("Не удалось сохранить изменения, попробуйте позже.")
+        return
+    # The edit is only flushed until the event's unit of work commits, a reload before
+    # that would read the old words. Other bot instances pick it up on their next check
+    await common_dao.after_commit(banned_words_matcher.reload)
+    await message.answer(f"Добавлено: {added}, удалено: {deleted}")
\ No newline at end of file
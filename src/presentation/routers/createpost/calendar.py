@@ -0,0 +1,37 @@
+from datetime import date
+
+from aiogram.types import InlineKeyboardButton
+from aiogram_dialog import DialogManager
+from aiogram_dialog.widgets.kbd import Calendar
+from aiogram_dialog.widgets.kbd.calendar_kbd import CalendarDaysView, CalendarScope
+
+STRIKE = "̶"
+
+
+class AvailabilityDaysView(CalendarDaysView):
+    async def _render_date_button(
+            self,
+            selected_date: date,
+            today: date,
+            data: dict,
+            manager: DialogManager,
+    ) -> InlineKeyboardButton:
+        button = await super()._render_date_button(selected_date, today, data, manager)
+        if selected_date not in data.get("blocked_days", ()):
+            return button
+        # Telegram has no disabled buttons, blocked days are struck through
+        return InlineKeyboardButton(
+            text="".join(char + STRIKE for char in button.text),
+            callback_data=button.callback_data
+        )
+
+
+class AvailabilityCalendar(Calendar):
+    """
+    Calendar that strikes through the days listed in the window's "blocked_days"
+    """
+
+    def _init_views(self):
+        views = super()._init_views()
+        views[CalendarScope.DAYS] = AvailabilityDaysView(self._item_callback_data)
+        return views
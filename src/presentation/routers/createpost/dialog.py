@@ -1,11 +1,12 @@
 from aiogram import F
 from aiogram_dialog import Dialog, Window
 from aiogram_dialog.widgets.text import Const, Format
-from aiogram_dialog.widgets.kbd import SwitchTo, Select, Group, Button, Back, Row, Calendar
+from aiogram_dialog.widgets.kbd import SwitchTo, Select, Group, Button, Back, Row
 from aiogram_dialog.widgets.input import TextInput, MessageInput
 
 from src.presentation.states import PostSG
 from . import on_event, getter
+from .calendar import AvailabilityCalendar
 
 # This is a dialog of the post creation process.
 # First window is for entering the post name,
@@ -69,13 +70,18 @@ dialog = Dialog(
         state=PostSG.confirm_publish
     ),
     Window(
-        Const("Выберите дату публикации:"),
-        Calendar(
+        Format(
+            "Выберите дату публикации:\n\n"
+            "Ближайшее свободное время: {next_slot}\n"
+            "Зачеркнутые дни заняты (24 часа от ваших публикаций и запланированных постов)."
+        ),
+        AvailabilityCalendar(
             id="calendar",
             on_click=on_event.on_date_selected
         ),
         Back(Const("Назад")),
-        state=PostSG.schedule_date
+        state=PostSG.schedule_date,
+        getter=getter.get_schedule_data
     ),
     Window(
         Const("Введите время публикации в формате ЧЧ:ММ (например, 13:00):"),
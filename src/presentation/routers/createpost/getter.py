@@ -1,9 +1,12 @@
 from typing import Any
+from datetime import date
 from aiogram_dialog import DialogManager
 from dishka.integrations.aiogram import FromDishka
 from dishka.integrations.aiogram_dialog import inject
 
-from src.adapters.database.service import AbstractUserService, AbstractPostService, AbstractPriceService
+from src.adapters.database.service import (
+    AbstractUserService, AbstractPostService, AbstractPriceService, AbstractSlotService
+)
 
 @inject
 async def get_preview_data(dialog_manager: DialogManager, **kwargs) -> dict[str, Any]:
@@ -24,4 +27,22 @@ async def get_limit_data(dialog_manager: DialogManager, **kwargs) -> dict[str, A
     limit_reason = dialog_manager.dialog_data.get("limit_reason", "Неизвестная ошибка")
     return {
         "limit_reason": limit_reason
+    }
+
+@inject
+async def get_schedule_data(
+        dialog_manager: DialogManager,
+        user_service: FromDishka[AbstractUserService],
+        slot_service: FromDishka[AbstractSlotService],
+        **kwargs
+) -> dict[str, Any]:
+    # The calendar is re-rendered on every month switch, the sender is looked up once
+    sender_id = dialog_manager.dialog_data.get("sender_id")
+    if sender_id is None:
+        sender_id = dialog_manager.dialog_data["sender_id"] = (await user_service.get_current_user()).id
+    month = dialog_manager.find("calendar").get_offset() or date.today()
+    next_slot, blocked_days = await slot_service.get_calendar(sender_id, month.year, month.month)
+    return {
+        "blocked_days": blocked_days,
+        "next_slot": next_slot.strftime('%d.%m.%Y %H:%M') if next_slot else "нет свободного времени"
     }
\ No newline at end of file
@@ -1,10 +1,14 @@
 import os
+import html
 import uuid
+import shutil
+import asyncio
 import aiofiles
 import re
 from pathlib import Path
 from typing import Any
 from datetime import datetime, date, time
+from aiogram import Bot
 from aiogram.types import CallbackQuery, Message
 from aiogram_dialog import DialogManager
 from dishka.integrations.aiogram_dialog import inject
@@ -12,25 +16,18 @@ from dishka.integrations.aiogram import FromDishka
 from aiogram_dialog.widgets.kbd import Button, Calendar
 from aiogram_dialog import StartMode
 
-from src.adapters.database.service import AbstractUserService, AbstractPostService, AbstractPriceService
+from src.adapters.database.service import (
+    AbstractUserService, AbstractPostService, AbstractPriceService, AbstractSlotService
+)
 from src.adapters.database.dto import PostRequestDTO
+from src.adapters.database.dao import ScheduleConflictError, DuplicatePostNameError
+from src.adapters.mailing.uploader import MediaUploader
+from src.adapters.media.processing import MediaProcessor, MediaError, MediaInfo
+from src.adapters.moderation.banned_words import BannedWordsMatcher
 from src.presentation.states import PostSG, MenuSG
 from src.config.reader import Config
 
-# Banned words list (add more if needed)
-BANNED_WORDS = ["мат", "брань", "оскорбление"]
-
-def contains_banned_words(text: str) -> list:
-    """
-    Function to check if the text contains any of the banned words.
-    :param text:
-    :return:
-    """
-    found_words = []
-    for word in BANNED_WORDS:
-        if word in text.lower():
-            found_words.append(word)
-    return found_words
+DUPLICATE_NAME_MESSAGE = "❌ У вас уже есть пост с названием «{name}». Введите другое название."
 
 async def save_media(
         media_file: bytes,
@@ -62,6 +59,77 @@ async def save_media(
     relative_path = f"posts/{filename}"
     return f"{media_config.media_url}{relative_path}"
 
+async def link_media(
+        source_path: str,
+        media_type: str,
+        media_config: Any
+) -> str:
+    """
+    Function to store a file of a local Bot API server without reading it.
+    The file is hard-linked into media_root, or copied if linking is not possible.
+    :param source_path: local path of the file
+    :param media_type:
+    :param media_config:
+    :return:
+    """
+    posts_dir = Path(media_config.media_root) / "posts"
+    posts_dir.mkdir(parents=True, exist_ok=True)
+
+    file_extension = media_type.split('/')[-1] if '/' in media_type else "jpg"
+    filename = f"{uuid.uuid4()}.{file_extension}"
+    filepath = posts_dir / filename
+
+    try:
+        os.link(source_path, filepath)
+    except OSError:
+        # Another filesystem or no permission to link the server's file
+        await asyncio.to_thread(shutil.copyfile, source_path, filepath)
+
+    return f"{media_config.media_url}posts/{filename}"
+
+async def fetch_media(
+        bot: Bot,
+        file_id: str,
+        media_type: str,
+        media_config: Any
+) -> str:
+    """
+    Function to store media of a message. A local Bot API server keeps the file
+    on disk, so it is taken from there instead of being downloaded.
+    :param bot:
+    :param file_id:
+    :param media_type:
+    :param media_config:
+    :return:
+    """
+    if bot.session.api.is_local:
+        file = await bot.get_file(file_id)
+        return await link_media(bot.session.api.wrap_local_file.to_local(file.file_path), media_type, media_config)
+    media_file = await bot.download(file_id)
+    return await save_media(media_file.read(), media_type, media_config)
+
+async def process_media(
+        processor: MediaProcessor,
+        media_url: str,
+        media_type: str,
+        media_config: Any
+) -> tuple[str, MediaInfo]:
+    """
+    Function to validate and normalize a stored file, a broken one is deleted.
+    :param processor:
+    :param media_url:
+    :param media_type:
+    :param media_config:
+    :return: media_url of the normalized file and its MediaInfo
+    """
+    file_path = Path(media_config.media_root) / "posts" / os.path.basename(media_url)
+    try:
+        info = await processor.process(str(file_path), media_type)
+    except MediaError:
+        file_path.unlink(missing_ok=True)
+        raise
+    return f"{media_config.media_url}posts/{Path(info.path).name}", info
+
 def validate_time(time_str: str) -> bool:
     """
     Function to validate time format.
@@ -99,6 +167,10 @@ async def on_name_entered(
         return
 
     dialog_manager.dialog_data["name"] = text
+    if dialog_manager.dialog_data.pop("renaming", False):
+        # The name was taken, the rest of the post is already filled in
+        await dialog_manager.switch_to(PostSG.confirm_publish)
+        return
     await dialog_manager.switch_to(PostSG.add_post_text)
 
 @inject
@@ -106,7 +178,8 @@ async def on_text_entered(
         message: Message,
         widget: Any,
         dialog_manager: DialogManager,
-        text: str
+        text: str,
+        banned_words_matcher: FromDishka[BannedWordsMatcher]
 ):
     """
     Function to validate text length and check for banned words.
@@ -114,13 +187,14 @@ async def on_text_entered(
     :param widget:
     :param dialog_manager:
     :param text:
+    :param banned_words_matcher:
     :return:
     """
     if len(text) < 2 or len(text) > 1000:
         await message.answer("Текст должен содержать от 2 до 1000 символов.")
         return
 
-    banned_words = contains_banned_words(text)
+    banned_words = banned_words_matcher.find(text)
     if banned_words:
         dialog_manager.dialog_data["text"] = text
         dialog_manager.dialog_data["banned_words"] = ", ".join(banned_words)
@@ -136,17 +210,25 @@ async def on_media_sent(
         message: Message,
         widget: Any,
         dialog_manager: DialogManager,
-        config: FromDishka[Config]
+        config: FromDishka[Config],
+        uploader: FromDishka[MediaUploader],
+        processor: FromDishka[MediaProcessor]
 ):
     """
     Function to handle media upload. Checks file size and media type.
+    Photos and videos keep the file_id of the message, documents are uploaded
+    to the storage chat in the background to get one.
     :param message:
     :param widget:
     :param dialog_manager:
     :param config:
+    :param uploader:
+    :param processor:
     :return:
     """
     media_url = None
+    media_file_id = None
+    media_info = None
     media_type = "photo"  # По умолчанию считаем, что это фото
 
     try:
@@ -160,8 +242,8 @@ async def on_media_sent(
                     f"Файл слишком большой. Максимальный размер: {config.media.max_file_size // 1024 // 1024}MB")
                 return
 
-            media_file = await message.bot.download(photo)
-            media_url = await save_media(media_file.read(), "image/jpeg", config.media)
+            media_url = await fetch_media(message.bot, photo.file_id, "image/jpeg", config.media)
+            media_file_id = photo.file_id
 
         elif message.video:
             media_type = "video"
@@ -171,8 +253,8 @@ async def on_media_sent(
                 return
 
             video = message.video
-            media_file = await message.bot.download(video)
-            media_url = await save_media(media_file.read(), video.mime_type, config.media)
+            media_url = await fetch_media(message.bot, video.file_id, video.mime_type or "video/mp4", config.media)
+            media_file_id = video.file_id
 
         elif message.document:
             # Определяем тип документа по MIME-type
@@ -190,8 +272,17 @@ async def on_media_sent(
                 return
 
             document = message.document
-            media_file = await message.bot.download(document)
-            media_url = await save_media(await media_file.read(), document.mime_type, config.media)
+            media_url = await fetch_media(message.bot, document.file_id, document.mime_type, config.media)
+
+        # Broken files are rejected now instead of failing at publish time
+        if media_url:
+            media_url, media_info = await process_media(processor, media_url, media_type, config.media)
+        if media_url and message.document:
+            uploader.schedule(media_url, media_type)
+
+    except MediaError:
+        await message.answer("Файл поврежден или не поддерживается. Отправьте фото или видео в формате MP4.")
+        return
 
     except Exception as e:
         await message.answer(f"Ошибка при загрузке файла: {str(e)}")
@@ -199,6 +290,8 @@ async def on_media_sent(
 
     dialog_manager.dialog_data["media_url"] = media_url
     dialog_manager.dialog_data["media_type"] = media_type  # Сохраняем тип медиа
+    dialog_manager.dialog_data["media_file_id"] = media_file_id
+    dialog_manager.dialog_data["media_phash"] = media_info.phash if media_info else None
     await dialog_manager.switch_to(PostSG.preview)
 
 @inject
@@ -209,6 +302,8 @@ async def on_skip_media(
 ):
     dialog_manager.dialog_data["media_url"] = None
     dialog_manager.dialog_data["media_type"] = None
+    dialog_manager.dialog_data["media_file_id"] = None
+    dialog_manager.dialog_data["media_phash"] = None
     await dialog_manager.switch_to(PostSG.preview)
 
 @inject
@@ -270,6 +365,8 @@ async def on_publish_now(
         text=post_data["text"],
         media_link=post_data.get("media_url"),
         media_type=post_data.get("media_type", "photo"),
+        media_file_id=post_data.get("media_file_id"),
+        media_phash=post_data.get("media_phash"),
         is_publish_now=True,
         publish_date=None,
         is_checked=False,
@@ -280,9 +377,18 @@ async def on_publish_now(
 
     try:
         created_post = await post_service.add_post(post)
-        await callback.message.answer("✅ Пост отправлен на модерацию! Он будет опубликован сразу после одобрения.")
+    except DuplicatePostNameError:
+        await callback.message.answer(DUPLICATE_NAME_MESSAGE.format(name=html.escape(post.name)))
+        dialog_manager.dialog_data["renaming"] = True
+        await dialog_manager.switch_to(PostSG.add_post)
+        return
     except Exception as e:
         await callback.message.answer(f"❌ Ошибка при отправке на модерацию: {str(e)}")
+    else:
+        if created_post is None:
+            await callback.message.answer("❌ Не удалось отправить пост на модерацию, попробуйте позже.")
+        else:
+            await callback.message.answer("✅ Пост отправлен на модерацию! Он будет опубликован сразу после одобрения.")
 
     await dialog_manager.done()
 
@@ -295,13 +401,27 @@ async def on_schedule_post(
 ):
     await dialog_manager.switch_to(PostSG.schedule_date)
 
+async def next_slot_hint(slot_service: AbstractSlotService, sender_id: int, after: datetime) -> str:
+    next_slot = await slot_service.get_next_free_slot(sender_id, after=after)
+    if not next_slot:
+        return ""
+    return f"\nБлижайшее доступное время: {next_slot.strftime('%d.%m.%Y %H:%M')}"
+
 @inject
 async def on_date_selected(
         callback: CallbackQuery,
         widget: Calendar,
         dialog_manager: DialogManager,
-        selected_date: date
+        selected_date: date,
+        user_service: FromDishka[AbstractUserService],
+        slot_service: FromDishka[AbstractSlotService]
 ):
+    user = await user_service.get_current_user()
+    blocked_days = await slot_service.get_blocked_days(user.id, selected_date.year, selected_date.month)
+    if selected_date in blocked_days:
+        await callback.answer("На этот день нет доступного времени, выберите другой.", show_alert=True)
+        return
+
     dialog_manager.dialog_data["scheduled_date"] = selected_date.isoformat()
     await dialog_manager.switch_to(PostSG.schedule_time)
 
@@ -314,7 +434,8 @@ async def on_time_entered(
         text: str,
         user_service: FromDishka[AbstractUserService],
         post_service: FromDishka[AbstractPostService],
-        price_service: FromDishka[AbstractPriceService]
+        price_service: FromDishka[AbstractPriceService],
+        slot_service: FromDishka[AbstractSlotService]
 ):
     """
     Function to schedule the post.
@@ -345,7 +466,7 @@ async def on_time_entered(
     # Check if user can schedule at this time
     can_schedule, reason = await post_service.can_schedule_post(user.id, scheduled_datetime)
     if not can_schedule:
-        await message.answer(f"❌ {reason}")
+        await message.answer(f"❌ {reason}" + await next_slot_hint(slot_service, user.id, scheduled_datetime))
         return
 
     post_data = dialog_manager.dialog_data
@@ -360,6 +481,8 @@ async def on_time_entered(
         text=post_data["text"],
         media_link=post_data.get("media_url"),
         media_type=post_data.get("media_type", "photo"),
+        media_file_id=post_data.get("media_file_id"),
+        media_phash=post_data.get("media_phash"),
         is_publish_now=False,
         publish_date=scheduled_datetime,
         is_checked=False,
@@ -370,8 +493,24 @@ async def on_time_entered(
 
     try:
         created_post = await post_service.add_post(post)
-        await message.answer(f"✅ Пост запланирован на {scheduled_datetime.strftime('%d.%m.%Y %H:%M')}!")
+    except DuplicatePostNameError:
+        await message.answer(DUPLICATE_NAME_MESSAGE.format(name=html.escape(post.name)))
+        dialog_manager.dialog_data["renaming"] = True
+        await dialog_manager.switch_to(PostSG.add_post)
+        return
+    except ScheduleConflictError:
+        # Stay on the time input, so another time can be entered
+        await message.answer(
+            "❌ У вас уже есть запланированные посты в пределах 24 часов от выбранного времени. Выберите другое время."
+            + await next_slot_hint(slot_service, user.id, scheduled_datetime)
+        )
+        return
     except Exception as e:
         await message.answer(f"❌ Ошибка при планировании поста: {str(e)}")
+    else:
+        if created_post is None:
+            await message.answer("❌ Не удалось запланировать пост, попробуйте позже.")
+        else:
+            await message.answer(f"✅ Пост запланирован на {scheduled_datetime.strftime('%d.%m.%Y %H:%M')}!")
 
     await dialog_manager.done()
\ No newline at end of file
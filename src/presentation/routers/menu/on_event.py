@@ -6,6 +6,7 @@ from aiogram_dialog.widgets.kbd import Button
 
 from src.presentation.states import PostSG, MyPostsSG
 from src.adapters.database.service import AbstractUserService, AbstractPostService, AbstractPriceService
+from src.config.reader import Config
 
 @inject
 async def start_create_post(
@@ -13,7 +14,8 @@ async def start_create_post(
         button: Button,
         dialog_manager: DialogManager,
         user_service: FromDishka[AbstractUserService],
-        post_service: FromDishka[AbstractPostService]
+        post_service: FromDishka[AbstractPostService],
+        config: FromDishka[Config]
 ):
     current_user = await user_service.get_user_by_tg_id(callback.from_user.id)
 
@@ -26,12 +28,12 @@ async def start_create_post(
             info_text
         )
     else:
-        check_posts_value = await post_service.get_unchecked_posts_from_user(callback.from_user.id)
+        check_posts_value = await post_service.can_submit_post(current_user.id, callback.from_user.id)
         if check_posts_value is True:
             await dialog_manager.start(PostSG.add_post)
         else:
             info_text = (
-                "Одновременное количество постов на модерации не может быть больше трех\n"
+                f"Одновременное количество постов на модерации не может быть больше {config.limits.max_unchecked_posts}\n"
                 "Дождитесь модерации свои текущих постов, либо удалите один из них для освобождения очереди\n"
             )
             await callback.message.answer(
@@ -67,7 +67,7 @@ async def confirm_delete(
 
     if post_id:
         try:
-            success = await post_service.delete_post_by_user(post_id)
+            success = await post_service.delete_post(post_id)
             if success:
                 await callback.answer("Пост удален")
                 posts = dialog_manager.dialog_data.get("posts", [])
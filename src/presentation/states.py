@@ -38,4 +38,6 @@ class AdminSG(StatesGroup):
     all_users_list = State()
     all_user_detail = State()
     search_users = State()
-    search_results = State()
\ No newline at end of file
+    search_results = State()
+    dead_letters = State()
+    banned_words = State()
\ No newline at end of file